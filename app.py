@@ -8,6 +8,7 @@ import sqlite3
 import datetime
 import hashlib
 from src.ocr import ocr_image_bytes
+from src.render import page_render_scale
 
 # Configure the page
 st.set_page_config(
@@ -122,7 +123,7 @@ def setup_api():
     )
     return client
 
-OCR_SCALE = 2.0
+OCR_SCALE = 2.0  # upper bound; the per-page scale follows the scan's own DPI
 
 
 def _ocr_page(image_bytes: bytes) -> str:
@@ -147,7 +148,8 @@ def extract_text_from_pdf(pdf_file):
                     page_texts.append(text)
                     continue
 
-                pix = page.get_pixmap(matrix=fitz.Matrix(OCR_SCALE, OCR_SCALE), alpha=False)
+                scale = page_render_scale(page, OCR_SCALE)
+                pix = page.get_pixmap(matrix=fitz.Matrix(scale, scale), alpha=False)
                 ocr_jobs[index] = pix.tobytes("png")
                 page_texts.append("")
 
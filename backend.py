@@ -1,15 +1,45 @@
-import time, os, logging
+import time, os, logging, asyncio, json
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from functools import lru_cache
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException, UploadFile, File, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse, JSONResponse
-from typing import List
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
+from typing import Dict, List
 from pydantic import BaseModel
 import fitz  # PyMuPDF
-from openai import OpenAI
+from openai import AsyncOpenAI
 import hashlib
-from db import init_db, save_payslip, get_payslip, latest_payslip_id, list_payslips
+import re
+import unicodedata
+from db import (
+    init_db,
+    save_payslip,
+    save_comparison,
+    get_payslip,
+    latest_payslip_id,
+    list_payslips,
+    get_cached_extraction,
+    cache_extraction,
+    get_cached_answer,
+    cache_answer,
+    cache_stats,
+    run_db,
+    search_payslips,
+    archive_payslips,
+    ARCHIVE_AFTER_DAYS,
+)
 import shutil
-from src.ocr import ocr_image_bytes
+from src.ocr import RawImage, ocr_image_with_rotation, ocr_samples_batch, ocr_samples_with_confidence
+from src.render import OCR_MAX_PIXELS, OCR_MIN_SCALE, page_render_scale, render_page
+from src.layout import OCR_MIN_REGION_PT, OCR_TEXT_COVERAGE, PageLayout, analyze_page, merge_page
+from src.orientation import MAX_ROTATION_ATTEMPTS
+from src.gemini_ocr import GEMINI_IMAGE_FORMAT, GEMINI_MODEL
+from src.tesseract_pool import TESSERACT_LANG
+from src.kb.retrieval import ChunkIndex, SectionIndex, estimate_tokens
+from src.llm.client import GroqClient, LLMBusy, LLMError
+from src.compare import DiffRow, chronological_order, diff_line_items, parse_line_items, render_diff
 
 logging.basicConfig(level=logging.INFO)
 log = logging.getLogger("payslip")
@@ -19,9 +49,41 @@ MAX_OCR_PAGES = int(os.getenv("MAX_OCR_PAGES", "3"))
 MAX_TOTAL_SECONDS = int(os.getenv("MAX_TOTAL_SECONDS", "60"))
 MAX_BYTES = 8 * 1024 * 1024  # 8MB
 
+# Extraction runs in a bounded pool so OCR never blocks the event loop.
+# Requests beyond EXTRACT_WORKERS wait up to EXTRACT_QUEUE_SECONDS for a slot.
+EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", "4"))
+EXTRACT_QUEUE_SECONDS = float(os.getenv("EXTRACT_QUEUE_SECONDS", "30"))
+_extract_pool = ThreadPoolExecutor(max_workers=EXTRACT_WORKERS, thread_name_prefix="extract")
+_extract_slots = asyncio.Semaphore(EXTRACT_WORKERS)
+# Shared deadline for all files of one /compare-payslips request; leaves room
+# for a queued file on top of its own MAX_TOTAL_SECONDS OCR budget
+COMPARE_TOTAL_SECONDS = float(os.getenv("COMPARE_TOTAL_SECONDS", str(MAX_TOTAL_SECONDS + 15)))
+
 # Rasterization/OCR tuning
-SCALE = float(os.getenv("OCR_SCALE", "3.0"))  # higher for better accuracy
-MATRIX = fitz.Matrix(SCALE, SCALE)
+SCALE = float(os.getenv("OCR_SCALE", "3.0"))  # upper bound; per page see src/render.py
+# Progressive mode: OCR at a low scale first, re-render at full scale when the
+# mean word confidence is below OCR_MIN_CONFIDENCE, or, for backends that
+# report none (Gemini), when the result is shorter than OCR_MIN_CHARS
+PROGRESSIVE = os.getenv("OCR_PROGRESSIVE", "0") == "1"
+PROGRESSIVE_SCALE = float(os.getenv("OCR_PROGRESSIVE_SCALE", "1.5"))
+OCR_MIN_CONFIDENCE = float(os.getenv("OCR_MIN_CONFIDENCE", "60"))
+OCR_MIN_CHARS = int(os.getenv("OCR_MIN_CHARS", "40"))
+OCR_PAGE_WORKERS = int(os.getenv("OCR_PAGE_WORKERS", "3"))  # concurrent OCR calls per PDF
+GEMINI_BATCH_PAGES = int(os.getenv("GEMINI_BATCH_PAGES", "4"))  # pages per Gemini request
+Region = tuple[int, int]  # (page index, index into PageLayout.regions)
+
+LLM_MODEL = "llama-3.3-70b-versatile"
+# One pooled client serves every LLM call; LLM_MAX_CONCURRENCY caps in-flight
+# requests (streams included).  GroqClient owns the connection settings
+# (LLM_BASE_URL, LLM_TIMEOUT, ...), paces calls to the account's
+# LLM_RPM/LLM_TPM quota and retries 429/5xx (LLM_MAX_RETRIES).
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_QUEUE_SECONDS = float(os.getenv("LLM_QUEUE_SECONDS", "30"))
+LLM = GroqClient(model=LLM_MODEL)
+_llm_slots = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+# Bump when the /ask prompt or its context assembly changes so cached answers
+# are not reused
+ASK_PROMPT_VERSION = "2"
 
 if not os.getenv("OPENAI_API_KEY"):
     # Do not raise immediately on import if you prefer; you can check inside the handler instead.
@@ -32,6 +94,34 @@ app = FastAPI()
 # Initialize simple payslip memory database
 init_db()
 
+# Old payslips are moved into compressed archive segments in the background
+# (ARCHIVE_AFTER_DAYS <= 0 disables it)
+ARCHIVE_INTERVAL_HOURS = float(os.getenv("ARCHIVE_INTERVAL_HOURS", "24"))
+
+
+async def _archive_loop():
+    while True:
+        try:
+            moved = await run_db(archive_payslips, ARCHIVE_AFTER_DAYS)
+            if moved:
+                log.info("Archived %d payslips older than %g days", moved, ARCHIVE_AFTER_DAYS)
+        except Exception:
+            log.exception("Payslip archiving failed")
+        await asyncio.sleep(ARCHIVE_INTERVAL_HOURS * 3600)
+
+
+@app.on_event("startup")
+async def start_archiver():
+    if ARCHIVE_AFTER_DAYS > 0:
+        app.state.archiver = asyncio.create_task(_archive_loop())
+
+
+@app.on_event("shutdown")
+async def stop_archiver():
+    task = getattr(app.state, "archiver", None)
+    if task is not None:
+        task.cancel()
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -61,6 +151,11 @@ async def debug_ocr():
     return {"provider": provider, "model": model}
 
 
+@app.get("/debug/cache")
+async def debug_cache():
+    return {"stats": dict(cache_stats)}
+
+
 @app.get("/", response_class=HTMLResponse)
 async def read_frontend():
     with open("frontend.html", "r", encoding="utf-8") as f:
@@ -143,84 +238,283 @@ KNOWLEDGE_BASE = """
 - עבודה "בשחור" מסכנת את העובד, אין זכויות
 """
 
-# Configure OpenAI/Groq API
-def setup_api():
-    """Setup OpenAI client for Groq API"""
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        raise HTTPException(status_code=500, detail="OPENAI_API_KEY is not set")
-    client = OpenAI(
-        api_key=api_key,
-        base_url="https://api.groq.com/openai/v1"
-    )
-    return client
+_kb_path = os.getenv("KNOWLEDGE_BASE_PATH")
+if _kb_path:
+    with open(_kb_path, "r", encoding="utf-8") as f:
+        KNOWLEDGE_BASE = f.read()
+
+# Prompts include only the KB sections relevant to the slip/question
+KB_TOP_K = int(os.getenv("KB_TOP_K", "4"))
+KB_TOKEN_BUDGET = int(os.getenv("KB_TOKEN_BUDGET", "600"))
+KB_INDEX = SectionIndex(KNOWLEDGE_BASE)
+# /ask sends slips longer than ASK_CONTEXT_TOKENS as their top BM25 chunks only
+ASK_TOP_CHUNKS = int(os.getenv("ASK_TOP_CHUNKS", "6"))
+ASK_CONTEXT_TOKENS = int(os.getenv("ASK_CONTEXT_TOKENS", "1200"))
+
+def get_llm_client() -> AsyncOpenAI:
+    """Return the pooled async SDK client of :data:`LLM`, created on first use.
+
+    The client keeps its HTTP connections alive between requests, so only the
+    first call pays for the TLS handshake.
+    """
+    try:
+        return LLM.async_client
+    except LLMError as exc:
+        raise HTTPException(status_code=500, detail=str(exc))
+
+
+@asynccontextmanager
+async def llm_slot():
+    """Hold one of the LLM_MAX_CONCURRENCY request slots; 503 if none frees up in time."""
+    try:
+        await asyncio.wait_for(_llm_slots.acquire(), timeout=LLM_QUEUE_SECONDS)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=503, detail="Too many LLM requests in progress, try again shortly")
+    try:
+        yield
+    finally:
+        _llm_slots.release()
+
+
+def llm_busy(exc: LLMBusy) -> HTTPException:
+    """503 telling the caller when the LLM quota frees up again."""
+    return HTTPException(status_code=503, detail="שירות הבינה המלאכותית עמוס כרגע. נסה שוב בעוד מספר שניות.",
+                         headers={"Retry-After": str(int(exc.retry_after) + 1)})
+
+
+async def chat_completion(messages, **kwargs) -> str:
+    """Run a non-streaming chat completion on the shared client."""
+    client = get_llm_client()
+    async with llm_slot():
+        try:
+            return await LLM.acomplete(messages, client=client, **kwargs)
+        except LLMBusy as exc:
+            raise llm_busy(exc) from None
+
+
+@app.on_event("shutdown")
+async def close_llm_client():
+    await LLM.aclose()
 
 def calculate_file_hash(file_content):
     """Calculate hash of file content"""
     return hashlib.md5(file_content).hexdigest()
 
-def _ocr_bytes(img_bytes: bytes) -> str:
-    """Run OCR on image bytes via the configured backend."""
+def extraction_fingerprint() -> str:
+    """Short hash of the OCR provider and the settings that shape extracted text.
+
+    Part of the extraction cache key, so switching provider or retuning OCR
+    re-extracts instead of serving text produced under the old setup.
+    """
+    provider = _ocr_provider()
+    settings = {
+        "provider": provider,
+        "scale": [SCALE, OCR_MIN_SCALE, OCR_MAX_PIXELS],
+        "progressive": [PROGRESSIVE_SCALE, OCR_MIN_CONFIDENCE, OCR_MIN_CHARS] if PROGRESSIVE else None,
+        "layout": [OCR_TEXT_COVERAGE, OCR_MIN_REGION_PT],
+        "max_pages": MAX_OCR_PAGES,
+        "rotations": MAX_ROTATION_ATTEMPTS,
+    }
+    if provider == "gemini":
+        settings["gemini"] = [GEMINI_MODEL, GEMINI_IMAGE_FORMAT, GEMINI_BATCH_PAGES]
+    elif provider == "tesseract":
+        settings["tesseract"] = TESSERACT_LANG
+    return hashlib.sha256(json.dumps(settings, sort_keys=True).encode()).hexdigest()[:16]
+
+def calculate_content_key(file_content: bytes, kind: str) -> str:
+    """Content-addressed key for the raw uploaded bytes (extraction cache)."""
+    return f"{kind}:{extraction_fingerprint()}:{hashlib.sha256(file_content).hexdigest()}"
+
+def _is_pdf(content_type: str, filename: str | None) -> bool:
+    return content_type in [
+        "application/pdf",
+        "application/x-pdf",
+        "application/octet-stream",
+    ] or (filename or "").lower().endswith(".pdf")
+
+def _ocr_bytes(image: bytes) -> str:
+    """Run OCR on encoded image bytes via the configured backend."""
     try:
-        return ocr_image_bytes(img_bytes)
+        text, angle, attempts = ocr_image_with_rotation(image)
     except Exception as exc:
         log.exception("OCR failure")
         raise RuntimeError("OCR failed") from exc
+    log.info("OCR image: %d chars, rotation=%d, rotation_attempts=%d", len(text), angle, attempts)
+    return text
+
+
+def _ocr_page(image: RawImage) -> tuple[str, float | None]:
+    """OCR raw page samples; returns ``(text, confidence)``, see :func:`ocr_samples_with_confidence`."""
+    try:
+        text, confidence, angle, attempts = ocr_samples_with_confidence(image)
+    except Exception as exc:
+        log.exception("OCR failure")
+        raise RuntimeError("OCR failed") from exc
+    log.info("OCR page: %d chars, confidence=%s, rotation=%d, rotation_attempts=%d",
+             len(text), confidence, angle, attempts)
+    return text, confidence
+
+
+def _ocr_batch(images: List[RawImage]) -> List[tuple[str, float | None]]:
+    """OCR several pages in one backend request (Gemini), one ``(text, confidence)`` per page."""
+    if len(images) == 1:
+        return [_ocr_page(images[0])]
+    try:
+        texts = ocr_samples_batch(images)
+    except Exception as exc:
+        log.exception("Batch OCR failure")
+        raise RuntimeError("OCR failed") from exc
+    log.info("OCR batch: %d pages in one request", len(images))
+    return [(text, None) for text in texts]
+
+
+def _needs_rerender(text: str, confidence: float | None) -> bool:
+    """Whether low-scale OCR output is too weak to keep (progressive mode)."""
+    if confidence is not None:
+        return confidence < OCR_MIN_CONFIDENCE
+    return len(text) < OCR_MIN_CHARS
+
+
+def _ocr_regions(doc, layouts: List[PageLayout], region_texts: Dict[Region, str], deadline: float) -> tuple[int, bool]:
+    """OCR the regions of *layouts* concurrently, filling *region_texts*.
+
+    A region is an image area of a page that no text covers, or the whole
+    page for image-only pages (see :func:`analyze_page`).  Regions are
+    rendered on the calling thread (PyMuPDF documents are not thread-safe)
+    while earlier ones are OCR'd in a small pool.  At most ``MAX_OCR_PAGES``
+    regions may yield text; a region that comes back empty frees its slot for
+    the next one.  If the whole document is still empty once that budget is
+    spent, the remaining regions are OCR'd as a fallback through the same
+    pool.  Work still pending at *deadline* is cancelled.  With Gemini, up to
+    ``GEMINI_BATCH_PAGES`` regions share one request.
+
+    Each page is rendered at its own scale (see :func:`page_render_scale`).
+    In progressive mode regions are first OCR'd at ``PROGRESSIVE_SCALE`` and
+    re-queued at full scale when the OCR confidence is below
+    ``OCR_MIN_CONFIDENCE``, or, without a confidence, when the text is
+    shorter than ``OCR_MIN_CHARS``.
+
+    Returns the number of regions that produced text and whether OCR finished
+    before *deadline* (``False`` means *region_texts* may be incomplete).
+    """
+    units = [(idx, r) for idx, layout in enumerate(layouts) for r in range(len(layout.regions))]
+    if not units:
+        return 0, True
+
+    full_scale = {idx: page_render_scale(doc[idx], SCALE) for idx, _ in units}
+    queue = deque(
+        (unit, min(PROGRESSIVE_SCALE, full_scale[unit[0]]) if PROGRESSIVE else full_scale[unit[0]])
+        for unit in units
+    )
+    running: Dict[Future, List[tuple[Region, float]]] = {}
+    in_flight = 0
+    used = 0
+    limit = MAX_OCR_PAGES
+    fallback = False
+    timed_out = False
+    batch = max(1, GEMINI_BATCH_PAGES) if _ocr_provider() == "gemini" else 1
+    workers = max(1, min(OCR_PAGE_WORKERS, len(units)))
+    has_text = any(layout.text for layout in layouts)
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ocr-page")
+    try:
+        while True:
+            while queue and len(running) < workers and used + in_flight < limit:
+                if time.perf_counter() > deadline:
+                    timed_out = True
+                    break
+                take = min(batch, len(queue), limit - used - in_flight)
+                jobs = [queue.popleft() for _ in range(take)]
+                images = []
+                for (idx, r), scale in jobs:
+                    layout = layouts[idx]
+                    clip = None if layout.regions[r] == doc[idx].rect else layout.regions[r]
+                    images.append(render_page(doc[idx], scale, clip))
+                running[pool.submit(_ocr_batch, images)] = jobs
+                in_flight += take
+
+            if not running:
+                if queue and not fallback and not has_text and not any(region_texts.values()):
+                    log.info("OCR budget spent without text, retrying %d skipped regions", len(queue))
+                    fallback = True
+                    limit = len(units) + used
+                    continue
+                break
+
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                log.warning("OCR timeout budget hit with %d regions pending", in_flight + len(queue))
+                timed_out = True
+                break
+            done, _ = wait(running, timeout=remaining, return_when=FIRST_COMPLETED)
+            for fut in done:
+                jobs = running.pop(fut)
+                in_flight -= len(jobs)
+                for (unit, scale), (text, confidence) in zip(jobs, fut.result()):
+                    region_texts[unit] = text
+                    if scale < full_scale[unit[0]] and _needs_rerender(text, confidence):
+                        log.info("Page %d region %d: %d chars, confidence %s at scale %.2f, re-rendering at %.2f",
+                                 unit[0], unit[1], len(text), confidence, scale, full_scale[unit[0]])
+                        queue.appendleft((unit, full_scale[unit[0]]))
+                        continue
+                    if text:
+                        used += 1
+    finally:
+        for fut in running:
+            fut.cancel()
+        pool.shutdown(wait=False, cancel_futures=True)
+    return used, not timed_out
 
 
 def extract_text_from_pdf(pdf_content):
-    """Extract text from PDF using OCR for image-only pages.
+    """Extract text from PDF; returns ``(text, ocr_pages_used, elapsed)``.
+
+    See :func:`_extract_pdf`.
+    """
+    return _extract_pdf(pdf_content)[:3]
 
-    If initial extraction returns no text (e.g. due to a very low OCR page budget),
-    a second pass will OCR any skipped pages.
+def _extract_pdf(pdf_content):
+    """Extract text from PDF, OCR'ing only what the text layer lacks.
+
+    Each page is analysed with :func:`analyze_page`: image-only pages are
+    OCR'd whole, and on hybrid pages only the image regions not covered by
+    text are.  OCR runs concurrently within the ``MAX_OCR_PAGES`` and
+    ``MAX_TOTAL_SECONDS`` budgets; see :func:`_ocr_regions`.  Page order is
+    preserved in the returned text.
+
+    Returns ``(text, ocr_pages_used, elapsed, complete)``; *complete* is
+    ``False`` when the time budget cut analysis or OCR short.
     """
     start = time.perf_counter()
-    ocr_pages_used = 0
-    page_texts: List[str] = []
-    pending_ocr: List[tuple[int, bytes]] = []
+    deadline = start + MAX_TOTAL_SECONDS
     try:
         with fitz.open(stream=pdf_content, filetype="pdf") as doc:
             page_count = doc.page_count
+            layouts: List[PageLayout] = []
             for idx, page in enumerate(doc):
-                if (time.perf_counter() - start) > MAX_TOTAL_SECONDS:
+                if time.perf_counter() > deadline:
                     log.warning("OCR timeout budget hit at page %s", idx)
                     break
-                direct = (page.get_text("text") or "").strip()
-                if direct:
-                    page_texts.append(direct)
-                    continue
-                pix = page.get_pixmap(matrix=MATRIX, alpha=False, colorspace=fitz.csGRAY)
-                if ocr_pages_used >= MAX_OCR_PAGES:
-                    pending_ocr.append((idx, pix.tobytes("png")))
-                    page_texts.append("")
-                    continue
-                text = _ocr_bytes(pix.tobytes("png"))
-                page_texts.append(text)
-                if text:
-                    ocr_pages_used += 1
+                layouts.append(analyze_page(page))
 
-        full_text = "\n\n".join(t for t in page_texts if t).strip()
+            region_texts: Dict[Region, str] = {}
+            ocr_pages_used, complete = _ocr_regions(doc, layouts, region_texts, deadline)
+            complete = complete and len(layouts) == page_count
 
-        if not full_text and pending_ocr:
-            for idx, data in pending_ocr:
-                if (time.perf_counter() - start) > MAX_TOTAL_SECONDS:
-                    log.warning("OCR timeout during fallback at page %s", idx)
-                    break
-                text = _ocr_bytes(data)
-                page_texts[idx] = text
-                if text:
-                    ocr_pages_used += 1
-            full_text = "\n\n".join(t for t in page_texts if t).strip()
+        page_texts = [
+            merge_page(layout, {r: t for (i, r), t in region_texts.items() if i == idx})
+            for idx, layout in enumerate(layouts)
+        ]
+        full_text = "\n\n".join(t for t in page_texts if t).strip()
 
         elapsed = time.perf_counter() - start
         log.info(
-            "Extracted %d chars using %d OCR pages in %.2fs (pages=%d)",
+            "Extracted %d chars using %d OCR regions in %.2fs (pages=%d)",
             len(full_text),
             ocr_pages_used,
             elapsed,
             page_count,
         )
-        return full_text, ocr_pages_used, elapsed
+        return full_text, ocr_pages_used, elapsed, complete
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"PDF open failed: {str(e)[:200]}")
 
@@ -231,23 +525,73 @@ def extract_text_from_image(image_content):
     except Exception:
         raise HTTPException(status_code=400, detail="שגיאה ב-OCR של התמונה.")
 
-def explain_payslip_with_knowledge(text, client):
-    """Get AI explanation of the payslip with knowledge base context"""
-    try:
-        messages = [
-            {
-                "role": "system", 
-                "content": f"""אתה מומחה לתלושי שכר בישראל עם ידע מעמיק על החוק הישראלי. 
+def extract_upload(data: bytes, kind: str):
+    """Extract text from an uploaded PDF or image, reusing cached results.
+
+    Returns ``(text, ocr_pages_used, elapsed)``.  Identical uploads are served
+    from the extraction cache without any rasterization or OCR.  Only
+    extractions that finished within the time budget are cached, so a
+    timed-out partial result is retried on the next upload.
+    """
+    key = calculate_content_key(data, kind)
+    cached = get_cached_extraction(key)
+    if cached is not None:
+        log.info("Extraction cache hit: %s", key[:16])
+        return cached["text"], cached["ocr_pages_used"], cached["elapsed"]
+
+    if kind == "pdf":
+        text, ocr_pages_used, elapsed, complete = _extract_pdf(data)
+    else:
+        start = time.perf_counter()
+        text = extract_text_from_image(data)
+        elapsed = time.perf_counter() - start
+        ocr_pages_used = 1 if text else 0
+        complete = True
 
-{KNOWLEDGE_BASE}
+    # Empty results may be OCR failures, so only non-empty finished extractions are cached
+    if text and complete:
+        cache_extraction(key, text, ocr_pages_used, elapsed)
+    return text, ocr_pages_used, elapsed
+
+async def run_extraction(data: bytes, kind: str):
+    """Run :func:`extract_upload` in the extraction pool.
+
+    Waits at most ``EXTRACT_QUEUE_SECONDS`` for a free worker and answers 503
+    when the pool stays saturated, so callers never pile up indefinitely.
+    The slot is held until the worker finishes, even when the caller is
+    cancelled (e.g. by the compare deadline), since the thread keeps running.
+    """
+    try:
+        await asyncio.wait_for(_extract_slots.acquire(), timeout=EXTRACT_QUEUE_SECONDS)
+    except asyncio.TimeoutError:
+        log.warning("Extraction queue full, rejecting request")
+        raise HTTPException(status_code=503, detail="השרת עמוס כרגע. נסה שוב בעוד מספר שניות.")
+    try:
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(_extract_pool, extract_upload, data, kind)
+    except BaseException:
+        _extract_slots.release()
+        raise
+    future.add_done_callback(lambda _: _extract_slots.release())
+    return await asyncio.shield(future)
+
+def _explain_messages(text):
+    """Chat messages asking for a detailed explanation of *text*."""
+    kb = KB_INDEX.render(text, KB_TOP_K, KB_TOKEN_BUDGET)
+    messages = [
+        {
+            "role": "system", 
+            "content": f"""אתה מומחה לתלושי שכר בישראל עם ידע מעמיק על החוק הישראלי. 
+
+{kb}
 
 השתמש בידע זה כדי לתת הסבר מדויק, מפורט וברור על תלוש השכר. 
 הסבר את המשמעות של כל ניכוי, תוספת ומס בהתבסס על החוק הישראלי.
 השתמש בעברית פשוטה וברורה."""
-            },
-            {
-                "role": "user", 
-                "content": f"""הנה תוכן התלוש שלי:
+        },
+        {
+            "role": "user", 
+            "content": f"""הנה תוכן התלוש שלי:
 
 {text}
 
@@ -260,34 +604,63 @@ def explain_payslip_with_knowledge(text, client):
 6. איזה זכויות יש לי כעובד?
 
 תן לי הסבר מפורט ומובן בעברית עם התייחסות לחוק הישראלי."""
-            }
-        ]
-        
-        response = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=messages,
-            temperature=0.3,
-            max_tokens=3000
-        )
-        
-        return response.choices[0].message.content
+        }
+    ]
+    return messages
+
+async def explain_payslip_with_knowledge(text):
+    """Get AI explanation of the payslip with knowledge base context"""
+    try:
+        messages = _explain_messages(text)
+
+        return await chat_completion(messages, temperature=0.3, max_tokens=3000)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"שגיאה בקבלת הסבר מהבינה המלאכותית: {str(e)}")
 
-def compare_payslips_with_ai(payslips_data, client):
-    """Compare multiple payslips using AI with knowledge base"""
+def _slip_names(payslips_data):
+    return [p["filename"] or f"תלוש {i+1}" for i, p in enumerate(payslips_data)]
+
+def chronological(payslips_data):
+    """*payslips_data* sorted by pay period, and whether that order is known.
+
+    Slips are left in upload order unless every slip states its period.
+    """
+    order = chronological_order([p["extracted_text"] for p in payslips_data])
+    if order is None:
+        return list(payslips_data), False
+    return [payslips_data[i] for i in order], True
+
+def comparison_table(payslips_data) -> List[DiffRow]:
+    """Line-item diff of the slips, in the order given."""
+    return diff_line_items([parse_line_items(p["extracted_text"]) for p in payslips_data])
+
+async def compare_payslips_with_ai(payslips_data, table: List[DiffRow], in_period_order: bool = False):
+    """Comment on the locally computed comparison *table* using AI with knowledge base.
+
+    Only the compact diff is sent; the full slip texts are used only when no
+    line items could be parsed at all.  The prompt only calls the table
+    chronological when *in_period_order* is set.
+    """
     try:
-        # Prepare payslips text for comparison
-        payslips_text = ""
-        for i, payslip in enumerate(payslips_data):
-            payslips_text += f"=== תלוש {i+1}: {payslip['filename']} ===\n{payslip['extracted_text']}\n\n"
-        
+        if table:
+            payslips_text = render_diff(table, _slip_names(payslips_data))
+            order = "לפי הסדר מהמוקדם למאוחר" if in_period_order else "לפי סדר ההעלאה (תקופת התלושים לא זוהתה)"
+            note = f"\nהטבלה חושבה מתוך התלושים, {order}; הסכומים בה מדויקים ואין צורך לחשב אותם מחדש:"
+        else:
+            note = ""
+            payslips_text = ""
+            for i, payslip in enumerate(payslips_data):
+                payslips_text += f"=== תלוש {i+1}: {payslip['filename']} ===\n{payslip['extracted_text']}\n\n"
+        kb = KB_INDEX.render(payslips_text, KB_TOP_K, KB_TOKEN_BUDGET)
+
         messages = [
             {
                 "role": "system", 
                 "content": f"""אתה מומחה לתלושי שכר בישראל עם ידע מעמיק על החוק הישראלי.
 
-{KNOWLEDGE_BASE}
+{kb}
 
 תפקידך לבצע השוואה מפורטת בין תלושי שכר ולהתריע על:
 1. הבדלים בשכר ותוספות
@@ -300,12 +673,12 @@ def compare_payslips_with_ai(payslips_data, client):
             },
             {
                 "role": "user", 
-                "content": f"""אנא השווה בין התלושים הבאים ותן ניתוח מפורט:
+                "content": f"""אנא השווה בין התלושים הבאים ותן ניתוח מפורט.{note}
 
 {payslips_text}
 
 אני מעוניין לקבל:
-1. טבלת השוואה של הסכומים העיקריים
+1. הסבר לשינויים העיקריים בסכומים
 2. ניתוח ההבדלים והסיבות האפשריות
 3. האם יש בעיות או שגיאות
 4. מגמות שכדאי לשים לב אליהן
@@ -315,26 +688,22 @@ def compare_payslips_with_ai(payslips_data, client):
             }
         ]
         
-        response = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=messages,
-            temperature=0.3,
-            max_tokens=4000
-        )
-        
-        return response.choices[0].message.content
+        return await chat_completion(messages, temperature=0.3, max_tokens=4000)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"שגיאה בהשוואת תלושים: {str(e)}")
 
-def answer_question_with_context(question, context, previous_analysis, client):
+async def answer_question_with_context(question, context, previous_analysis):
     """Answer user question with payslip context and knowledge base"""
     try:
+        kb = KB_INDEX.render(f"{question}\n{context}", KB_TOP_K, KB_TOKEN_BUDGET)
         messages = [
             {
                 "role": "system", 
                 "content": f"""אתה מומחה לתלושי שכר בישראל עם ידע מעמיק על החוק הישראלי.
 
-{KNOWLEDGE_BASE}
+{kb}
 
 ענה על שאלות המשתמש בהתבסס על:
 1. הקונטקסט של תלוש השכר שלו
@@ -358,21 +727,13 @@ def answer_question_with_context(question, context, previous_analysis, client):
             }
         ]
         
-        response = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=messages,
-            temperature=0.3,
-            max_tokens=2000
-        )
-        
-        return response.choices[0].message.content
+        return await chat_completion(messages, temperature=0.3, max_tokens=2000)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"שגיאה בקבלת תשובה: {str(e)}")
 
 # Pydantic models
-# Setup AI client for other endpoints
-client = setup_api()
-
 @app.post("/analyze-payslip")
 async def analyze_payslip(file: UploadFile = File(...)):
     data = await file.read()
@@ -390,19 +751,11 @@ async def analyze_payslip(file: UploadFile = File(...)):
     )
 
     ct = (file.content_type or "").lower()
-    is_pdf = ct in [
-        "application/pdf",
-        "application/x-pdf",
-        "application/octet-stream",
-    ] or file.filename.lower().endswith(".pdf")
 
-    if is_pdf:
-        full_text, ocr_pages_used, elapsed = extract_text_from_pdf(data)
+    if _is_pdf(ct, file.filename):
+        full_text, ocr_pages_used, elapsed = await run_extraction(data, "pdf")
     elif ct.startswith("image/"):
-        start = time.perf_counter()
-        full_text = extract_text_from_image(data)
-        elapsed = time.perf_counter() - start
-        ocr_pages_used = 1 if full_text else 0
+        full_text, ocr_pages_used, elapsed = await run_extraction(data, "image")
     else:
         raise HTTPException(
             status_code=400,
@@ -416,7 +769,7 @@ async def analyze_payslip(file: UploadFile = File(...)):
         )
 
     meta = {"filename": file.filename, "size": len(data), "content_type": file.content_type}
-    pid = save_payslip(full_text, meta)
+    pid = await run_db(save_payslip, full_text, meta)
 
     log.info(
         "Analyze done: chars=%d ocr_pages_used=%d elapsed=%.2fs",
@@ -437,50 +790,197 @@ class AskBody(BaseModel):
     payslip_id: str | None = None
 
 
-@app.post("/ask", response_class=JSONResponse)
-async def ask(body: AskBody):
-    pid = body.payslip_id or latest_payslip_id()
+@lru_cache(maxsize=32)
+def _chunk_index(text: str) -> ChunkIndex:
+    return ChunkIndex(text)
+
+
+def ask_context(text: str, question: str) -> str:
+    """The part of the slip *text* to send with *question*.
+
+    Slips within ``ASK_CONTEXT_TOKENS`` go whole; longer (multi-page) ones are
+    cut to the chunks that rank highest for the question, so prompt size stays
+    roughly constant however many pages the slip has.
+    """
+    if estimate_tokens(text) <= ASK_CONTEXT_TOKENS:
+        return text
+    return _chunk_index(text).render(question, ASK_TOP_CHUNKS, ASK_CONTEXT_TOKENS)
+
+
+def _ask_messages(context, question):
+    system = (
+        "You are an expert on Israeli payslips. Provide detailed, helpful answers in Hebrew. "
+        "Explain the reasoning and break down relevant numbers."
+    )
+    return [
+        {"role": "system", "content": system},
+        {
+            "role": "user",
+            "content": f"מידע תלוש:\n{context}\n\nשאלה:\n{question}",
+        },
+    ]
+
+
+_NIQQUD = re.compile(r"[\u0591-\u05C7]")
+_PUNCT = re.compile(r"[^\w\s]")
+
+
+def normalize_question(question: str) -> str:
+    """Fold a question to a canonical form for the answer cache.
+
+    Unicode-normalizes, drops Hebrew niqqud and punctuation, lowercases and
+    collapses whitespace, so "מה הברוטו שלי?" and " מה  הברוטו שלי " match.
+    """
+    text = unicodedata.normalize("NFKC", question)
+    text = _NIQQUD.sub("", text)
+    text = _PUNCT.sub(" ", text.lower())
+    return " ".join(text.split())
+
+
+def answer_cache_key(context: str, question: str) -> str:
+    content_hash = hashlib.sha256(context.encode("utf-8")).hexdigest()
+    raw = "|".join([LLM_MODEL, ASK_PROMPT_VERSION, content_hash, normalize_question(question)])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+async def _resolve_payslip(payslip_id: str | None):
+    pid = payslip_id or await run_db(latest_payslip_id)
     if not pid:
         raise HTTPException(status_code=400, detail="אין תלוש שמור. העלה תלוש קודם.")
-
-    context = get_payslip(pid)
+    context = await run_db(get_payslip, pid)
     if not context:
         raise HTTPException(status_code=404, detail="תלוש לא נמצא.")
+    return pid, context
+
 
+def _sse(payload: dict, event: str | None = None) -> str:
+    head = f"event: {event}\n" if event else ""
+    return f"{head}data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+async def _stream_completion(pid: str, messages, max_tokens: int | None = None, cache_key: str | None = None):
+    """Yield SSE events for a streamed chat completion.
+
+    Tokens are forwarded as ``data: {"delta": ...}`` events as they arrive,
+    followed by an ``event: done`` (or ``event: error``).  If the client
+    disconnects, Starlette cancels this generator and the upstream request
+    is closed in ``finally``.  With *cache_key*, a cached answer is sent as a
+    single delta and a completed answer is stored.
+    """
+    if cache_key:
+        cached = await run_db(get_cached_answer, cache_key)
+        if cached is not None:
+            yield _sse({"payslip_id": pid}, event="start")
+            yield _sse({"delta": cached})
+            yield _sse({"payslip_id": pid, "cached": True}, event="done")
+            return
+
+    stream = None
+    parts = []
     try:
-        from openai import OpenAI
-        import os
-        client = OpenAI(
-            base_url="https://api.groq.com/openai/v1",
-            api_key=os.getenv("OPENAI_API_KEY"),
-        )
-        system = (
-            "You are an expert on Israeli payslips. Provide detailed, helpful answers in Hebrew. "
-            "Explain the reasoning and break down relevant numbers."
-        )
-        messages = [
-            {"role": "system", "content": system},
-            {
-                "role": "user",
-                "content": f"מידע תלוש:\n{context}\n\nשאלה:\n{body.question}",
-            },
-        ]
-        resp = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=messages,
-            stream=False,
-            timeout=60,
-        )
-        answer = resp.choices[0].message.content
+        yield _sse({"payslip_id": pid}, event="start")
+        client = get_llm_client()
+        # The slot is held until the last token: a stream is one request
+        async with llm_slot():
+            stream = await LLM.acreate(
+                client=client,
+                model=LLM_MODEL,
+                messages=messages,
+                temperature=0.3,
+                max_tokens=max_tokens,
+                stream=True,
+            )
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    parts.append(delta)
+                    yield _sse({"delta": delta})
+        if cache_key and parts:
+            await run_db(cache_answer, cache_key, "".join(parts))
+        yield _sse({"payslip_id": pid}, event="done")
+    except asyncio.CancelledError:
+        log.info("Client disconnected, cancelling LLM stream for %s", pid)
+        raise
+    except HTTPException as e:
+        yield _sse({"detail": e.detail}, event="error")
+    except LLMBusy as e:
+        yield _sse({"detail": llm_busy(e).detail, "retry_after": e.retry_after}, event="error")
+    except Exception as e:
+        yield _sse({"detail": f"LLM error: {str(e)[:200]}"}, event="error")
+    finally:
+        if stream is not None:
+            await stream.close()
+
+
+def _event_stream(events) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/ask", response_class=JSONResponse)
+async def ask(body: AskBody):
+    pid, context = await _resolve_payslip(body.payslip_id)
+    key = answer_cache_key(context, body.question)
+    cached = await run_db(get_cached_answer, key)
+    if cached is not None:
+        return {"ok": True, "payslip_id": pid, "answer": cached, "cached": True}
+
+    try:
+        answer = await chat_completion(_ask_messages(ask_context(context, body.question), body.question))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=502, detail=f"LLM error: {str(e)[:200]}")
 
+    if answer:
+        await run_db(cache_answer, key, answer)
     return {"ok": True, "payslip_id": pid, "answer": answer}
 
 
+@app.post("/ask/stream")
+async def ask_stream(body: AskBody):
+    """Streaming variant of ``/ask``: the answer arrives as Server-Sent Events."""
+    pid, context = await _resolve_payslip(body.payslip_id)
+    key = answer_cache_key(context, body.question)
+    messages = _ask_messages(ask_context(context, body.question), body.question)
+    return _event_stream(_stream_completion(pid, messages, cache_key=key))
+
+
+class ExplainBody(BaseModel):
+    payslip_id: str | None = None
+
+
+@app.post("/explain/stream")
+async def explain_stream(body: ExplainBody):
+    """Stream a full explanation of a stored payslip as Server-Sent Events."""
+    pid, context = await _resolve_payslip(body.payslip_id)
+    return _event_stream(_stream_completion(pid, _explain_messages(context), max_tokens=3000))
+
+
 @app.get("/history", response_class=JSONResponse)
 async def history():
-    return {"ok": True, "items": list_payslips(20)}
+    return {"ok": True, "items": await run_db(list_payslips, 20)}
+
+
+@app.get("/search", response_class=JSONResponse)
+async def search(q: str, limit: int = 20, cursor: str | None = None, order: str = "rank"):
+    """Ranked full-text search over stored payslips, with snippets.
+
+    Pass the returned ``next_cursor`` as ``cursor`` for the next page;
+    ``order=recent`` lists matches newest first instead of by relevance.
+    Relevance ranking covers the newest ``SEARCH_RANK_CANDIDATES`` matches,
+    so the oldest hits for a very common term only appear with ``recent``.
+    """
+    try:
+        page = await run_db(search_payslips, q, limit, cursor, order)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="חיפוש לא תקין.")
+    return {"ok": True, **page}
 
 
 @app.post("/debug/echo")
@@ -491,6 +991,33 @@ async def debug_echo(file: UploadFile = File(None)):
         "content_type": getattr(file, "content_type", None) if file else None,
     }
 
+async def _extract_for_compare(file: UploadFile) -> dict:
+    """Extract one compare upload; failures are returned as ``{"error": ...}``, not raised."""
+    data = await file.read()
+    ct = (file.content_type or "").lower()
+    if not data:
+        return {"filename": file.filename, "error": "הקובץ ריק"}
+    if len(data) > MAX_BYTES:
+        return {"filename": file.filename, "error": "הקובץ גדול מדי (מעל 8MB)"}
+    if _is_pdf(ct, file.filename):
+        kind = "pdf"
+    elif ct.startswith("image/"):
+        kind = "image"
+    else:
+        return {"filename": file.filename, "error": "סוג קובץ לא נתמך"}
+
+    try:
+        extracted_text, _, _ = await run_extraction(data, kind)
+    except HTTPException as e:
+        return {"filename": file.filename, "error": e.detail}
+    except Exception as e:
+        log.exception("Compare extraction failed for %s", file.filename)
+        return {"filename": file.filename, "error": str(e)[:200]}
+
+    if not extracted_text or not extracted_text.strip():
+        return {"filename": file.filename, "error": "לא הצלחתי לחלץ טקסט"}
+    return {"filename": file.filename, "extracted_text": extracted_text}
+
 @app.post("/compare-payslips")
 async def compare_payslips(files: List[UploadFile] = File(...)):
     """Compare multiple payslip files"""
@@ -500,51 +1027,49 @@ async def compare_payslips(files: List[UploadFile] = File(...)):
     if len(files) > 5:
         raise HTTPException(status_code=400, detail="ניתן להשוות עד 5 תלושים בו-זמנית")
     
-    payslips_data = []
-    
-    # Process each file
-    for i, file in enumerate(files):
-        # Read file content
-        file_content = await file.read()
-        
-        # Extract text based on file type
-        ct = (file.content_type or "").lower()
-        is_pdf = ct in [
-            "application/pdf",
-            "application/x-pdf",
-            "application/octet-stream",
-        ] or file.filename.lower().endswith(".pdf")
-
-        if is_pdf:
-            extracted_text, _, _ = extract_text_from_pdf(file_content)
-        elif ct.startswith("image/"):
-            extracted_text = extract_text_from_image(file_content)
-        else:
-            raise HTTPException(status_code=400, detail=f"קובץ {file.filename}: סוג קובץ לא נתמך")
-        
-        if not extracted_text or not extracted_text.strip():
-            raise HTTPException(status_code=400, detail=f"לא הצלחתי לחלץ טקסט מקובץ {file.filename}")
-        
-        payslips_data.append({
-            "filename": file.filename,
-            "extracted_text": extracted_text
-        })
-    
-    # Get AI comparison analysis
-    comparison_analysis = compare_payslips_with_ai(payslips_data, client)
-    
-    # Save comparison to database using existing helper
+    # Extract all files concurrently under one deadline; a file that fails or
+    # runs out of time is reported in "failed" instead of failing the request
+    tasks = [asyncio.create_task(_extract_for_compare(f)) for f in files]
+    done, pending = await asyncio.wait(tasks, timeout=COMPARE_TOTAL_SECONDS)
+    for task in pending:
+        task.cancel()
+    results = [
+        task.result() if task in done else {"filename": f.filename, "error": "תם הזמן לחילוץ הטקסט"}
+        for task, f in zip(tasks, files)
+    ]
+    payslips_data = [r for r in results if "error" not in r]
+    failed = [r for r in results if "error" in r]
+    if len(payslips_data) < 2:
+        raise HTTPException(
+            status_code=400,
+            detail={"message": "נדרשים לפחות 2 תלושים שחולץ מהם טקסט להשוואה", "failed": failed},
+        )
+
+    # Month-over-month deltas only make sense oldest first
+    payslips_data, in_period_order = chronological(payslips_data)
     for payslip in payslips_data:
         meta = {
             "filename": payslip["filename"],
             "file_hash": calculate_file_hash(payslip["extracted_text"].encode()),
-            "comparison_analysis": comparison_analysis,
         }
-        save_payslip(payslip["extracted_text"], meta)
+        payslip["payslip_id"] = await run_db(save_payslip, payslip["extracted_text"], meta)
+
+    # Diff the slips locally; the AI only comments on the compact table.
+    # The analysis is stored once with references to the slips
+    table = comparison_table(payslips_data)
+    comparison_analysis = await compare_payslips_with_ai(payslips_data, table, in_period_order)
+    comparison_id = await run_db(save_comparison, [p["payslip_id"] for p in payslips_data], comparison_analysis)
     
     return {
         "success": True,
+        "comparison_id": comparison_id,
         "payslips": payslips_data,
+        "failed": failed,
+        "comparison_table": {
+            "slips": _slip_names(payslips_data),
+            "chronological": in_period_order,
+            "rows": [row._asdict() for row in table],
+        },
         "comparison_analysis": comparison_analysis,
         "total_files": len(files)
     }
@@ -0,0 +1,82 @@
+"""Insert and read throughput of the payslip store.
+
+Compares the old access pattern (a fresh ``sqlite3`` connection plus
+``PRAGMA journal_mode=WAL`` per call, default ``synchronous=FULL``) with
+``db.py``'s per-thread connections and tuned pragmas.  Each mode writes
+*rows* payslips of realistic size into its own temporary database, then reads
+them back by id.
+
+Usage::
+
+    python benchmarks/bench_db.py [rows]
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+_TEXT = "שכר יסוד 12,345.00 מס הכנסה 1,234.00 ביטוח לאומי 456.78 נטו לתשלום 9,876.54\n" * 30
+
+
+def _old_conn(path):
+    con = sqlite3.connect(path)
+    con.execute("PRAGMA journal_mode=WAL;")
+    return con
+
+
+def _old_save(path, text, meta):
+    pid = str(uuid.uuid4())
+    con = _old_conn(path)
+    con.execute("INSERT INTO payslips (id, text, meta, created_at) VALUES (?, ?, ?, ?)",
+                (pid, text, json.dumps(meta or {}), time.time()))
+    con.commit(); con.close()
+    return pid
+
+
+def _old_get(path, pid):
+    con = _old_conn(path)
+    row = con.execute("SELECT text FROM payslips WHERE id = ?", (pid,)).fetchone()
+    con.close()
+    return row[0] if row else None
+
+
+def _measure(label, save, get, rows):
+    start = time.perf_counter()
+    ids = [save(f"{_TEXT}תלוש {i}", {"filename": f"slip-{i}.pdf"}) for i in range(rows)]
+    writes = rows / (time.perf_counter() - start)
+    random.shuffle(ids)
+    start = time.perf_counter()
+    for pid in ids:
+        assert get(pid)
+    reads = rows / (time.perf_counter() - start)
+    print(f"{label:>4}: {writes:9.0f} inserts/s  {reads:9.0f} reads/s")
+
+
+def main() -> None:
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    tmp = tempfile.mkdtemp(prefix="bench-db-")
+    os.environ["DB_PATH"] = os.path.join(tmp, "new.db")
+    import db
+
+    db.init_db()
+    old_path = os.path.join(tmp, "old.db")
+    con = _old_conn(old_path)
+    con.execute("CREATE TABLE payslips (id TEXT PRIMARY KEY, text TEXT NOT NULL, meta TEXT, created_at REAL)")
+    con.commit(); con.close()
+
+    print(f"{rows} payslips of {len(_TEXT.encode())} bytes")
+    _measure("old", lambda t, m: _old_save(old_path, t, m), lambda pid: _old_get(old_path, pid), rows)
+    _measure("new", db.save_payslip, db.get_payslip, rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Database size and read latency of compressed and archived payslips.
+
+Writes *rows* synthetic Hebrew payslips three ways and reports the vacuumed
+file size and ``get_payslip`` latency for each:
+
+* ``plain``    -- uncompressed text/meta, as stored before compression
+* ``packed``   -- ``db.save_payslip`` (zlib with the payslip dictionary)
+* ``archived`` -- packed, then moved into segments by ``archive_payslips``
+
+Every mode carries the same full-text index (plain rows are indexed with
+``backfill_search``).  Its ``payslips_fts*`` tables are reported on their own
+when SQLite has the ``dbstat`` table, so the ratio compares payslip storage
+only.
+
+Reads of archived rows are timed cold (segment cache cleared before every
+read) and warm (segment already decompressed).
+
+Usage::
+
+    python benchmarks/bench_db_storage.py [rows]
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+def _slip(i: int) -> str:
+    r = random.Random(i)
+    return "\n".join([
+        f"תלוש שכר לחודש {r.choice(['ינואר', 'מאי', 'יולי', 'נובמבר'])} 2025",
+        f"שם העובד: עובד {i}   תעודת זהות: {r.randint(10**8, 10**9 - 1)}",
+        f"שכר יסוד {r.randint(8000, 20000):,}.00",
+        f"שעות נוספות 125% {r.randint(0, 20)} {r.randint(0, 2000):,}.00",
+        f"דמי נסיעות {r.randint(200, 600)}.00   דמי הבראה {r.randint(0, 2000)}.00",
+        f"סה\"כ תשלומים {r.randint(9000, 25000):,}.00",
+        f"מס הכנסה {r.randint(500, 4000):,}.00   ביטוח לאומי {r.randint(100, 1500):,}.00",
+        f"ביטוח בריאות {r.randint(100, 900)}.00   פנסיה עובד 6% {r.randint(400, 1200)}.00",
+        f"קרן השתלמות עובד 2.5% {r.randint(100, 600)}.00",
+        f"סה\"כ ניכויים {r.randint(1500, 7000):,}.00   שכר נטו {r.randint(7000, 18000):,}.00",
+        f"ימי חופשה יתרה {r.randint(0, 30)}   ימי מחלה יתרה {r.randint(0, 60)}",
+    ])
+
+
+def _size(db) -> tuple[int, int | None]:
+    """Vacuumed file size and the search index's share of it (None without dbstat)."""
+    con = db._conn()
+    with con:  # merge FTS segments, so row-by-row and batched indexing compare equal
+        con.execute("INSERT INTO payslips_fts (payslips_fts) VALUES ('optimize')")
+    con.execute("VACUUM")
+    total = con.execute("PRAGMA page_count").fetchone()[0] * con.execute("PRAGMA page_size").fetchone()[0]
+    if not con.execute("SELECT 1 FROM pragma_compile_options WHERE compile_options = 'ENABLE_DBSTAT_VTAB'").fetchone():
+        return total, None
+    index = con.execute("SELECT coalesce(sum(pgsize), 0) FROM dbstat WHERE name LIKE 'payslips_fts%' "
+                        "OR name LIKE 'sqlite_autoindex_payslips_fts%'").fetchone()[0]
+    return total, index
+
+
+def _read_us(db, ids, cold=False, warm=False) -> float:
+    samples = []
+    for pid in ids:
+        if cold:
+            db._load_segment.cache_clear()
+        if warm:
+            db.get_payslip(pid)
+        start = time.perf_counter()
+        assert db.get_payslip(pid)
+        samples.append((time.perf_counter() - start) * 1e6)
+    return statistics.median(samples)
+
+
+def main() -> None:
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    tmp = tempfile.mkdtemp(prefix="bench-storage-")
+    import db
+
+    texts = [_slip(i) for i in range(rows)]
+    meta = {"filename": "slip.pdf", "size": 123456, "content_type": "application/pdf"}
+    raw = sum(len(t.encode()) for t in texts)
+    print(f"{rows} payslips, {raw / rows:.0f} bytes of text each")
+
+    for mode in ("plain", "packed", "archived"):
+        db.DB_PATH = os.path.join(tmp, f"{mode}.db")
+        db.init_db()
+        if mode == "plain":
+            ids = [str(uuid.UUID(int=i)) for i in range(rows)]  # same width as save_payslip's ids
+            with db._conn() as con:
+                con.executemany("INSERT INTO payslips (id, text, meta, created_at, content_hash) VALUES (?, ?, ?, ?, ?)",
+                                [(pid, t, json.dumps(meta), 0.0, db.content_hash(t)) for pid, t in zip(ids, texts)])
+            db.backfill_search()
+        else:
+            ids = [db.save_payslip(t, meta) for t in texts]
+        if mode == "archived":
+            db.archive_payslips(older_than_days=-1)
+        sample = random.Random(0).sample(ids, min(500, rows))
+        total, index = _size(db)
+        stored = total - (index or 0)
+        line = f"{mode:>8}: {stored / 1024:9.0f} KB  ({raw / stored:4.1f}x text)"
+        line += f" + {index / 1024:6.0f} KB index" if index is not None else " incl. index"
+        line += f"  read {_read_us(db, sample):7.1f} us"
+        if mode == "archived":
+            line += f" ({_read_us(db, sample, warm=True):.1f} us warm, {_read_us(db, sample, cold=True):.1f} us cold)"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""GroqClient throughput and backoff against the local stub server.
+
+Starts ``llm.stub_server`` with a requests-per-window quota and sends
+*requests* chat completions from *threads* concurrent callers, twice:
+
+* ``reactive`` -- no client-side limiter; the client learns the quota from
+  429s and backs off per ``Retry-After``
+* ``paced``    -- the client's token bucket set to the same quota
+
+and reports wall time, 429s received and retries for each.
+
+Usage::
+
+    python benchmarks/bench_llm_client.py [requests] [threads]
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from llm import GroqClient, RateLimiter, TokenBucket  # noqa: E402
+from llm.stub_server import StubServer  # noqa: E402
+
+WINDOW = 2.0  # seconds; a scaled-down "minute"
+QUOTA = 20  # requests per window
+
+
+def run(mode: str, requests: int, threads: int) -> None:
+    with StubServer(rpm=QUOTA, window=WINDOW, latency=0.01) as stub:
+        limiter = RateLimiter(rpm=0, tpm=0)
+        if mode == "paced":  # the stub's quota, in scaled-down minutes
+            limiter.requests = TokenBucket(QUOTA * 60 / WINDOW, capacity=QUOTA)
+        client = GroqClient(api_key="stub", base_url=stub.base_url, limiter=limiter, max_retries=20, max_wait=60)
+        client.answer("warm-up")
+        stub.stats.clear()
+        time.sleep(WINDOW)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(threads) as pool:
+            list(pool.map(lambda i: client.answer(f"q{i}"), range(requests)))
+        elapsed = time.perf_counter() - start
+        ideal = max(0, requests - QUOTA) / QUOTA * WINDOW
+        print(f"{mode:>9}: {elapsed:6.2f} s (quota floor {ideal:.2f} s)  "
+              f"429s {stub.stats['rate_limited']:4d}  server requests {stub.stats['requests']:4d}")
+        client.close()
+
+
+def main() -> None:
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    print(f"{requests} requests, {threads} threads, quota {QUOTA} per {WINDOW:.0f} s")
+    for mode in ("reactive", "paced"):
+        run(mode, requests, threads)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Field extraction throughput over a corpus of synthetic payslips.
+
+Compares three ways of pulling the same fields out of slip text:
+
+* ``per-label`` -- one ``re.search`` per label variant, the natural extension
+  of the old two-regex ``parse_fields``
+* ``scan``      -- ``extract_fields``: one compiled pass over the text
+* ``cached``    -- ``parse_fields`` on slips already parsed once
+
+Usage::
+
+    python benchmarks/bench_parser.py [slips] [repeat]
+"""
+
+from __future__ import annotations
+
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from parser.fields import FIELDS, _parse_cached, extract_fields, parse_fields  # noqa: E402
+
+_TEMPLATES = (
+    "{label} {amount}",
+    "{label}: {amount}",
+    "{label} {qty} {rate} {amount}",
+    "{amount} {label}",
+)
+
+
+def _slip(i: int) -> str:
+    r = random.Random(i)
+    lines = [f"תלוש שכר לחודש {r.randint(1, 12):02d}/2025", f"שם העובד: עובד {i}", f"תעודת זהות: {r.randint(10**8, 10**9 - 1)}"]
+    for field, variants in FIELDS.items():
+        if r.random() < 0.2:
+            continue
+        lines.append(r.choice(_TEMPLATES).format(
+            label=r.choice(variants),
+            amount=f"{r.uniform(100, 20000):,.2f}",
+            qty=r.randint(1, 30),
+            rate=f"{r.uniform(10, 500):.2f}",
+        ))
+        lines += [f"הערה {r.randint(1, 99)}: פירוט נוסף לשורה" for _ in range(r.randint(0, 3))]
+    lines.append("נתונים מצטברים")
+    lines += [f"{v[0]} {r.uniform(10000, 200000):,.2f}" for v in (FIELDS["gross_salary"], FIELDS["income_tax"])]
+    return "\n".join(lines)
+
+
+_NUM = r"[-−]?(?:\d{1,3}(?:,\d{3})+|\d+)(?:\.\d+)?"
+_PER_LABEL = [
+    (field, re.compile(re.escape(variant) + r"[^\d\n]{0,16}?(" + _NUM + r")", re.IGNORECASE))
+    for field, variants in FIELDS.items()
+    for variant in variants
+]
+
+
+def _per_label(text: str) -> dict:
+    fields = {}
+    for field, pattern in _PER_LABEL:
+        if field not in fields:
+            match = pattern.search(text)
+            if match:
+                fields[field] = float(match.group(1).replace(",", ""))
+    return fields
+
+
+def _time(fn, corpus, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in corpus:
+            fn(text)
+    return (time.perf_counter() - start) / (repeat * len(corpus)) * 1e6
+
+
+def main() -> None:
+    slips = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    corpus = [_slip(i) for i in range(slips)]
+    found = sum(len(extract_fields(t)) for t in corpus) / slips
+    print(f"{slips} slips, {sum(map(len, corpus)) / slips:.0f} chars, {found:.1f} fields found per slip")
+    _parse_cached.cache_clear()
+    for text in corpus:
+        parse_fields(text)
+    for name, fn in (("per-label", _per_label), ("scan", extract_fields), ("cached", parse_fields)):
+        print(f"{name:>10}: {_time(fn, corpus, repeat):8.1f} us/slip")
+
+
+if __name__ == "__main__":
+    main()
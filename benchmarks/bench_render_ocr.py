@@ -0,0 +1,79 @@
+"""Per-page CPU and peak memory of the render -> OCR handoff.
+
+Compares the old path (pixmap -> PNG bytes -> ``Image.open`` -> PNG re-encode
+for Gemini) with the raw-samples path (pixmap -> ``Image.frombuffer`` -> one
+fast PNG encode).  OCR itself is not called; only the image plumbing that
+precedes it is measured.  Each mode runs in a fresh interpreter so peak RSS
+is comparable.
+
+Usage::
+
+    python benchmarks/bench_render_ocr.py [pages] [scale]
+"""
+
+from __future__ import annotations
+
+import io
+import os
+import resource
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+def _scanned_pdf(pages: int) -> bytes:
+    from PIL import Image, ImageDraw
+
+    imgs = []
+    for n in range(pages):
+        img = Image.new("L", (1240, 1754), 255)  # A4 at 150 DPI
+        draw = ImageDraw.Draw(img)
+        for row in range(60):
+            draw.text((60, 60 + row * 27), f"page {n} row {row} gross 12,345.00 net 9,876.54 " * 2, fill=0)
+        imgs.append(img)
+    buf = io.BytesIO()
+    imgs[0].save(buf, format="PDF", save_all=True, append_images=imgs[1:], resolution=150)
+    return buf.getvalue()
+
+
+def _run(mode: str, pages: int, scale: float) -> None:
+    import fitz
+    from PIL import Image
+
+    from src.gemini_ocr import _encode
+    from src.ocr import RawImage, image_from_samples
+
+    pdf = _scanned_pdf(pages)
+    matrix = fitz.Matrix(scale, scale)
+    base_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    cpu = time.process_time()
+    with fitz.open(stream=pdf, filetype="pdf") as doc:
+        for page in doc:
+            pix = page.get_pixmap(matrix=matrix, alpha=False, colorspace=fitz.csGRAY)
+            if mode == "old":
+                img = Image.open(io.BytesIO(pix.tobytes("png")))
+                buf = io.BytesIO()
+                img.save(buf, format="PNG")
+            else:
+                raw = RawImage(pix.samples, pix.width, pix.height, pix.stride, pix.colorspace.name)
+                _encode(image_from_samples(raw))
+    cpu = (time.process_time() - cpu) / pages
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - base_rss
+    print(f"{mode:>4}: {cpu * 1000:8.1f} ms CPU/page   peak RSS +{peak / 1024:7.1f} MB")
+
+
+def main() -> None:
+    pages = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    scale = float(sys.argv[2]) if len(sys.argv) > 2 else 3.0
+    if len(sys.argv) > 3:
+        _run(sys.argv[3], pages, scale)
+        return
+    print(f"{pages} pages at scale {scale}")
+    for mode in ("old", "new"):
+        subprocess.run([sys.executable, __file__, str(pages), str(scale), mode], check=True)
+
+
+if __name__ == "__main__":
+    main()
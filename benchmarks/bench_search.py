@@ -0,0 +1,71 @@
+"""Full-text search latency over many payslips.
+
+Inserts *rows* synthetic Hebrew payslips through ``db.save_payslip`` (which
+indexes them) and times ``search_payslips`` for a rare term, a common term
+(first page and a deep keyset page) and an amount, plus the index size.
+
+Usage::
+
+    python benchmarks/bench_search.py [rows]
+"""
+
+from __future__ import annotations
+
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from bench_db_storage import _slip  # noqa: E402
+
+
+def _ms(fn, repeat: int = 20) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1e3)
+    return statistics.median(samples)
+
+
+def main() -> None:
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    import db
+
+    db.DB_PATH = os.path.join(tempfile.mkdtemp(prefix="bench-search-"), "search.db")
+    db.init_db()
+    start = time.perf_counter()
+    for i in range(rows):
+        db.save_payslip(_slip(i) + ("\nמענק יובל 5,000.00" if i % 1000 == 0 else ""), {})
+    print(f"{rows} payslips saved and indexed in {time.perf_counter() - start:.1f} s")
+
+    con = db._conn()
+    pages = con.execute("SELECT COUNT(*) FROM dbstat WHERE name LIKE 'payslips_fts%'").fetchone()[0] \
+        if con.execute("SELECT 1 FROM pragma_compile_options WHERE compile_options = 'ENABLE_DBSTAT_VTAB'").fetchone() else None
+    if pages is not None:
+        print(f"index: {pages * con.execute('PRAGMA page_size').fetchone()[0] / 1024:.0f} KB")
+
+    deep = {}
+
+    def walk(n=10):
+        cursor = None
+        for _ in range(n):
+            cursor = db.search_payslips("הבראה", 20, cursor)["next_cursor"]
+        deep["cursor"] = cursor
+
+    cases = {
+        "rare term (מענק)": lambda: db.search_payslips("מענק"),
+        "common term, page 1": lambda: db.search_payslips("הבראה"),
+        "common term, recent": lambda: db.search_payslips("הבראה", order="recent"),
+        "amount (5,000)": lambda: db.search_payslips("5,000"),
+        "10 pages deep": walk,
+    }
+    for name, fn in cases.items():
+        print(f"{name:>22}: {_ms(fn, 5 if fn is walk else 20):8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,133 @@
-import sqlite3, os, json, time, uuid
+import sqlite3, os, json, re, time, uuid, asyncio, threading, hashlib, zlib, codecs
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
+from src.kb.retrieval import tokenize as _word_variants
 # Simple SQLite storage for payslip text
 DB_PATH = os.getenv("DB_PATH", "payslips.db")
 
+# Connection tuning, applied once per connection
+DB_CACHE_SIZE_KB = int(os.getenv("DB_CACHE_SIZE_KB", str(16 * 1024)))
+DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", str(64 * 1024 * 1024)))
+DB_STATEMENT_CACHE = int(os.getenv("DB_STATEMENT_CACHE", "256"))
+# Threads behind run_db(); each keeps its own connection
+DB_THREADS = int(os.getenv("DB_THREADS", "4"))
+
+# Payslip text/meta are stored zlib-compressed (see _pack) when that saves space
+DB_COMPRESS_MIN_BYTES = int(os.getenv("DB_COMPRESS_MIN_BYTES", "128"))
+# archive_payslips() packs rows older than this into shared compressed segments
+ARCHIVE_AFTER_DAYS = float(os.getenv("ARCHIVE_AFTER_DAYS", "90"))
+ARCHIVE_SEGMENT_ROWS = int(os.getenv("ARCHIVE_SEGMENT_ROWS", "256"))
+ARCHIVE_CACHE_SEGMENTS = int(os.getenv("ARCHIVE_CACHE_SEGMENTS", "8"))  # decompressed, per process
+
+# search_payslips(): page size cap and snippet width (characters)
+SEARCH_MAX_LIMIT = int(os.getenv("SEARCH_MAX_LIMIT", "100"))
+SEARCH_SNIPPET_CHARS = int(os.getenv("SEARCH_SNIPPET_CHARS", "160"))
+# order="rank" scores only the newest this many matches with BM25, so broad
+# terms cost the same per page however many payslips contain them
+SEARCH_RANK_CANDIDATES = int(os.getenv("SEARCH_RANK_CANDIDATES", "1000"))
+# backfill_search() indexes existing rows this many per write transaction
+SEARCH_BACKFILL_ROWS = int(os.getenv("SEARCH_BACKFILL_ROWS", "500"))
+
+# Extraction cache limits (keyed by a hash of the uploaded bytes)
+EXTRACT_CACHE_MAX_BYTES = int(os.getenv("EXTRACT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+EXTRACT_CACHE_MAX_AGE = float(os.getenv("EXTRACT_CACHE_MAX_AGE_DAYS", "30")) * 86400
+
+# Answer cache for /ask (keyed by payslip content + normalized question + prompt version)
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL_HOURS", "168")) * 3600
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "5000"))
+
+# Hit/miss counters for the caches above, per process
+cache_stats = Counter()
+
+_local = threading.local()
+_db_pool = ThreadPoolExecutor(max_workers=DB_THREADS, thread_name_prefix="db")
+
 def _conn():
-    con = sqlite3.connect(DB_PATH)
-    con.execute("PRAGMA journal_mode=WAL;")
+    """Return this thread's connection to DB_PATH, opening it on first use.
+
+    Connections stay open for the life of the thread, so the pragmas run once
+    and sqlite3's per-connection statement cache keeps queries prepared.  Use
+    as ``with _conn() as con:`` to commit (or roll back) without closing.
+    """
+    con = getattr(_local, "con", None)
+    if con is not None and _local.path == DB_PATH:
+        return con
+    if con is not None:
+        con.close()
+    con = sqlite3.connect(DB_PATH, cached_statements=DB_STATEMENT_CACHE)
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute("PRAGMA synchronous=NORMAL")  # durable enough with WAL, no fsync per commit
+    con.execute(f"PRAGMA cache_size=-{DB_CACHE_SIZE_KB}")
+    con.execute(f"PRAGMA mmap_size={DB_MMAP_SIZE}")
+    con.execute("PRAGMA busy_timeout=5000")
+    _local.con, _local.path = con, DB_PATH
     return con
 
-def init_db():
-    con = _conn()
+async def run_db(fn, *args):
+    """Await ``fn(*args)`` on the db thread pool instead of blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_db_pool, partial(fn, *args))
+
+# Preset dictionary for zlib: vocabulary common to Israeli payslips, most
+# frequent last.  Short texts compress about 1.8x better with it.  Stored blobs
+# depend on it byte for byte, so never edit it; add a new codec instead.
+_ZDICT_V1 = " ".join("""
+ינואר פברואר מרץ אפריל מאי יוני יולי אוגוסט ספטמבר אוקטובר נובמבר דצמבר
+בנק סניף חשבון תאריך הפקה תקופת תשלום כתובת מספר תיק ניכויים שם המעסיק
+חלקיות משרה מצב משפחתי נקודות זיכוי תאריך תחילת עבודה ותק תוספת ותק
+כוננות פרמיה בונוס עמלות החזר הוצאות טלפון שווי רכב שווי ארוחות
+ביטוח מנהלים אובדן כושר עבודה פיצויים קרן השתלמות מעסיק פנסיה מעסיק
+ימי עבודה שעות עבודה תעריף כמות סכום צבירה ניצול יתרה מצטבר שנתי חודשי
+ימי מחלה יתרת מחלה ימי חופשה יתרת חופשה ניכויי חובה ניכויי רשות
+ברוטו למס ברוטו לביטוח לאומי דמי בריאות ביטוח בריאות ביטוח לאומי מס הכנסה
+קרן השתלמות עובד פנסיה עובד סה"כ ניכויים שכר נטו נטו לתשלום
+שעות נוספות 125% 150% דמי הבראה דמי נסיעות שכר ברוטו סה"כ תשלומים
+תלוש שכר לחודש שם העובד תעודת זהות שכר יסוד
+""".split()).encode("utf-8")
+
+_ZLIB_DICT_V1 = b"\x01"  # codec tag: raw deflate with _ZDICT_V1
+
+def _pack(value: str | None):
+    """Compress *value* for storage; short or incompressible values stay plain text."""
+    if value is None:
+        return None
+    raw = value.encode("utf-8")
+    if len(raw) < DB_COMPRESS_MIN_BYTES:
+        return value
+    z = zlib.compressobj(9, zlib.DEFLATED, -15, zdict=_ZDICT_V1)
+    blob = _ZLIB_DICT_V1 + z.compress(raw) + z.flush()
+    return blob if len(blob) < len(raw) else value
+
+def _unpack(value):
+    """Inverse of _pack; plain text (including rows written before compression) passes through."""
+    if not isinstance(value, bytes):
+        return value
+    if value[:1] != _ZLIB_DICT_V1:
+        raise ValueError(f"unknown payslip codec {value[:1]!r}")
+    z = zlib.decompressobj(-15, zdict=_ZDICT_V1)
+    return (z.decompress(value[1:]) + z.flush()).decode("utf-8")
+
+def _unpack_pieces(value, chunk: int = 1024):
+    """Yield the text of a _pack'ed *value* about *chunk* bytes at a time."""
+    if not isinstance(value, bytes):
+        yield value
+        return
+    if value[:1] != _ZLIB_DICT_V1:
+        raise ValueError(f"unknown payslip codec {value[:1]!r}")
+    z = zlib.decompressobj(-15, zdict=_ZDICT_V1)
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    data = value[1:]
+    while data:
+        out = z.decompress(data, chunk)
+        data = z.unconsumed_tail
+        if out:
+            yield utf8.decode(out)
+    tail = utf8.decode(z.flush(), final=True)
+    if tail:
+        yield tail
+
+def _create_tables(con):
     con.execute("""
     CREATE TABLE IF NOT EXISTS payslips (
       id TEXT PRIMARY KEY,
@@ -17,33 +136,434 @@ def init_db():
       created_at REAL
     )
     """)
-    con.commit(); con.close()
+    con.execute("""
+    CREATE TABLE IF NOT EXISTS extraction_cache (
+      key TEXT PRIMARY KEY,
+      text TEXT NOT NULL,
+      ocr_pages_used INTEGER NOT NULL,
+      elapsed REAL NOT NULL,
+      size INTEGER NOT NULL,
+      created_at REAL NOT NULL,
+      last_used REAL NOT NULL
+    )
+    """)
+    con.execute("""
+    CREATE TABLE IF NOT EXISTS answer_cache (
+      key TEXT PRIMARY KEY,
+      answer TEXT NOT NULL,
+      created_at REAL NOT NULL,
+      last_used REAL NOT NULL
+    )
+    """)
+    con.execute("CREATE INDEX IF NOT EXISTS idx_answer_cache_last_used ON answer_cache(last_used)")
 
-def save_payslip(text: str, meta: dict) -> str:
-    pid = str(uuid.uuid4())
+def _add_content_hash(con):
+    # Only the oldest copy of duplicated text gets the hash; later copies keep
+    # NULL (distinct under UNIQUE) so existing ids stay valid.
+    con.execute("ALTER TABLE payslips ADD COLUMN content_hash TEXT")
+    seen, updates = set(), []
+    for pid, text in con.execute("SELECT id, text FROM payslips ORDER BY created_at, id"):
+        h = content_hash(text)
+        if h not in seen:
+            seen.add(h)
+            updates.append((h, pid))
+    con.executemany("UPDATE payslips SET content_hash = ? WHERE id = ?", updates)
+    con.execute("CREATE UNIQUE INDEX idx_payslips_content_hash ON payslips(content_hash)")
+    con.execute("CREATE INDEX idx_payslips_created_at ON payslips(created_at)")
+
+def _add_archive(con):
+    # Archived payslips keep their row (id, hash, created_at) with empty text
+    # and meta; the content lives in archive_segments.data, keyed by id.
+    con.execute("ALTER TABLE payslips ADD COLUMN segment INTEGER")
+    con.execute("""
+    CREATE TABLE archive_segments (
+      id INTEGER PRIMARY KEY,
+      data BLOB NOT NULL,
+      rows INTEGER NOT NULL,
+      created_at REAL NOT NULL
+    )
+    """)
+
+def _add_comparisons(con):
+    con.execute("""
+    CREATE TABLE comparisons (
+      id TEXT PRIMARY KEY,
+      payslip_ids TEXT NOT NULL,
+      analysis,
+      created_at REAL NOT NULL
+    )
+    """)
+    con.execute("CREATE INDEX idx_comparisons_created_at ON comparisons(created_at)")
+
+def _add_search(con):
+    # Contentless FTS5 index (the text itself stays compressed in payslips);
+    # payslips_fts_ids gives each payslip the stable integer rowid FTS needs.
+    # Existing rows are indexed by backfill_search(), outside this transaction.
+    con.execute("CREATE TABLE payslips_fts_ids (rowid INTEGER PRIMARY KEY, payslip_id TEXT NOT NULL UNIQUE)")
+    con.execute("CREATE VIRTUAL TABLE payslips_fts USING fts5(body, content='', tokenize='unicode61 remove_diacritics 2')")
+
+def _add_last_seen(con):
+    # When the text was last saved; re-uploading a duplicate bumps this (and
+    # so moves it to the top of the list) while created_at, which drives
+    # archiving, keeps the first upload time.
+    con.execute("ALTER TABLE payslips ADD COLUMN last_seen REAL")
+    con.execute("UPDATE payslips SET last_seen = created_at")
+    con.execute("CREATE INDEX idx_payslips_last_seen ON payslips(last_seen)")
+
+# Schema history; PRAGMA user_version records how many have been applied.
+# Append new steps, never edit or reorder applied ones.
+MIGRATIONS = [_create_tables, _add_content_hash, _add_archive, _add_comparisons, _add_search,
+              _add_last_seen]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+def migrate(con) -> int:
+    """Apply pending migrations, each in its own transaction; return the schema version.
+
+    BEGIN IMMEDIATE takes the write lock before the version is read, so
+    several processes starting together apply each step exactly once.
+    """
+    while True:
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            version = con.execute("PRAGMA user_version").fetchone()[0]
+            if version >= len(MIGRATIONS):
+                con.rollback()
+                return version
+            MIGRATIONS[version](con)
+            con.execute(f"PRAGMA user_version = {version + 1}")
+            con.commit()
+        except BaseException:
+            con.rollback()
+            raise
+
+def init_db():
+    migrate(_conn())
+    backfill_search()
+
+def backfill_search(batch: int = SEARCH_BACKFILL_ROWS) -> int:
+    """Index payslips missing from the search index; return how many were added.
+
+    Rows are read and tokenized *batch* at a time without a lock, and each
+    batch is written in its own short transaction, so workers starting
+    together on a large database never wait long for the write lock.  Safe to
+    run concurrently; a no-op once every row is indexed.
+    """
     con = _conn()
-    con.execute("INSERT INTO payslips (id, text, meta, created_at) VALUES (?, ?, ?, ?)",
-                (pid, text, json.dumps(meta or {}), time.time()))
-    con.commit(); con.close()
-    return pid
+    if con.execute("SELECT (SELECT count(*) FROM payslips) <= (SELECT count(*) FROM payslips_fts_ids)").fetchone()[0]:
+        return 0
+    added, last = 0, 0
+    while True:
+        rows = con.execute("SELECT rowid, id, text, segment FROM payslips WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                           (last, batch)).fetchall()
+        if not rows:
+            return added
+        last = rows[-1][0]
+        ids = [row[1] for row in rows]
+        indexed = {pid for (pid,) in con.execute(
+            f"SELECT payslip_id FROM payslips_fts_ids WHERE payslip_id IN ({','.join('?' * len(ids))})", ids)}
+        docs = []
+        for _, pid, text, segment in rows:
+            if pid not in indexed:
+                text = _load_segment(DB_PATH, segment)[pid][0] if segment is not None else _unpack(text)
+                docs.append((pid, " ".join(search_tokens(text))))
+        if not docs:
+            continue
+        with con:
+            con.execute("BEGIN IMMEDIATE")
+            for pid, body in docs:
+                cur = con.execute("INSERT OR IGNORE INTO payslips_fts_ids (payslip_id) VALUES (?)", (pid,))
+                if cur.rowcount:  # another worker may have indexed it meanwhile
+                    con.execute("INSERT INTO payslips_fts (rowid, body) VALUES (?, ?)", (cur.lastrowid, body))
+                    added += 1
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def save_payslip(text: str, meta: dict) -> str:
+    """Store *text* and return its id.
+
+    Saving identical text again returns the existing id and marks it as the
+    most recently seen payslip.
+    """
+    pid, h, now = str(uuid.uuid4()), content_hash(text), time.time()
+    with _conn() as con:
+        saved = con.execute("INSERT INTO payslips (id, text, meta, created_at, last_seen, content_hash) "
+                            "VALUES (?, ?, ?, ?, ?, ?) "
+                            "ON CONFLICT(content_hash) DO UPDATE SET last_seen = excluded.last_seen RETURNING id",
+                            (pid, _pack(text), _pack(json.dumps(meta or {}, ensure_ascii=False)), now, now, h)
+                            ).fetchone()[0]
+        if saved == pid:
+            _index_payslip(con, pid, text)
+    return saved
 
 def get_payslip(pid: str) -> str | None:
-    con = _conn()
-    cur = con.execute("SELECT text FROM payslips WHERE id = ?", (pid,))
-    row = cur.fetchone()
-    con.close()
-    return row[0] if row else None
+    row = _conn().execute("SELECT text, segment FROM payslips WHERE id = ?", (pid,)).fetchone()
+    if not row:
+        return None
+    if row[1] is not None:
+        return _load_segment(DB_PATH, row[1])[pid][0]
+    return _unpack(row[0])
+
+@lru_cache(maxsize=ARCHIVE_CACHE_SEGMENTS)
+def _load_segment(path: str, segment: int) -> dict:
+    # Segments are immutable once written; *path* only keys the cache
+    row = _conn().execute("SELECT data FROM archive_segments WHERE id = ?", (segment,)).fetchone()
+    return json.loads(_unpack(row[0]))
+
+def archive_payslips(older_than_days: float = ARCHIVE_AFTER_DAYS, batch: int = ARCHIVE_SEGMENT_ROWS) -> int:
+    """Move payslips older than *older_than_days* into compressed archive segments.
+
+    Rows are packed *batch* at a time into one segment, which compresses far
+    better than row by row.  get_payslip() reads archived rows transparently.
+    Returns the number of rows archived.
+    """
+    cutoff = time.time() - older_than_days * 86400
+    moved = 0
+    while True:
+        with _conn() as con:
+            rows = con.execute("SELECT id, text, meta FROM payslips WHERE segment IS NULL AND created_at < ? "
+                               "ORDER BY created_at LIMIT ?", (cutoff, batch)).fetchall()
+            if not rows:
+                return moved
+            data = {pid: [_unpack(text), _unpack(meta)] for pid, text, meta in rows}
+            cur = con.execute("INSERT INTO archive_segments (data, rows, created_at) VALUES (?, ?, ?)",
+                              (_pack(json.dumps(data, ensure_ascii=False)), len(rows), time.time()))
+            con.executemany("UPDATE payslips SET text = '', meta = NULL, segment = ? WHERE id = ?",
+                            [(cur.lastrowid, pid) for pid, _, _ in rows])
+        moved += len(rows)
 
 def latest_payslip_id() -> str | None:
-    con = _conn()
-    cur = con.execute("SELECT id FROM payslips ORDER BY created_at DESC LIMIT 1")
-    row = cur.fetchone()
-    con.close()
+    row = _conn().execute("SELECT id FROM payslips ORDER BY last_seen DESC LIMIT 1").fetchone()
     return row[0] if row else None
 
 def list_payslips(limit:int=20):
+    cur = _conn().execute("SELECT id, created_at FROM payslips ORDER BY last_seen DESC LIMIT ?", (limit,))
+    return [{"id": r[0], "created_at": r[1]} for r in cur.fetchall()]
+
+# Full-text search.  Text is indexed as normalized tokens rather than raw:
+# amounts lose their thousands separators ("12,000.00" -> "12000"), niqqud and
+# geresh/gershayim are dropped (סה"כ -> סהכ), and Hebrew words are indexed with
+# their one- and two-letter prefixes stripped too (בהבראה -> הבראה, בראה).
+_SEARCH_TOKEN = re.compile(r"\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d+(?:\.\d+)?|\w+\*?")
+_NIQQUD = re.compile("[\u0591-\u05c7]")
+_GERESH = str.maketrans("", "", "\"'\u05f3\u05f4\u201c\u201d")
+
+def _search_terms(token: str) -> list[str]:
+    """Index terms for one raw token; amounts keep their integer part only."""
+    if token[0].isdigit():
+        return [token.replace(",", "").split(".")[0]]
+    return _word_variants(token)
+
+def search_tokens(text: str) -> list[str]:
+    """Normalized index terms for *text* (see the comment above)."""
+    text = _NIQQUD.sub("", text).translate(_GERESH).lower()
+    terms = []
+    for token in _SEARCH_TOKEN.findall(text):
+        terms.extend(_search_terms(token.rstrip("*")))
+    return terms
+
+def _index_payslip(con, pid: str, text: str) -> None:
+    cur = con.execute("INSERT INTO payslips_fts_ids (payslip_id) VALUES (?)", (pid,))
+    con.execute("INSERT INTO payslips_fts (rowid, body) VALUES (?, ?)", (cur.lastrowid, " ".join(search_tokens(text))))
+
+def _match_query(query: str) -> tuple[str, list[str], list[str]]:
+    """Return (FTS5 MATCH expression, exact terms, prefixes) for a user query.
+
+    Every query word must match (AND); a word also matches with one prefix
+    letter stripped, and a trailing ``*`` makes it a prefix search.
+    """
+    groups, exact, prefixes = [], [], []
+    for token in _SEARCH_TOKEN.findall(_NIQQUD.sub("", query).translate(_GERESH).lower()):
+        if token.endswith("*") and not token[0].isdigit():
+            prefixes.append(token[:-1])
+            groups.append(f'"{token[:-1]}"*')
+            continue
+        terms = _search_terms(token)[:2]  # the word or one prefix off; deeper stems overmatch
+        exact.extend(terms)
+        groups.append("(" + " OR ".join(f'"{t}"' for t in terms) + ")")
+    return " AND ".join(groups), exact, prefixes
+
+@lru_cache(maxsize=65536)
+def _token_terms(token: str) -> frozenset:
+    return frozenset(search_tokens(token))
+
+def _snippet(text: str, exact: list[str], prefixes: list[str], width: int) -> str:
+    """About *width* characters around the first hit, hits wrapped in [ ]."""
+    return _snippet_window(text, exact, prefixes, width)[0]
+
+_PARTIAL_TOKEN = re.compile(r"\S*\Z")
+
+def _lazy_snippet(pieces, exact: list[str], prefixes: list[str], width: int) -> str:
+    """:func:`_snippet` over text arriving in *pieces*, read only as far as needed.
+
+    Stops once the window around the first hit is complete, so a hit near the
+    top of a long payslip does not decompress the rest of it.
+    """
+    text, pieces = "", iter(pieces)
+    piece = next(pieces, "")
+    while True:
+        text += piece
+        piece = next(pieces, None)
+        if piece is None:
+            break
+        head = text[:_PARTIAL_TOKEN.search(text).start()]  # a token may continue in the next piece
+        snippet, end = _snippet_window(head, exact, prefixes, width)
+        if end is not None and end < len(head):
+            return snippet
+    return _snippet(text, exact, prefixes, width)
+
+def _snippet_window(text: str, exact: list[str], prefixes: list[str], width: int) -> tuple[str, int | None]:
+    """(snippet, end of its window in *text*); the end is None without a hit."""
+    wanted = frozenset(exact)
+    spans, end = [], None
+    for m in _SEARCH_TOKEN.finditer(text):
+        if end is not None and m.end() > end:
+            break
+        terms = _token_terms(m.group())
+        if wanted & terms or prefixes and any(t.startswith(p) for t in terms for p in prefixes):
+            spans.append(m.span())
+            if end is None:
+                start = max(0, m.start() - width // 3)
+                start = text.rfind(" ", 0, start) + 1 if start else 0
+                end = min(len(text), start + width)
+    if not spans:
+        return " ".join(text[:width].split()), None
+    parts, pos = [], start
+    for a, b in spans:
+        parts += [text[pos:a], "[", text[a:b], "]"]
+        pos = b
+    parts.append(text[pos:end])
+    snippet = " ".join("".join(parts).split())
+    return ("…" if start else "") + snippet + ("…" if end < len(text) else ""), end
+
+def search_payslips(query: str, limit: int = 20, cursor: str | None = None, order: str = "rank") -> dict:
+    """Full-text search over all payslips, archived ones included.
+
+    *order* is ``"rank"`` (BM25, best first) or ``"recent"`` (newest first).
+    Ranking is limited to the newest ``SEARCH_RANK_CANDIDATES`` matches; a
+    broad term's older matches are reachable with ``"recent"``.  Pages are
+    keyset-paginated: pass the returned ``next_cursor`` back as *cursor*.
+    Raises ValueError for an empty query, bad cursor or order.
+    """
+    match, exact, prefixes = _match_query(query)
+    if not match:
+        raise ValueError("empty search query")
+    limit = max(1, min(limit, SEARCH_MAX_LIMIT))
+    if order == "rank":
+        sql = ("SELECT rowid, rank FROM payslips_fts WHERE payslips_fts MATCH ? AND rowid >= coalesce("
+               "(SELECT rowid FROM payslips_fts WHERE payslips_fts MATCH ? ORDER BY rowid DESC LIMIT 1 OFFSET ?), 0)")
+        args: list = [match, match, SEARCH_RANK_CANDIDATES - 1]
+        if cursor:
+            score, rowid = cursor.split(":")
+            sql += " AND (rank > ? OR (rank = ? AND rowid > ?))"
+            args += [float(score), float(score), int(rowid)]
+        sql += " ORDER BY rank, rowid LIMIT ?"
+    elif order == "recent":
+        sql = "SELECT rowid, 0 FROM payslips_fts WHERE payslips_fts MATCH ?"
+        args = [match]
+        if cursor:
+            sql += " AND rowid < ?"
+            args.append(int(cursor))
+        sql += " ORDER BY rowid DESC LIMIT ?"
+    else:
+        raise ValueError(f"unknown search order {order!r}")
     con = _conn()
-    cur = con.execute("SELECT id, created_at FROM payslips ORDER BY created_at DESC LIMIT ?", (limit,))
-    rows = [{"id": r[0], "created_at": r[1]} for r in cur.fetchall()]
-    con.close()
-    return rows
+    try:
+        hits = con.execute(sql, args + [limit + 1]).fetchall()
+    except sqlite3.OperationalError as e:  # e.g. a malformed MATCH expression
+        raise ValueError(str(e)) from e
+    more, hits = len(hits) > limit, hits[:limit]
+    rows = {row[0]: row[1:] for row in con.execute(
+        "SELECT f.rowid, p.id, p.created_at, p.text, p.segment FROM payslips_fts_ids f "
+        f"JOIN payslips p ON p.id = f.payslip_id WHERE f.rowid IN ({','.join('?' * len(hits))})",
+        [rowid for rowid, _ in hits])} if hits else {}
+    results = []
+    for rowid, score in hits:
+        pid, created_at, text, segment = rows[rowid]
+        pieces = [_load_segment(DB_PATH, segment)[pid][0]] if segment is not None else _unpack_pieces(text)
+        snippet = _lazy_snippet(pieces, exact, prefixes, SEARCH_SNIPPET_CHARS)
+        item = {"id": pid, "created_at": created_at, "snippet": snippet}
+        if order == "rank":
+            item["score"] = -score  # bm25() is negative, lower is better
+        results.append(item)
+    next_cursor = None
+    if more:
+        rowid, score = hits[-1]
+        next_cursor = f"{score!r}:{rowid}" if order == "rank" else str(rowid)
+    return {"results": results, "next_cursor": next_cursor}
+
+def save_comparison(payslip_ids: list[str], analysis: str) -> str:
+    """Store a comparison of *payslip_ids* once, instead of in every slip's meta."""
+    cid = str(uuid.uuid4())
+    with _conn() as con:
+        con.execute("INSERT INTO comparisons (id, payslip_ids, analysis, created_at) VALUES (?, ?, ?, ?)",
+                    (cid, json.dumps(payslip_ids), _pack(analysis), time.time()))
+    return cid
+
+def get_comparison(cid: str) -> dict | None:
+    row = _conn().execute("SELECT payslip_ids, analysis, created_at FROM comparisons WHERE id = ?", (cid,)).fetchone()
+    if not row:
+        return None
+    return {"id": cid, "payslip_ids": json.loads(row[0]), "analysis": _unpack(row[1]), "created_at": row[2]}
+
+def get_cached_extraction(key: str) -> dict | None:
+    """Return cached extraction for *key* (text + OCR stats) or None."""
+    now = time.time()
+    with _conn() as con:
+        cur = con.execute("SELECT text, ocr_pages_used, elapsed, created_at FROM extraction_cache WHERE key = ?", (key,))
+        row = cur.fetchone()
+        if row and now - row[3] > EXTRACT_CACHE_MAX_AGE:
+            con.execute("DELETE FROM extraction_cache WHERE key = ?", (key,))
+            row = None
+        elif row:
+            con.execute("UPDATE extraction_cache SET last_used = ? WHERE key = ?", (now, key))
+    if not row:
+        cache_stats["extraction_misses"] += 1
+        return None
+    cache_stats["extraction_hits"] += 1
+    return {"text": row[0], "ocr_pages_used": row[1], "elapsed": row[2]}
+
+def cache_extraction(key: str, text: str, ocr_pages_used: int, elapsed: float) -> None:
+    now = time.time()
+    with _conn() as con:
+        con.execute("INSERT OR REPLACE INTO extraction_cache (key, text, ocr_pages_used, elapsed, size, created_at, last_used) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, text, ocr_pages_used, elapsed, len(text.encode("utf-8")), now, now))
+        _prune_extraction_cache(con, now)
+
+def _prune_extraction_cache(con, now: float) -> None:
+    # Age first, then drop least recently used entries until under the byte budget
+    con.execute("DELETE FROM extraction_cache WHERE created_at < ?", (now - EXTRACT_CACHE_MAX_AGE,))
+    con.execute("""
+    DELETE FROM extraction_cache WHERE key IN (
+      SELECT key FROM (
+        SELECT key, SUM(size) OVER (ORDER BY last_used DESC, key) AS running FROM extraction_cache
+      ) WHERE running > ?
+    )
+    """, (EXTRACT_CACHE_MAX_BYTES,))
+
+def get_cached_answer(key: str) -> str | None:
+    now = time.time()
+    with _conn() as con:
+        cur = con.execute("SELECT answer, created_at FROM answer_cache WHERE key = ?", (key,))
+        row = cur.fetchone()
+        if row and now - row[1] > ANSWER_CACHE_TTL:
+            con.execute("DELETE FROM answer_cache WHERE key = ?", (key,))
+            row = None
+        elif row:
+            con.execute("UPDATE answer_cache SET last_used = ? WHERE key = ?", (now, key))
+    cache_stats["answer_hits" if row else "answer_misses"] += 1
+    return row[0] if row else None
+
+def cache_answer(key: str, answer: str) -> None:
+    now = time.time()
+    with _conn() as con:
+        con.execute("INSERT OR REPLACE INTO answer_cache (key, answer, created_at, last_used) VALUES (?, ?, ?, ?)",
+                    (key, answer, now, now))
+        # Expired entries first, then least recently used beyond the entry cap
+        con.execute("DELETE FROM answer_cache WHERE created_at < ?", (now - ANSWER_CACHE_TTL,))
+        con.execute("""
+        DELETE FROM answer_cache WHERE key IN (
+          SELECT key FROM answer_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?
+        )
+        """, (ANSWER_CACHE_MAX_ENTRIES,))
@@ -7,10 +7,10 @@ from fastapi.responses import HTMLResponse, Response
 from pydantic import BaseModel
 
 # Import project modules using the root of ``src`` as PYTHONPATH
-from ingest import extract_text
-from parser import parse_fields
+from ingest import extract_document
+from parser import field_for_question, layout_fields, parse_fields
 from kb import KnowledgeBase
-from llm import GroqClient
+from llm import GroqClient, LLMBusy
 
 app = FastAPI(title="Payslip Analyzer")
 
@@ -28,6 +28,9 @@ app.add_middleware(
 
 KB = KnowledgeBase()
 LLM = GroqClient()
+# Retrieval for /api/ask: top slip chunks sent to the LLM, and their token budget
+ASK_TOP_CHUNKS = int(os.environ.get("ASK_TOP_CHUNKS", "6"))
+ASK_CONTEXT_TOKENS = int(os.environ.get("ASK_CONTEXT_TOKENS", "1200"))
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
 
 @app.on_event("startup")
@@ -36,10 +39,20 @@ async def startup_event() -> None:
     port = os.environ.get("PORT", "8000")
     logging.getLogger("uvicorn").info(f"Starting Payslip Analyzer on {host}:{port}")
 
+@app.on_event("shutdown")
+async def shutdown_event() -> None:
+    KB.close()
+    await LLM.aclose()
+
 @app.get("/healthz")
 async def healthz() -> dict:
     return {"status": "ok"}
 
+@app.get("/debug/kb")
+async def kb_stats() -> dict:
+    """Knowledge-base memory use and hit/spill counters."""
+    return {"stats": KB.stats()}
+
 @app.get("/", response_class=HTMLResponse)
 async def index() -> HTMLResponse:
     index_path = BASE_DIR / "frontend.html"
@@ -59,33 +72,53 @@ async def upload(file: UploadFile = File(...)) -> dict:
     """
 
     data = await file.read()
-    slip_id = str(len(KB.store) + 1)
-    text = extract_text(data)
-    fields = parse_fields(text)
-    KB.add(slip_id, text)
+    slip_id = KB.new_id()
+    text, pages = extract_document(data)
+    fields = dict(parse_fields(text))
+    # Fields read off the word geometry beat the linearized text, where table
+    # columns can interleave; the first page that has a field wins.
+    layout: dict = {}
+    for words in pages:
+        for name, value in layout_fields(words).items():
+            layout.setdefault(name, value)
+    fields.update(layout)
+    KB.add(slip_id, text, fields)
     return {"slip_id": slip_id, "preview_json": fields}
 
 class AskRequest(BaseModel):
     slip_id: str
     question: str
 
+def ask_prompt(chunks: list, question: str) -> str:
+    context = "\n...\n".join(chunks)
+    return (
+        "ענה על השאלה על סמך קטעי תלוש השכר הבאים בלבד.\n\n"
+        f"קטעי תלוש:\n{context}\n\nשאלה:\n{question}"
+    )
+
 @app.post("/api/ask")
 async def ask(req: AskRequest) -> dict:
     """Answer questions about an uploaded payslip.
 
-    The real implementation would perform retrieval augmented generation with
-    the Groq LLM.  Here we simulate that by parsing known fields from the slip
-    text and returning those values directly.
+    A question naming a known field (e.g. "gross", "מס הכנסה") is answered
+    straight from the parsed fields.  Anything else goes to the LLM with only
+    the slip chunks that BM25 ranks highest for the question, within
+    ``ASK_CONTEXT_TOKENS``, so long slips cost about the same per question.
     """
 
     text = KB.get(req.slip_id)
     if not text:
         raise HTTPException(status_code=404, detail="Unknown slip_id")
-    fields = parse_fields(text)
-    answer = ""
-    if "gross" in req.question.lower():
-        answer = str(fields.get("gross_salary", ""))
-    elif "net" in req.question.lower():
-        answer = str(fields.get("net_salary", ""))
-    # In a full system, we might use: LLM.answer(f"{text}\nQuestion: {req.question}")
-    return {"answer": answer, "sources": [{"slip_id": req.slip_id}]}
+    fields = KB.fields(req.slip_id) or parse_fields(text)  # cached per slip text
+    field = field_for_question(req.question)
+    if field and field in fields:
+        return {"answer": str(fields[field]), "sources": [{"slip_id": req.slip_id, "field": field}]}
+
+    chunks = KB.context(req.slip_id, req.question, ASK_TOP_CHUNKS, ASK_CONTEXT_TOKENS)
+    try:
+        answer = await LLM.aanswer(ask_prompt(chunks, req.question))
+    except LLMBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(int(e.retry_after) + 1)})
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"LLM error: {str(e)[:200]}")
+    return {"answer": answer, "sources": [{"slip_id": req.slip_id, "chunks": chunks}]}
@@ -0,0 +1,142 @@
+"""Deterministic payslip comparison.
+
+Comparing slips used to mean pasting every slip's full text into one prompt
+and asking the LLM to build the table itself.  Here each slip is reduced to
+its line items (label -> amount) locally, the month-over-month table is built
+from those (values, deltas, percent changes, new and removed items), and only
+a compact rendering of the changes goes to the LLM for commentary.  Prompt
+size therefore follows the number of line items, not the number of pages.
+
+Line items are read generically with :func:`parser.amounts.label_amounts`:
+a text label followed by its amounts, the last one winning, e.g.
+``שכר יסוד 30 400.00 12,000.00`` -> ``{"שכר יסוד": 12000.0}``.  Percent
+tokens stay part of the label so ``שעות נוספות 125%`` and ``150%`` are kept
+apart; dates and ID numbers are ignored.
+
+Slips are diffed in pay-period order (``לחודש 06/2025``) when every slip
+states its period, otherwise in upload order; see :func:`chronological_order`.
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+try:  # package-relative import
+    from .parser.amounts import QUOTES, label_amounts
+except Exception:  # fallback when imported as a script
+    from parser.amounts import QUOTES, label_amounts  # type: ignore
+
+# "תלוש שכר לחודש 06/2025", "חודש: 6.25", "תקופה 06-2025"
+_PERIOD = re.compile(r"(?:לחודש|חודש|תקופה|תקופת\s+שכר)\s*:?\s*(\d{1,2})[/.-](\d{4}|\d{2})(?!\d)")
+_MAX_LABEL_WORDS = 6
+
+
+def parse_line_items(text: str) -> Dict[str, float]:
+    """Return ``{label: amount}`` for every labelled amount in *text*.
+
+    The last amount after a label wins (quantity and rate columns come
+    first).  A label repeated within one slip gets a ``#2``, ``#3``... suffix.
+    """
+    items: Dict[str, float] = {}
+    for line in text.translate(QUOTES).splitlines():
+        for label, amount in label_amounts(line.split()):
+            if label.count(" ") >= _MAX_LABEL_WORDS:
+                continue
+            key, n = label, 1
+            while key in items:
+                n += 1
+                key = f"{label} #{n}"
+            items[key] = amount
+    return items
+
+
+def pay_period(text: str) -> Optional[Tuple[int, int]]:
+    """The ``(year, month)`` a slip is for, from e.g. ``לחודש 06/2025``; ``None`` if not stated."""
+    for match in _PERIOD.finditer(text):
+        month, year = int(match.group(1)), int(match.group(2))
+        if 1 <= month <= 12:
+            return (year + 2000 if year < 100 else year), month
+    return None
+
+
+def chronological_order(texts: Sequence[str]) -> Optional[List[int]]:
+    """Indexes of *texts* sorted by pay period, or ``None`` when a slip has none.
+
+    Ties keep their upload order.
+    """
+    periods = [pay_period(text) for text in texts]
+    if any(period is None for period in periods):
+        return None
+    return sorted(range(len(texts)), key=lambda i: periods[i])
+
+
+class DiffRow(NamedTuple):
+    item: str
+    values: List[Optional[float]]  # one per slip; None when the slip lacks the item
+    deltas: List[Optional[float]]  # slip i+1 minus slip i
+    pct: List[Optional[float]]  # deltas as percent of slip i
+    status: str  # "changed", "unchanged", "new" or "removed"
+
+
+def _status(values: Sequence[Optional[float]]) -> str:
+    if values[0] is None:
+        return "new"
+    if values[-1] is None:
+        return "removed"
+    present = [v for v in values if v is not None]
+    return "changed" if len(present) < len(values) or len(set(present)) > 1 else "unchanged"
+
+
+def diff_line_items(slips: Sequence[Dict[str, float]]) -> List[DiffRow]:
+    """Build the comparison table of *slips*, given in chronological order.
+
+    Rows follow the order items first appear across the slips.
+    """
+    order: Dict[str, None] = {}
+    for items in slips:
+        order.update(dict.fromkeys(items))
+    rows: List[DiffRow] = []
+    for item in order:
+        values = [items.get(item) for items in slips]
+        deltas: List[Optional[float]] = []
+        pct: List[Optional[float]] = []
+        for prev, cur in zip(values, values[1:]):
+            delta = None if prev is None or cur is None else round(cur - prev, 2)
+            deltas.append(delta)
+            pct.append(round(delta / abs(prev) * 100, 1) if delta is not None and prev else None)
+        rows.append(DiffRow(item, values, deltas, pct, _status(values)))
+    return rows
+
+
+def _fmt(value: Optional[float], signed: bool = False) -> str:
+    if value is None:
+        return "—"
+    return f"{value:+,.2f}" if signed else f"{value:,.2f}"
+
+
+def render_diff(rows: Sequence[DiffRow], names: Sequence[str]) -> str:
+    """Compact pipe table of the rows that differ, for the LLM prompt.
+
+    Unchanged items are listed by name only.
+    """
+    lines = [" | ".join(["פריט", *names, "שינוי", "%", "סטטוס"])]
+    same = []
+    for row in rows:
+        if row.status == "unchanged":
+            same.append(row.item)
+            continue
+        first = next((v for v in row.values if v is not None), None)
+        last = next((v for v in reversed(row.values) if v is not None), None)
+        total = None if row.status in ("new", "removed") else round(last - first, 2)
+        pct = round(total / abs(first) * 100, 1) if total is not None and first else None
+        lines.append(" | ".join([
+            row.item,
+            *(_fmt(v) for v in row.values),
+            _fmt(total, signed=True),
+            "—" if pct is None else f"{pct:+.1f}%",
+            row.status,
+        ]))
+    if same:
+        lines.append("ללא שינוי: " + ", ".join(same))
+    return "\n".join(lines)
@@ -1,9 +1,21 @@
 """OCR implementation using Google's Gemini API via the ``google-generativeai``
 package.
 
-The function performs simple rotation handling (0/90/180/270 degrees) and
-returns the longest text extracted.  Basic retry logic is implemented to cope
-with transient API failures.
+The page orientation is estimated up front (see :mod:`orientation`) so most
+images need a single Gemini call; the longest text across the attempted
+rotations is returned.  Basic retry logic is implemented to cope with
+transient API failures.
+
+:func:`ocr_images_batch` sends several page images in one request and asks
+for page-delimited output, falling back to per-page calls when the response
+cannot be split back into pages.
+
+The ``ocr_pil_*`` functions take decoded PIL images (e.g. built from raw
+pixmap samples by :mod:`ocr`).  Each image sent is encoded exactly once, and
+an already-encoded upload is passed through unchanged when no rotation is
+needed.
+
+The configured model is created once per API key and reused.
 """
 
 from __future__ import annotations
@@ -11,38 +23,74 @@ from __future__ import annotations
 import io
 import logging
 import os
+import random
+import re
+import threading
 import time
-from typing import Iterable
+from typing import List, Optional, Tuple
 
 from PIL import Image
 import types
 
+try:  # package-relative import
+    from .orientation import candidate_rotations
+except Exception:  # fallback when imported as a script
+    from orientation import candidate_rotations  # type: ignore
+
 try:  # pragma: no cover - library may not be installed in some envs
     import google.generativeai as genai  # type: ignore
 except Exception:  # pragma: no cover - handled gracefully
     genai = types.SimpleNamespace()  # type: ignore
 
 GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
-_ROTATIONS: Iterable[int] = (0, 90, 180, 270)
+
+_SINGLE_PROMPT = "Extract all text from this image and return it."
+_BATCH_PROMPT = (
+    "The {n} images above are consecutive pages of one document. Extract all "
+    "text from every page, in order. Start each page with a line of the form "
+    "'=== PAGE k ===' where k is the page number from 1 to {n}, even if the "
+    "page is empty. Return nothing else."
+)
+_PAGE_MARKER = re.compile(r"^\s*=== PAGE (\d+) ===\s*$", re.MULTILINE)
+
+# Upload encoding for rendered pages: fast-deflate PNG (lossless) or JPEG
+GEMINI_IMAGE_FORMAT = os.getenv("GEMINI_IMAGE_FORMAT", "png").lower()
+
+Blob = Tuple[str, bytes]  # (mime type, encoded image)
+
+
+_model_lock = threading.Lock()
+_model_cache: dict = {}
 
 
 def _get_model() -> genai.GenerativeModel:
+    """Return the process-wide model, configuring the SDK on first use."""
     api_key = os.getenv("GOOGLE_API_KEY")
     if not api_key:
         raise RuntimeError("GOOGLE_API_KEY not set")
-    genai.configure(api_key=api_key)
-    return genai.GenerativeModel(GEMINI_MODEL)
-
-
-def _call_model(model: genai.GenerativeModel, img_bytes: bytes) -> str:
-    """Call Gemini and return extracted text."""
-    result = model.generate_content([
-        {
-            "mime_type": "image/png",
-            "data": img_bytes,
-        },
-        "Extract all text from this image and return it.",
-    ])
+    key = (api_key, GEMINI_MODEL)
+    with _model_lock:
+        model = _model_cache.get(key)
+        if model is None:
+            genai.configure(api_key=api_key)
+            model = genai.GenerativeModel(GEMINI_MODEL)
+            _model_cache.clear()
+            _model_cache[key] = model
+    return model
+
+
+def _backoff(attempt: int) -> float:
+    """Exponential backoff with full jitter (seconds)."""
+    return random.uniform(0, 2 ** (attempt + 1))
+
+
+def _parts(blobs: List[Blob], prompt: str) -> list:
+    parts: list = [{"mime_type": mime, "data": data} for mime, data in blobs]
+    parts.append(prompt)
+    return parts
+
+
+def _response_text(result) -> str:
     try:
         return (
             result.candidates[0]
@@ -53,29 +101,119 @@ def _call_model(model: genai.GenerativeModel, img_bytes: bytes) -> str:
         return ""
 
 
-def ocr_image_bytes(image_bytes: bytes) -> str:
-    """Extract text from *image_bytes* using Gemini."""
+def _call_model(model: genai.GenerativeModel, blobs: List[Blob], prompt: str = _SINGLE_PROMPT) -> str:
+    """Call Gemini with one or more encoded images and return extracted text."""
+    return _response_text(model.generate_content(_parts(blobs, prompt)))
+
+
+def _call_with_retry(model: genai.GenerativeModel, blobs: List[Blob], prompt: str = _SINGLE_PROMPT) -> str:
+    for attempt in range(3):
+        try:
+            return _call_model(model, blobs, prompt)
+        except Exception as exc:
+            if attempt == 2:
+                logging.exception("Gemini OCR request failed")
+                raise RuntimeError("Gemini OCR request failed") from exc
+            wait = _backoff(attempt)
+            logging.warning("Gemini OCR error, retrying in %.2f s", wait)
+            time.sleep(wait)
+    return ""
+
+
+# Upload formats Gemini accepts as-is; anything else (TIFF, BMP, GIF...) is re-encoded
+_PASSTHROUGH_MIME = frozenset({"image/png", "image/jpeg", "image/webp"})
+
+
+def _encode(img: Image.Image) -> Blob:
+    """Encode *img* once for upload, as cheaply as the format allows."""
+    buf = io.BytesIO()
+    if GEMINI_IMAGE_FORMAT in ("jpeg", "jpg"):
+        img.convert("L" if img.mode == "L" else "RGB").save(buf, format="JPEG", quality=90)
+        return "image/jpeg", buf.getvalue()
+    img.save(buf, format="PNG", compress_level=1)
+    return "image/png", buf.getvalue()
+
+
+def _blob(img: Image.Image, angle: int, encoded: Optional[bytes]) -> Blob:
+    mime = Image.MIME.get(img.format or "")
+    if not angle and encoded is not None and mime in _PASSTHROUGH_MIME:
+        return mime, encoded
+    return _encode(img.rotate(angle, expand=True) if angle else img)
+
+
+def _split_pages(text: str, count: int) -> Optional[List[str]]:
+    """Split a page-delimited batch response; ``None`` if it doesn't match."""
+    chunks = _PAGE_MARKER.split(text)
+    if len(chunks) != 2 * count + 1 or chunks[0].strip():
+        return None
+    pages = {int(num): body.strip() for num, body in zip(chunks[1::2], chunks[2::2])}
+    if sorted(pages) != list(range(1, count + 1)):
+        return None
+    return [pages[i] for i in range(1, count + 1)]
+
+
+def ocr_pil_with_rotation(img: Image.Image, encoded: Optional[bytes] = None) -> Tuple[str, int, int]:
+    """Extract text from a decoded image using Gemini.
+
+    *encoded* may hold the original upload bytes of *img*; for the unrotated
+    attempt they are sent as-is when Gemini accepts the format.  Returns ``(text, angle, attempts)`` where
+    *angle* is the rotation that produced *text* and *attempts* the number of
+    OCR calls made.
+    """
     model = _get_model()
-    img = Image.open(io.BytesIO(image_bytes))
     best = ""
-    for angle in _ROTATIONS:
-        rotated = img.rotate(angle, expand=True) if angle else img
-        buf = io.BytesIO()
-        rotated.save(buf, format="PNG")
-        txt = ""
-        for attempt in range(3):
-            try:
-                txt = _call_model(model, buf.getvalue())
-                break
-            except Exception as exc:
-                if attempt == 2:
-                    logging.exception("Gemini OCR request failed")
-                    raise RuntimeError("Gemini OCR request failed") from exc
-                wait = 2 ** attempt
-                logging.warning("Gemini OCR error, retrying in %s s", wait)
-                time.sleep(wait)
+    best_angle = 0
+    attempts = 0
+    for angle in candidate_rotations(img):
+        attempts += 1
+        txt = _call_with_retry(model, [_blob(img, angle, encoded)])
         if len(txt) > len(best):
             best = txt
+            best_angle = angle
         if len(best) > 20:
             break
-    return best
+    return best, best_angle, attempts
+
+
+def ocr_image_with_rotation(image_bytes: bytes) -> Tuple[str, int, int]:
+    """Extract text from *image_bytes* using Gemini.
+
+    Returns ``(text, angle, attempts)``; see :func:`ocr_pil_with_rotation`.
+    """
+    return ocr_pil_with_rotation(Image.open(io.BytesIO(image_bytes)), image_bytes)
+
+
+def ocr_image_bytes(image_bytes: bytes) -> str:
+    """Extract text from *image_bytes* using Gemini."""
+    return ocr_image_with_rotation(image_bytes)[0]
+
+
+def ocr_pil_batch(images: List[Image.Image], encoded: Optional[List[Optional[bytes]]] = None) -> List[str]:
+    """Extract text from several decoded page *images* with one Gemini request.
+
+    Each page is sent in its most likely orientation.  If the response cannot
+    be split into exactly one section per page, every page is OCR'd on its
+    own instead; pages that come back nearly empty get a per-page retry so
+    the other rotations are still considered.
+    """
+    encoded = encoded or [None] * len(images)
+    if len(images) == 1:
+        return [ocr_pil_with_rotation(images[0], encoded[0])[0]]
+
+    model = _get_model()
+    payload = [_blob(img, candidate_rotations(img)[0], raw) for img, raw in zip(images, encoded)]
+    text = _call_with_retry(model, payload, _BATCH_PROMPT.format(n=len(images)))
+    pages = _split_pages(text, len(images))
+    if pages is None:
+        logging.warning("Gemini batch response not page-delimited, falling back to per-page OCR")
+        return [ocr_pil_with_rotation(img, raw)[0] for img, raw in zip(images, encoded)]
+    return [
+        page if len(page) > 20 else ocr_pil_with_rotation(img, raw)[0]
+        for page, img, raw in zip(pages, images, encoded)
+    ]
+
+
+def ocr_images_batch(images: List[bytes]) -> List[str]:
+    """Batch OCR for encoded page images; see :func:`ocr_pil_batch`."""
+    return ocr_pil_batch([Image.open(io.BytesIO(data)) for data in images], list(images))
+
@@ -1,3 +1,3 @@
 """Ingestion utilities for payslip text."""
-from .extractor import extract_text
-__all__ = ["extract_text"]
+from .extractor import extract_document, extract_text
+__all__ = ["extract_document", "extract_text"]
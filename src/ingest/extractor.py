@@ -1,7 +1,9 @@
 """Fast PDF/text extraction with optional OCR.
 
 This module exposes :func:`extract_text` which accepts either raw PDF bytes or
-plain UTF-8 encoded text.  For PDFs we rely on PyMuPDF to extract any embedded
+plain UTF-8 encoded text.  :func:`extract_document` additionally returns each
+page's word boxes (PyMuPDF words, or Tesseract's TSV boxes for OCR'd pages)
+for layout-aware table parsing.  For PDFs we rely on PyMuPDF to extract any embedded
 text layer and fall back to sending page images to the OCR backend (Gemini or
 Tesseract) when required.  Only pages that genuinely require OCR are processed
 and the overall run time is bounded by a simple timeout.
@@ -13,14 +15,18 @@ to local Tesseract otherwise.
 
 from __future__ import annotations
 
+import io
 import logging
 import os
 import time
-from typing import List
+from typing import List, Tuple
 from concurrent.futures import ThreadPoolExecutor, Future
 
 import fitz  # PyMuPDF
+from PIL import Image
 from ocr import ocr_image_bytes
+from parser.table import WordBox, words_from_pymupdf, words_from_tesseract
+from tesseract_ocr import ocr_pil_with_confidence
 
 log = logging.getLogger(__name__)
 
@@ -32,13 +38,25 @@ log = logging.getLogger(__name__)
 MAX_TOTAL_SECONDS = float(os.getenv("MAX_TOTAL_SECONDS", "20"))
 
 
-def _extract_pdf(pdf_bytes: bytes) -> str:
-    """Extract text from *pdf_bytes* using OCR for image-only pages."""
+def _ocr_page(image_bytes: bytes) -> Tuple[str, List[WordBox]]:
+    """OCR one page image; word boxes are only available from Tesseract."""
+    if not os.getenv("GOOGLE_API_KEY"):
+        try:
+            result, _, _ = ocr_pil_with_confidence(Image.open(io.BytesIO(image_bytes)))
+            return result.text, words_from_tesseract(result.words)
+        except RuntimeError:
+            pass  # Tesseract not installed; let ocr_image_bytes report it
+    return ocr_image_bytes(image_bytes), []
+
+
+def _extract_pdf(pdf_bytes: bytes) -> Tuple[str, List[List[WordBox]]]:
+    """Extract text and word boxes from *pdf_bytes* using OCR for image-only pages."""
 
     start = time.perf_counter()
     with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
         texts: List[str] = [""] * doc.page_count
-        ocr_jobs: List[tuple[int, Future[str]]] = []
+        words: List[List[WordBox]] = [[] for _ in range(doc.page_count)]
+        ocr_jobs: List[tuple[int, Future[Tuple[str, List[WordBox]]]]] = []
 
         with ThreadPoolExecutor() as pool:
             for index, page in enumerate(doc):
@@ -49,11 +67,12 @@ def _extract_pdf(pdf_bytes: bytes) -> str:
                 text = (page.get_text("text") or "").strip()
                 if text:
                     texts[index] = text
+                    words[index] = words_from_pymupdf(page.get_text("words"))
                     continue
 
                 try:
                     pix = page.get_pixmap()
-                    ocr_jobs.append((index, pool.submit(ocr_image_bytes, pix.tobytes("png"))))
+                    ocr_jobs.append((index, pool.submit(_ocr_page, pix.tobytes("png"))))
                 except Exception as exc:  # pragma: no cover - defensive programming
                     log.warning("OCR enqueue failed for page %s: %s", index, exc)
 
@@ -63,19 +82,18 @@ def _extract_pdf(pdf_bytes: bytes) -> str:
                 log.warning("OCR timeout while waiting for page %s", index)
                 break
             try:
-                texts[index] = fut.result(timeout=remaining)
+                texts[index], words[index] = fut.result(timeout=remaining)
             except Exception as exc:  # pragma: no cover - defensive programming
                 log.warning("OCR failed for page %s: %s", index, exc)
 
-    return "\n\n".join(t for t in texts if t)
+    return "\n\n".join(t for t in texts if t), [w for w in words if w]
 
 
-def extract_text(data: bytes) -> str:
-    """Return extracted text from *data*.
+def extract_document(data: bytes) -> Tuple[str, List[List[WordBox]]]:
+    """Return ``(text, page_words)`` for *data* (PDF or plain text).
 
-    ``data`` may represent a binary PDF or a plain UTF-8 text file.  The
-    function auto-detects the format and chooses the fastest extraction
-    strategy available.
+    ``page_words`` holds the word boxes of each page that has any; it is empty
+    for plain text input.
     """
 
     # Quick check for PDF magic header
@@ -87,7 +105,16 @@ def extract_text(data: bytes) -> str:
 
     # Fall back to decoding as UTF-8 text
     try:
-        return data.decode("utf-8")
+        return data.decode("utf-8"), []
     except Exception:
-        return ""
+        return "", []
 
+
+def extract_text(data: bytes) -> str:
+    """Return extracted text from *data*.
+
+    ``data`` may represent a binary PDF or a plain UTF-8 text file.  The
+    function auto-detects the format and chooses the fastest extraction
+    strategy available.
+    """
+    return extract_document(data)[0]
@@ -0,0 +1,214 @@
+"""Lexical retrieval for Hebrew payslip text.
+
+A small BM25 index with a tokenizer that copes with Hebrew's attached
+prefixes (ו, ה, ב, כ, ל, מ, ש): every word is indexed both as written and
+with up to two prefix letters removed, so "בביטוח" matches "ביטוח".  Used to
+pick the relevant knowledge-base sections for a prompt instead of pasting the
+whole document.  :class:`ChunkIndex` does the same for the text of one
+slip, so a question about a multi-page slip sends only the matching chunks.
+"""
+
+from __future__ import annotations
+
+import math
+import re
+from collections import Counter
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+_PREFIXES = "והבכלמש"
+_HEADING = re.compile(r"^(#{1,6})\s+(.*)$")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens plus prefix-stripped variants of Hebrew words."""
+    tokens: List[str] = []
+    for word in _WORD.findall(text.lower()):
+        tokens.append(word)
+        stem = word
+        for _ in range(2):
+            if len(stem) > 3 and stem[0] in _PREFIXES:
+                stem = stem[1:]
+                tokens.append(stem)
+            else:
+                break
+    return tokens
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough LLM token count; Hebrew averages about three characters per token."""
+    return len(text) // 3 + 1
+
+
+class BM25Index:
+    """Okapi BM25 over a fixed list of documents."""
+
+    def __init__(self, documents: Sequence[str], k1: float = 1.5, b: float = 0.75) -> None:
+        self.k1 = k1
+        self.b = b
+        self._tfs: List[Counter] = [Counter(tokenize(doc)) for doc in documents]
+        self._lengths = [sum(tf.values()) for tf in self._tfs]
+        self._avg_len = (sum(self._lengths) / len(self._lengths)) if self._lengths else 0.0
+        df: Counter = Counter()
+        for tf in self._tfs:
+            df.update(tf.keys())
+        n = len(self._tfs)
+        self._idf: Dict[str, float] = {
+            term: math.log(1 + (n - freq + 0.5) / (freq + 0.5)) for term, freq in df.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self._tfs)
+
+    def scores(self, query: str) -> List[float]:
+        terms = [t for t in set(tokenize(query)) if t in self._idf]
+        result = []
+        for tf, length in zip(self._tfs, self._lengths):
+            norm = self.k1 * (1 - self.b + self.b * length / (self._avg_len or 1))
+            score = 0.0
+            for term in terms:
+                freq = tf.get(term)
+                if freq:
+                    score += self._idf[term] * freq * (self.k1 + 1) / (freq + norm)
+            result.append(score)
+        return result
+
+    def search(self, query: str, k: int) -> List[Tuple[int, float]]:
+        """Return up to *k* ``(document index, score)`` pairs with score > 0."""
+        ranked = sorted(enumerate(self.scores(query)), key=lambda item: -item[1])
+        return [(i, s) for i, s in ranked[:k] if s > 0]
+
+
+def select_within_budget(
+    index: BM25Index, costs: Sequence[int], query: str, k: int, token_budget: int
+) -> List[int]:
+    """Indexes of the top-*k* documents for *query* whose costs fit *token_budget*.
+
+    Returned in document order.
+    """
+    chosen: List[int] = []
+    used = 0
+    for idx, _ in index.search(query, k):
+        if used + costs[idx] > token_budget:
+            continue
+        chosen.append(idx)
+        used += costs[idx]
+    return sorted(chosen)
+
+
+class Section(NamedTuple):
+    title: str
+    text: str  # heading line(s) and body, as it appears in the prompt
+
+
+def split_sections(markdown: str) -> List[Section]:
+    """Split *markdown* at ``##``/``###`` headings.
+
+    Subsections carry their parent heading so they read on their own.  Text
+    before the first ``##`` heading (title and intro) becomes one section.
+    """
+    sections: List[Section] = []
+    parent = ""
+    title = ""
+    body: List[str] = []
+
+    def flush() -> None:
+        content = "\n".join(line for line in body if line.strip() != "---").strip()
+        if content:
+            sections.append(Section(title, content))
+
+    for line in markdown.splitlines():
+        match = _HEADING.match(line.strip())
+        if match and len(match.group(1)) >= 2:
+            flush()
+            level, title = len(match.group(1)), match.group(2).strip()
+            if level == 2:
+                parent = line.strip()
+                body = [parent]
+            else:
+                body = [parent, line.strip()] if parent else [line.strip()]
+            continue
+        body.append(line)
+    flush()
+    return sections
+
+
+class SectionIndex:
+    """Knowledge-base sections indexed once, queried per prompt."""
+
+    def __init__(self, markdown: str) -> None:
+        self.sections = split_sections(markdown)
+        self._index = BM25Index([s.text for s in self.sections])
+
+    def select(self, query: str, k: int = 4, token_budget: int = 600) -> List[Section]:
+        """Top-*k* sections for *query* that fit *token_budget*, in document order."""
+        costs = [estimate_tokens(s.text) for s in self.sections]
+        return [self.sections[i] for i in select_within_budget(self._index, costs, query, k, token_budget)]
+
+    def render(self, query: str, k: int = 4, token_budget: int = 600) -> str:
+        return "\n\n".join(s.text for s in self.select(query, k, token_budget))
+
+
+def chunk_spans(text: str, max_tokens: int = 150) -> List[Tuple[int, int]]:
+    """Split *text* into ``(start, end)`` spans of whole lines under *max_tokens*.
+
+    Blank lines (page and paragraph breaks) always end a chunk; a single line
+    longer than the limit is cut at whitespace.
+    """
+    max_chars = max_tokens * 3  # inverse of estimate_tokens
+    spans: List[Tuple[int, int]] = []
+    start: Optional[int] = None
+    end = pos = 0
+    for line in text.splitlines(keepends=True):
+        line_start = pos + len(line) - len(line.lstrip())
+        line_end = pos + len(line.rstrip())
+        pos += len(line)
+        if line_start >= line_end:  # blank line
+            if start is not None:
+                spans.append((start, end))
+                start = None
+            continue
+        if start is not None and line_end - start > max_chars:
+            spans.append((start, end))
+            start = None
+        while line_end - line_start > max_chars:
+            cut = text.rfind(" ", line_start + 1, line_start + max_chars)
+            cut = cut if cut > 0 else line_start + max_chars
+            spans.append((line_start, cut))
+            line_start = cut + (text[cut] == " ")
+        if start is None:
+            start = line_start
+        end = line_end
+    if start is not None:
+        spans.append((start, end))
+    return spans
+
+
+class ChunkIndex:
+    """BM25 over the chunks of one slip's text."""
+
+    def __init__(self, text: str, spans: Optional[Sequence[Tuple[int, int]]] = None) -> None:
+        spans = chunk_spans(text) if spans is None else spans
+        self.chunks = [text[a:b] for a, b in spans]
+        self._index = BM25Index(self.chunks)
+        self._costs = [estimate_tokens(c) for c in self.chunks]
+
+    def select(self, query: str, k: int = 6, token_budget: int = 900) -> List[int]:
+        """Top-*k* chunk indexes for *query* under *token_budget*, in text order.
+
+        When nothing matches, the leading chunks that fit are returned, since
+        a slip's header and totals usually come first.
+        """
+        chosen = select_within_budget(self._index, self._costs, query, k, token_budget)
+        if chosen:
+            return chosen
+        used = 0
+        for idx, cost in enumerate(self._costs[:k]):
+            if used + cost > token_budget:
+                break
+            chosen.append(idx)
+            used += cost
+        return chosen
+
+    def render(self, query: str, k: int = 6, token_budget: int = 900) -> str:
+        return "\n...\n".join(self.chunks[i] for i in self.select(query, k, token_budget))
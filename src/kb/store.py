@@ -1,17 +1,213 @@
-"""In-memory knowledge base."""
-from typing import Dict
+"""Bounded knowledge base of uploaded slips.
+
+Slips are kept in memory up to ``KB_MAX_BYTES`` (text plus parsed fields,
+UTF-8 sized).  Past that the least recently used slips are spilled to a
+SQLite file and reloaded transparently by :meth:`KnowledgeBase.get`, so a
+long-lived worker's memory stays flat while old slip ids keep working.
+
+Each slip is chunked at ingest (:func:`kb.retrieval.chunk_spans`, stored as
+offsets into the text) and :meth:`KnowledgeBase.context` returns the chunks
+most relevant to a question under a token budget.  The per-slip BM25 index is
+built on the first question and kept while the slip is resident.
+"""
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+try:  # package-relative import
+    from .retrieval import ChunkIndex, chunk_spans
+except Exception:  # fallback when imported as a script
+    from retrieval import ChunkIndex, chunk_spans  # type: ignore
+
+KB_MAX_BYTES = int(os.getenv("KB_MAX_BYTES", str(64 * 1024 * 1024)))
+# Spill file; each process appends its pid (uvicorn workers share the
+# environment) and removes the file on close().  Default: a temp file.
+KB_SPILL_PATH = os.getenv("KB_SPILL_PATH", "")
+
+_SPAN_BYTES = 16
+
+
+class _Slip:
+    __slots__ = ("text", "fields", "spans", "size", "index")
+
+    def __init__(self, text: str, fields: Optional[dict], spans: List[Tuple[int, int]]) -> None:
+        self.text = text
+        self.fields = fields
+        self.spans = spans
+        self.index: Optional[ChunkIndex] = None
+        self.size = len(text.encode("utf-8")) + _SPAN_BYTES * len(spans)
+        if fields:
+            self.size += len(json.dumps(fields, ensure_ascii=False).encode("utf-8"))
+
 
 class KnowledgeBase:
-    """Store slip text by id."""
-    def __init__(self) -> None:
-        self._store: Dict[str, str] = {}
+    """Store slip text (and parsed fields, when known) by id.
+
+    All methods are thread-safe.  ``stats()`` reports resident bytes and the
+    hit, miss, spill and reload counters.
+    """
+    def __init__(self, max_bytes: int = KB_MAX_BYTES, spill_path: str = KB_SPILL_PATH) -> None:
+        self.max_bytes = max_bytes
+        self._spill_base = spill_path
+        self._spill_path = ""
+        self._lock = threading.Lock()
+        self._resident: "OrderedDict[str, _Slip]" = OrderedDict()
+        self._bytes = 0
+        self._disk: Optional[sqlite3.Connection] = None
+        self._spilled = 0
+        self._counters = {"hits": 0, "misses": 0, "spills": 0, "reloads": 0}
+
+    # ------------------------------------------------------------------ spill
+    def _spill_db(self) -> sqlite3.Connection:
+        if self._disk is None:
+            if self._spill_base:
+                root, ext = os.path.splitext(self._spill_base)
+                path = f"{root}-{os.getpid()}{ext}"
+            else:
+                fd, path = tempfile.mkstemp(prefix="kb-spill-", suffix=".db")
+                os.close(fd)
+            self._spill_path = path
+            self._disk = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._disk.execute("PRAGMA journal_mode=WAL")
+            self._disk.execute("PRAGMA synchronous=OFF")  # a cache; losing it on crash is fine
+            self._disk.execute("DROP TABLE IF EXISTS slips")  # nothing survives a restart
+            self._disk.execute("CREATE TABLE slips(id TEXT PRIMARY KEY, text TEXT, fields TEXT, spans TEXT)")
+        return self._disk
 
-    def add(self, slip_id: str, text: str) -> None:
-        self._store[slip_id] = text
+    def _evict(self) -> None:
+        while self._bytes > self.max_bytes and len(self._resident) > 1:
+            slip_id, slip = self._resident.popitem(last=False)
+            fields = None if slip.fields is None else json.dumps(slip.fields, ensure_ascii=False)
+            self._spill_db().execute(
+                "INSERT OR REPLACE INTO slips VALUES (?,?,?,?)",
+                (slip_id, slip.text, fields, json.dumps(slip.spans)),
+            )
+            self._bytes -= slip.size
+            self._spilled += 1
+            self._counters["spills"] += 1
+
+    def _unspill(self, slip_id: str) -> Optional[_Slip]:
+        if not self._spilled:
+            return None
+        disk = self._spill_db()
+        row = disk.execute("SELECT text, fields, spans FROM slips WHERE id=?", (slip_id,)).fetchone()
+        if row is None:
+            return None
+        disk.execute("DELETE FROM slips WHERE id=?", (slip_id,))
+        self._spilled -= 1
+        fields = None if row[1] is None else json.loads(row[1])
+        return _Slip(row[0], fields, [tuple(span) for span in json.loads(row[2])])
+
+    # --------------------------------------------------------------- public
+    def new_id(self) -> str:
+        """A fresh, collision-free slip id."""
+        return str(uuid.uuid4())
+
+    def add(self, slip_id: str, text: str, fields: Optional[dict] = None) -> None:
+        slip = _Slip(text, fields, chunk_spans(text))
+        with self._lock:
+            old = self._resident.pop(slip_id, None)
+            if old is not None:
+                self._bytes -= old.size
+            else:
+                self._unspill(slip_id)  # drop a stale spilled copy
+            self._resident[slip_id] = slip
+            self._bytes += slip.size
+            self._evict()
+
+    def _entry(self, slip_id: str) -> Optional[_Slip]:
+        with self._lock:
+            entry = self._resident.get(slip_id)
+            if entry is not None:
+                self._resident.move_to_end(slip_id)
+                self._counters["hits"] += 1
+                return entry
+            entry = self._unspill(slip_id)
+            if entry is None:
+                self._counters["misses"] += 1
+                return None
+            self._counters["reloads"] += 1
+            self._resident[slip_id] = entry
+            self._bytes += entry.size
+            self._evict()
+            return entry
 
     def get(self, slip_id: str) -> str:
-        return self._store.get(slip_id, "")
+        entry = self._entry(slip_id)
+        return entry.text if entry else ""
+
+    def fields(self, slip_id: str) -> Optional[dict]:
+        """Fields stored with the slip at upload, or ``None``."""
+        entry = self._entry(slip_id)
+        return entry.fields if entry else None
+
+    def chunks(self, slip_id: str) -> List[str]:
+        entry = self._entry(slip_id)
+        return [entry.text[a:b] for a, b in entry.spans] if entry else []
+
+    def context(self, slip_id: str, question: str, k: int = 6, token_budget: int = 900) -> List[str]:
+        """The slip's chunks most relevant to *question*, in text order, under *token_budget*."""
+        entry = self._entry(slip_id)
+        if entry is None:
+            return []
+        index = entry.index
+        if index is None:
+            index = ChunkIndex(entry.text, entry.spans)
+            with self._lock:
+                if entry.index is None and self._resident.get(slip_id) is entry:
+                    # Term counts cost roughly as much as the text itself
+                    entry.index = index
+                    entry.size += len(entry.text.encode("utf-8"))
+                    self._bytes += len(entry.text.encode("utf-8"))
+                    self._evict()
+        return [index.chunks[i] for i in index.select(question, k, token_budget)]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._resident) + self._spilled
+
+    def __contains__(self, slip_id: object) -> bool:
+        with self._lock:
+            if slip_id in self._resident:
+                return True
+            if not self._spilled:
+                return False
+            row = self._spill_db().execute("SELECT 1 FROM slips WHERE id=?", (slip_id,)).fetchone()
+            return row is not None
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "resident_slips": len(self._resident),
+                "resident_bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "spilled_slips": self._spilled,
+                **self._counters,
+            }
+
+    def close(self) -> None:
+        """Close and delete the spill file."""
+        with self._lock:
+            if self._disk is not None:
+                self._disk.close()
+                self._disk = None
+                for suffix in ("", "-wal", "-shm"):
+                    try:
+                        os.remove(self._spill_path + suffix)
+                    except OSError:
+                        pass
+                self._spill_path = ""
+            self._resident.clear()
+            self._bytes = 0
+            self._spilled = 0
 
     @property
     def store(self) -> Dict[str, str]:
-        return self._store
+        """Resident slip texts (spilled slips are not included)."""
+        with self._lock:
+            return {slip_id: entry.text for slip_id, entry in self._resident.items()}
@@ -0,0 +1,95 @@
+"""Page analysis for hybrid text/scan PDFs.
+
+A payslip page may have a real text layer for its header while the numbers
+table is an embedded image, or a stray text layer over an otherwise scanned
+page.  Treating the page as "text" whenever ``get_text`` returns something
+loses the image content; OCR'ing the whole page is slow.  :func:`analyze_page`
+uses PyMuPDF's block and image info to find the parts of image regions that
+no text covers, so only those clipped regions are rasterized and OCR'd, and
+:func:`merge_page` adds their text to the text layer in reading order.
+"""
+
+from __future__ import annotations
+
+import os
+from typing import Dict, List, NamedTuple, Tuple
+
+import fitz  # PyMuPDF
+
+# An image is OCR'd when text blocks cover less than this fraction of it
+OCR_TEXT_COVERAGE = float(os.getenv("OCR_TEXT_COVERAGE", "0.25"))
+# Images smaller than this (points, either side) are logos/stamps; skip them
+OCR_MIN_REGION_PT = float(os.getenv("OCR_MIN_REGION_PT", "40"))
+
+
+class PageLayout(NamedTuple):
+    text: str  # direct text layer, as ``page.get_text("text")``
+    blocks: List[Tuple[fitz.Rect, str]]
+    regions: List[fitz.Rect]  # areas to OCR; the full page for image-only pages
+
+
+def _merge_overlapping(rects: List[fitz.Rect]) -> List[fitz.Rect]:
+    merged: List[fitz.Rect] = []
+    for rect in sorted(rects, key=lambda r: (r.y0, r.x0)):
+        for i, other in enumerate(merged):
+            if rect.intersects(other):
+                merged[i] = other | rect
+                break
+        else:
+            merged.append(fitz.Rect(rect))
+    return merged
+
+
+def _uncovered_bands(rect: fitz.Rect, blocks: List[Tuple[fitz.Rect, str]]) -> List[fitz.Rect]:
+    """Horizontal bands of *rect* that no text block overlaps.
+
+    A background or letterhead image may sit under the whole text layer;
+    cutting out the rows the text occupies keeps OCR away from text the
+    page already has, so the two never need de-duplicating.
+    """
+    spans = sorted((block.y0, block.y1) for block, _ in blocks if block.intersects(rect))
+    bands: List[fitz.Rect] = []
+    top = rect.y0
+    for y0, y1 in spans + [(rect.y1, rect.y1)]:
+        if y0 - top >= OCR_MIN_REGION_PT:
+            bands.append(fitz.Rect(rect.x0, top, rect.x1, min(y0, rect.y1)))
+        top = max(top, y1)
+    return bands
+
+
+def analyze_page(page: fitz.Page) -> PageLayout:
+    """Split *page* into direct text blocks and image regions needing OCR."""
+    text = (page.get_text("text") or "").strip()
+    blocks = [
+        (fitz.Rect(b[:4]), b[4].strip())
+        for b in page.get_text("blocks")
+        if b[6] == 0 and b[4].strip()
+    ]
+    if not blocks:
+        return PageLayout("", [], [fitz.Rect(page.rect)])
+
+    images: List[fitz.Rect] = []
+    for info in page.get_image_info():
+        rect = fitz.Rect(info["bbox"]) & page.rect
+        if rect.is_empty or rect.width < OCR_MIN_REGION_PT or rect.height < OCR_MIN_REGION_PT:
+            continue
+        covered = sum((rect & block).get_area() for block, _ in blocks)
+        if covered / rect.get_area() < OCR_TEXT_COVERAGE:
+            images.append(rect)
+    regions = [band for rect in _merge_overlapping(images) for band in _uncovered_bands(rect, blocks)]
+    return PageLayout(text, blocks, regions)
+
+
+def merge_page(layout: PageLayout, region_texts: Dict[int, str]) -> str:
+    """Return the page text with OCR'd *region_texts* merged in reading order.
+
+    *region_texts* maps indexes into ``layout.regions`` to their OCR text.
+    Regions never overlap the text blocks, so every block is kept.
+    """
+    if not layout.regions or not any(region_texts.values()):
+        return layout.text
+
+    segments = list(layout.blocks)
+    segments += [(layout.regions[i], t) for i, t in region_texts.items() if t]
+    segments.sort(key=lambda seg: (round(seg[0].y0), seg[0].x0))
+    return "\n".join(text for _, text in segments).strip()
@@ -1,3 +1,3 @@
-"""Groq LLM client placeholder."""
-from .client import GroqClient
-__all__ = ["GroqClient"]
+"""Groq LLM client."""
+from .client import GroqClient, LLMBusy, LLMError, RateLimiter, TokenBucket
+__all__ = ["GroqClient", "LLMBusy", "LLMError", "RateLimiter", "TokenBucket"]
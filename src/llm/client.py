@@ -1,16 +1,381 @@
-"""Minimal OpenAI-compatible client for Groq."""
+"""OpenAI-compatible chat client for Groq.
+
+Groq enforces per-key quotas in requests per minute (RPM) and tokens per
+minute (TPM) and answers 429 with a ``Retry-After`` header once they are
+exceeded.  :class:`GroqClient` paces its calls with a :class:`RateLimiter`
+(one token bucket per quota) so a busy worker stays under both, and retries
+429/5xx and connection errors with jittered exponential backoff, waiting at
+least as long as ``Retry-After`` asks.  The SDK's own retries are disabled so
+the two do not multiply.
+
+The TPM charge of a request is estimated up front (prompt characters plus
+``max_tokens``) and corrected from the response's ``usage`` afterwards;
+streams ask for a final usage chunk (``stream_options.include_usage``) for
+the same purpose.  A call that would have to wait longer than
+``LLM_MAX_WAIT_SECONDS`` for the limiter fails with :class:`LLMBusy` instead
+of queueing silently.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import email.utils
+import itertools
 import os
+import random
+import threading
+import time
+from collections import Counter
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+import openai
+from openai import AsyncOpenAI, OpenAI, Timeout
+
+try:  # package-relative import
+    from ..kb.retrieval import estimate_tokens
+except Exception:  # fallback when imported as a script
+    from kb.retrieval import estimate_tokens  # type: ignore
+
+
+LLM_BASE_URL = os.getenv("LLM_BASE_URL", "https://api.groq.com/openai/v1")
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+# Account quotas; 0 disables that limit
+LLM_RPM = float(os.getenv("LLM_RPM", "30"))
+LLM_TPM = float(os.getenv("LLM_TPM", "12000"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_RETRY_BASE_SECONDS = float(os.getenv("LLM_RETRY_BASE_SECONDS", "0.5"))
+# Longest single wait; a Retry-After beyond this fails the call instead
+LLM_RETRY_MAX_SECONDS = float(os.getenv("LLM_RETRY_MAX_SECONDS", "30"))
+# Longest pacing wait before a call fails with LLMBusy instead
+LLM_MAX_WAIT_SECONDS = float(os.getenv("LLM_MAX_WAIT_SECONDS", "10"))
+# Completion tokens reserved against TPM when a request sets no max_tokens
+DEFAULT_COMPLETION_TOKENS = 1024
+
+
+class LLMError(RuntimeError):
+    """The client is not usable (e.g. no API key configured)."""
+
+
+class LLMBusy(LLMError):
+    """The account quota is spent for longer than the caller may wait."""
+
+    def __init__(self, retry_after: float) -> None:
+        super().__init__(f"LLM quota exhausted, retry in {retry_after:.0f} s")
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at *per_minute*, holding at most *capacity*.
+
+    :meth:`reserve` takes tokens immediately, letting the balance go negative,
+    and returns how long the caller must wait before using them.  Concurrent
+    callers therefore queue in arrival order without polling.
+    """
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        self.rate = per_minute / 60.0
+        self.capacity = capacity if capacity is not None else per_minute
+        self._tokens = self.capacity
+        self._clock = clock
+        self._stamp = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+
+    def reserve(self, amount: float = 1.0) -> float:
+        with self._lock:
+            self._refill()
+            self._tokens -= amount
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def refund(self, amount: float) -> None:
+        """Return *amount* tokens (negative to charge more after the fact)."""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.capacity, self._tokens + amount)
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute buckets plus a shared pause."""
+
+    def __init__(self, rpm: float = LLM_RPM, tpm: float = LLM_TPM,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        self.requests = TokenBucket(rpm, clock=clock) if rpm > 0 else None
+        self.tokens = TokenBucket(tpm, clock=clock) if tpm > 0 else None
+        self._clock = clock
+        self._paused_until = 0.0
+
+    def reserve(self, tokens: int) -> float:
+        """Reserve one request of about *tokens* tokens; return the seconds to wait."""
+        delay = max(0.0, self._paused_until - self._clock())
+        if self.requests is not None:
+            delay = max(delay, self.requests.reserve(1))
+        if self.tokens is not None:
+            # A request larger than the whole quota still goes, once the bucket is full
+            delay = max(delay, self.tokens.reserve(min(tokens, self.tokens.capacity)))
+        return delay
+
+    def settle(self, reserved: int, used: int) -> None:
+        if self.tokens is not None:
+            self.tokens.refund(min(reserved, self.tokens.capacity) - used)
+
+    def cancel(self, reserved: int) -> None:
+        """Give back a whole reservation that was never sent."""
+        if self.requests is not None:
+            self.requests.refund(1)
+        self.settle(reserved, 0)
+
+    def pause(self, seconds: float) -> None:
+        """Hold every caller back for *seconds*, e.g. after a 429."""
+        self._paused_until = max(self._paused_until, self._clock() + seconds)
+
+
+def retry_after(exc: BaseException) -> Optional[float]:
+    """Seconds requested by the ``Retry-After`` (or ``retry-after-ms``) header of *exc*."""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return max(0.0, float(headers["retry-after-ms"]) / 1000)
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        return max(0.0, float(value))
+    except ValueError:
+        try:
+            when = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        return max(0.0, when.timestamp() - time.time())
+
+
+def _retryable(exc: BaseException) -> bool:
+    if isinstance(exc, (openai.RateLimitError, openai.InternalServerError, openai.APIConnectionError)):
+        return True
+    return isinstance(exc, openai.APIStatusError) and exc.status_code >= 500
+
+
+def _request_tokens(params: Dict[str, Any]) -> int:
+    prompt = sum(estimate_tokens(str(m.get("content") or "")) for m in params.get("messages") or [])
+    return prompt + (params.get("max_tokens") or DEFAULT_COMPLETION_TOKENS)
+
+
+class _UsageStream:
+    """Wrap an SDK stream, settling the TPM reservation from its usage chunk."""
+
+    def __init__(self, stream: Any, settle: Callable[[Any], None]) -> None:
+        self._stream = stream
+        self._settle = settle
+
+    def __iter__(self):
+        for chunk in self._stream:
+            if getattr(chunk, "usage", None) is not None:
+                self._settle(chunk)
+            yield chunk
+
+    async def _aiter(self):
+        async for chunk in self._stream:
+            if getattr(chunk, "usage", None) is not None:
+                self._settle(chunk)
+            yield chunk
+
+    def __aiter__(self):
+        return self._aiter()
+
+    def close(self) -> Any:
+        return self._stream.close()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._stream, name)
+
 
 class GroqClient:
-    """Placeholder Groq client returning canned responses."""
-    def __init__(self, api_key: str | None = None, base_url: str | None = None, model: str = "openai/gpt-oss-20b") -> None:
-        self.api_key = api_key or os.getenv("GROQ_API_KEY", "")
-        self.base_url = base_url or "https://api.groq.com/openai/v1"
+    """Chat completions against Groq (or any OpenAI-compatible server).
+
+    Sync (:meth:`create`, :meth:`complete`, :meth:`answer`) and async
+    (:meth:`acreate`, :meth:`acomplete`, :meth:`aanswer`, :meth:`astream`)
+    methods share one :class:`RateLimiter`.  ``stats`` counts requests,
+    retries, 429s, calls refused by the limiter and seconds spent waiting
+    for it.
+    """
+
+    def __init__(
+        self,
+        api_key: str | None = None,
+        base_url: str | None = None,
+        model: str = "openai/gpt-oss-20b",
+        *,
+        rpm: float = LLM_RPM,
+        tpm: float = LLM_TPM,
+        max_retries: int = LLM_MAX_RETRIES,
+        timeout: float = LLM_TIMEOUT,
+        connect_timeout: float = LLM_CONNECT_TIMEOUT,
+        max_wait: float = LLM_MAX_WAIT_SECONDS,
+        limiter: Optional[RateLimiter] = None,
+    ) -> None:
+        self._api_key = api_key
+        self.base_url = base_url or LLM_BASE_URL
         self.model = model
+        self.max_retries = max_retries
+        self.max_wait = max_wait
+        self.timeout = Timeout(timeout, connect=connect_timeout)
+        self.limiter = limiter or RateLimiter(rpm, tpm)
+        self.stats: Counter = Counter()
+        self._client: Optional[OpenAI] = None
+        self._async_client: Optional[AsyncOpenAI] = None
+        self._lock = threading.Lock()
+
+    @property
+    def api_key(self) -> str:
+        return self._api_key or os.getenv("GROQ_API_KEY") or os.getenv("OPENAI_API_KEY", "")
+
+    def _sdk_args(self) -> Dict[str, Any]:
+        if not self.api_key:
+            raise LLMError("GROQ_API_KEY is not set")
+        return {"api_key": self.api_key, "base_url": self.base_url, "timeout": self.timeout, "max_retries": 0}
+
+    @property
+    def client(self) -> OpenAI:
+        """The pooled sync SDK client, created on first use."""
+        with self._lock:
+            if self._client is None:
+                self._client = OpenAI(**self._sdk_args())
+            return self._client
+
+    @property
+    def async_client(self) -> AsyncOpenAI:
+        """The pooled async SDK client, created on first use."""
+        with self._lock:
+            if self._async_client is None:
+                self._async_client = AsyncOpenAI(**self._sdk_args())
+            return self._async_client
+
+    # ------------------------------------------------------------- internals
+    def _reserve(self, params: Dict[str, Any]) -> tuple[int, float]:
+        params.setdefault("model", self.model)
+        if params.get("stream"):
+            params.setdefault("stream_options", {"include_usage": True})
+        tokens = _request_tokens(params)
+        delay = self.limiter.reserve(tokens)
+        if delay > self.max_wait:
+            self.limiter.cancel(tokens)
+            self.stats["refused"] += 1
+            raise LLMBusy(delay)
+        self.stats["requests"] += 1
+        if delay:
+            self.stats["throttled_seconds"] += delay
+        return tokens, delay
+
+    def _settle(self, response: Any, tokens: int) -> Any:
+        """Correct the TPM charge from *response*'s usage; streams settle at their end."""
+        if isinstance(response, (openai.Stream, openai.AsyncStream)):
+            return _UsageStream(response, lambda chunk: self._settle(chunk, tokens))
+        used = getattr(getattr(response, "usage", None), "total_tokens", None)
+        if isinstance(used, int):
+            self.limiter.settle(tokens, used)
+        return response
+
+    def _backoff(self, exc: BaseException, attempt: int, tokens: int) -> Optional[float]:
+        """Seconds to wait before retrying after *exc*, or ``None`` to give up."""
+        self.limiter.settle(tokens, 0)  # a failed request used no tokens
+        if isinstance(exc, openai.RateLimitError):
+            self.stats["rate_limited"] += 1
+        if attempt >= self.max_retries or not _retryable(exc):
+            return None
+        wait = retry_after(exc)
+        if wait is None:
+            # Full jitter: spread the retries of concurrent callers
+            wait = random.uniform(0, min(LLM_RETRY_MAX_SECONDS, LLM_RETRY_BASE_SECONDS * 2 ** attempt))
+        elif wait > LLM_RETRY_MAX_SECONDS:
+            return None
+        else:
+            wait += random.uniform(0, LLM_RETRY_BASE_SECONDS)
+        if isinstance(exc, openai.RateLimitError):
+            self.limiter.pause(wait)  # the quota is shared: everyone waits
+        self.stats["retries"] += 1
+        return wait
+
+    # ------------------------------------------------------------------ sync
+    def create(self, *, client: Optional[OpenAI] = None, **params: Any) -> Any:
+        """``chat.completions.create(**params)`` with pacing and retries.
+
+        *client* overrides the pooled SDK client.  Returns the SDK response
+        (a stream when ``stream=True``).  Raises :class:`LLMBusy` when the
+        limiter would hold the call longer than ``max_wait``.
+        """
+        for attempt in itertools.count():
+            tokens, delay = self._reserve(params)
+            if delay:
+                time.sleep(delay)
+            try:
+                response = (client or self.client).chat.completions.create(**params)
+            except Exception as exc:
+                wait = self._backoff(exc, attempt, tokens)
+                if wait is None:
+                    raise
+                time.sleep(wait)
+                continue
+            return self._settle(response, tokens)
+
+    def complete(self, messages: List[Dict[str, Any]], **params: Any) -> str:
+        response = self.create(messages=messages, **params)
+        return response.choices[0].message.content or ""
 
     def answer(self, prompt: str) -> str:
-        """Return a dummy answer.
+        """Answer a single-turn *prompt*."""
+        return self.complete([{"role": "user", "content": prompt}])
+
+    def close(self) -> None:
+        with self._lock:
+            client, self._client = self._client, None
+        if client is not None:
+            client.close()
+
+    # ----------------------------------------------------------------- async
+    async def acreate(self, *, client: Optional[AsyncOpenAI] = None, **params: Any) -> Any:
+        """Async :meth:`create`."""
+        for attempt in itertools.count():
+            tokens, delay = self._reserve(params)
+            if delay:
+                await asyncio.sleep(delay)
+            try:
+                response = await (client or self.async_client).chat.completions.create(**params)
+            except Exception as exc:
+                wait = self._backoff(exc, attempt, tokens)
+                if wait is None:
+                    raise
+                await asyncio.sleep(wait)
+                continue
+            return self._settle(response, tokens)
+
+    async def acomplete(self, messages: List[Dict[str, Any]], **params: Any) -> str:
+        response = await self.acreate(messages=messages, **params)
+        return response.choices[0].message.content or ""
 
-        Real integration would call the Groq API.
+    async def aanswer(self, prompt: str) -> str:
+        """Async :meth:`answer`."""
+        return await self.acomplete([{"role": "user", "content": prompt}])
+
+    async def astream(self, messages: List[Dict[str, Any]], **params: Any) -> AsyncIterator[str]:
+        """Yield the answer's text deltas as they arrive.
+
+        Only opening the stream is retried; an error mid-stream propagates.
         """
-        return "This is a placeholder answer."
+        stream = await self.acreate(messages=messages, stream=True, **params)
+        try:
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            await stream.close()
+
+    async def aclose(self) -> None:
+        with self._lock:
+            client, self._async_client = self._async_client, None
+        if client is not None:
+            await client.close()
@@ -0,0 +1,243 @@
+"""Local OpenAI-compatible stub of the Groq chat API.
+
+Serves ``POST <prefix>/chat/completions`` (JSON, or SSE with ``stream``,
+ending in a usage chunk when ``stream_options.include_usage`` is set) and
+``GET <prefix>/models`` from the standard library alone, so the client's
+pacing and backoff can be tested and benchmarked offline.  The stub can
+enforce its own RPM/TPM quota, replenished continuously like Groq's, and
+answer 429 with a ``Retry-After`` header once it is spent; it can also
+inject random or scripted failures and add latency.  ``GET /stats`` returns
+its counters.
+
+Usage::
+
+    python -m src.llm.stub_server --port 8089 --rpm 30 --tpm 6000 --fail-rate 0.05
+    LLM_BASE_URL=http://127.0.0.1:8089/openai/v1 GROQ_API_KEY=stub uvicorn ...
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterable, Optional
+
+try:  # package-relative import
+    from ..kb.retrieval import estimate_tokens
+    from .client import TokenBucket
+except Exception:  # fallback when imported as a script
+    from kb.retrieval import estimate_tokens  # type: ignore
+    from llm.client import TokenBucket  # type: ignore
+
+
+class StubServer:
+    """An OpenAI-compatible chat server on a background thread.
+
+    The quota is *rpm* requests and *tpm* tokens per *window* seconds (0:
+    unlimited).  ``fail_first`` lists HTTP statuses returned, in order, before
+    normal service; ``fail_rate`` fails that share of the remaining requests with a
+    503.  Scripted 429s carry ``Retry-After: retry_after``.  Use as a context
+    manager, or call :meth:`start` and :meth:`stop`.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        *,
+        rpm: float = 0,
+        tpm: float = 0,
+        window: float = 60.0,
+        latency: float = 0.0,
+        fail_rate: float = 0.0,
+        fail_first: Iterable[int] = (),
+        retry_after: float = 1.0,
+        reply: Optional[str] = None,
+        prefix: str = "/openai/v1",
+        seed: Optional[int] = None,
+    ) -> None:
+        per_minute = 60.0 / window
+        self._requests = TokenBucket(rpm * per_minute, capacity=rpm) if rpm > 0 else None
+        self._tokens = TokenBucket(tpm * per_minute, capacity=tpm) if tpm > 0 else None
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.fail_first = deque(fail_first)
+        self.retry_after = retry_after
+        self.reply = reply
+        self.prefix = prefix.rstrip("/")
+        self.stats: Counter = Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.stub = self  # type: ignore[attr-defined]
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}{self.prefix}"
+
+    def start(self) -> "StubServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="llm-stub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "StubServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def admit(self, tokens: int) -> tuple[int, float]:
+        """Decide the status of a request of *tokens*: ``(status, retry_after)``."""
+        with self._lock:
+            self.stats["requests"] += 1
+            if self.fail_first:
+                status = self.fail_first.popleft()
+                return status, self.retry_after
+            if self.fail_rate and self._random.random() < self.fail_rate:
+                return 503, 0.0
+            wait = 0.0
+            if self._requests is not None:
+                wait = self._requests.reserve(1)
+            if self._tokens is not None:
+                wait = max(wait, self._tokens.reserve(min(tokens, self._tokens.capacity)))
+            if wait > 0:
+                # Rejected requests do not count against the quota
+                if self._requests is not None:
+                    self._requests.refund(1)
+                if self._tokens is not None:
+                    self._tokens.refund(min(tokens, self._tokens.capacity))
+                return 429, wait
+            return 200, 0.0
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "llm-stub/1.0"
+
+    def log_message(self, format, *args) -> None:  # quiet
+        pass
+
+    def _json(self, status: int, body: dict, headers: Optional[dict] = None) -> None:
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self) -> None:
+        stub: StubServer = self.server.stub  # type: ignore[attr-defined]
+        if self.path == stub.prefix + "/models":
+            self._json(200, {"object": "list", "data": [{"id": "stub", "object": "model", "owned_by": "stub"}]})
+        elif self.path == "/stats":
+            with stub._lock:
+                self._json(200, dict(stub.stats))
+        else:
+            self._json(404, {"error": {"message": "not found", "type": "invalid_request_error"}})
+
+    def do_POST(self) -> None:
+        stub: StubServer = self.server.stub  # type: ignore[attr-defined]
+        if self.path != stub.prefix + "/chat/completions":
+            self._json(404, {"error": {"message": "not found", "type": "invalid_request_error"}})
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+        messages = body.get("messages") or []
+        prompt_tokens = sum(estimate_tokens(str(m.get("content") or "")) for m in messages)
+        max_tokens = body.get("max_tokens") or 0
+        status, wait = stub.admit(prompt_tokens + max_tokens)
+        if status == 429:
+            with stub._lock:
+                stub.stats["rate_limited"] += 1
+            self._json(429, {"error": {"message": "Rate limit reached", "type": "tokens", "code": "rate_limit_exceeded"}},
+                       {"retry-after": f"{wait:.3f}"})
+            return
+        if status != 200:
+            with stub._lock:
+                stub.stats["failed"] += 1
+            self._json(status, {"error": {"message": "Service unavailable", "type": "server_error"}})
+            return
+
+        if stub.latency:
+            time.sleep(stub.latency)
+        last = next((str(m.get("content") or "") for m in reversed(messages) if m.get("role") == "user"), "")
+        reply = stub.reply if stub.reply is not None else f"stub answer to: {last[:80]}"
+        completion_tokens = estimate_tokens(reply)
+        cid, created, model = f"chatcmpl-{uuid.uuid4().hex[:12]}", int(time.time()), body.get("model", "stub")
+        with stub._lock:
+            stub.stats["ok"] += 1
+            stub.stats["tokens"] += prompt_tokens + completion_tokens
+
+        if not body.get("stream"):
+            self._json(200, {
+                "id": cid, "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                          "total_tokens": prompt_tokens + completion_tokens},
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        words = reply.split(" ")
+        for i, word in enumerate(words):
+            delta = {"content": word + (" " if i < len(words) - 1 else "")}
+            if i == 0:
+                delta["role"] = "assistant"
+            self._event({"id": cid, "object": "chat.completion.chunk", "created": created, "model": model,
+                         "choices": [{"index": 0, "delta": delta, "finish_reason": None}]})
+        self._event({"id": cid, "object": "chat.completion.chunk", "created": created, "model": model,
+                     "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+        if (body.get("stream_options") or {}).get("include_usage"):
+            self._event({"id": cid, "object": "chat.completion.chunk", "created": created, "model": model,
+                         "choices": [], "usage": {"prompt_tokens": prompt_tokens,
+                                                  "completion_tokens": completion_tokens,
+                                                  "total_tokens": prompt_tokens + completion_tokens}})
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def _event(self, chunk: dict) -> None:
+        self.wfile.write(b"data: " + json.dumps(chunk, ensure_ascii=False).encode("utf-8") + b"\n\n")
+        self.wfile.flush()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--rpm", type=float, default=0, help="requests per window (0: unlimited)")
+    parser.add_argument("--tpm", type=float, default=0, help="tokens per window (0: unlimited)")
+    parser.add_argument("--window", type=float, default=60.0, help="quota window in seconds")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to each answer")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="share of requests failed with 503")
+    parser.add_argument("--reply", default=None, help="fixed answer text")
+    args = parser.parse_args()
+    stub = StubServer(args.host, args.port, rpm=args.rpm, tpm=args.tpm, window=args.window,
+                      latency=args.latency, fail_rate=args.fail_rate, reply=args.reply)
+    print(f"LLM stub listening on {stub.base_url}")
+    try:
+        stub._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stub._httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -5,25 +5,68 @@ recognition.  This module wraps the Gemini implementation and provides a
 transparent fallback to the local Tesseract engine when a ``GOOGLE_API_KEY`` is
 not configured or the remote call fails.  The goal is to keep the rest of the
 codebase agnostic to the OCR backend while maximising reliability.
+
+Rendered pages can be passed as :class:`RawImage` (uncompressed pixmap
+samples).  They are wrapped with ``Image.frombuffer`` instead of being
+round-tripped through PNG, so only the remote Gemini path encodes an image,
+once.
 """
 
 from __future__ import annotations
 
 import os
 import shutil
+from typing import List, NamedTuple, Optional, Tuple
+
+from PIL import Image
 
 try:  # package-relative import
-    from .gemini_ocr import ocr_image_bytes as _gemini_ocr
+    from .gemini_ocr import ocr_image_with_rotation as _gemini_ocr
+    from .gemini_ocr import ocr_images_batch as _gemini_batch
+    from .gemini_ocr import ocr_pil_batch as _gemini_pil_batch
+    from .gemini_ocr import ocr_pil_with_rotation as _gemini_pil
 except Exception:  # fallback when imported as a script
-    from gemini_ocr import ocr_image_bytes as _gemini_ocr  # type: ignore
+    from gemini_ocr import ocr_image_with_rotation as _gemini_ocr  # type: ignore
+    from gemini_ocr import ocr_images_batch as _gemini_batch  # type: ignore
+    from gemini_ocr import ocr_pil_batch as _gemini_pil_batch  # type: ignore
+    from gemini_ocr import ocr_pil_with_rotation as _gemini_pil  # type: ignore
 
 try:  # pragma: no cover - exercised in tests if available
-    from .tesseract_ocr import ocr_image_bytes as _tesseract_ocr
+    from .tesseract_ocr import ocr_image_with_rotation as _tesseract_ocr
+    from .tesseract_ocr import ocr_pil_with_confidence as _tesseract_pil
 except Exception:  # pragma: no cover - defensive: pytesseract missing
     try:
-        from tesseract_ocr import ocr_image_bytes as _tesseract_ocr  # type: ignore
+        from tesseract_ocr import ocr_image_with_rotation as _tesseract_ocr  # type: ignore
+        from tesseract_ocr import ocr_pil_with_confidence as _tesseract_pil  # type: ignore
     except Exception:
         _tesseract_ocr = None  # type: ignore
+        _tesseract_pil = None  # type: ignore
+
+
+class RawImage(NamedTuple):
+    """Uncompressed image samples, e.g. a PyMuPDF pixmap's ``samples``.
+
+    ``samples`` must own its memory (``bytes``, not a pixmap's
+    ``samples_mv``): PIL images wrap it without copying and may outlive the
+    pixmap.
+    """
+
+    samples: bytes
+    width: int
+    height: int
+    stride: int
+    colorspace: str
+
+
+_MODES = {"DeviceGray": "L", "L": "L", "DeviceRGB": "RGB", "RGB": "RGB"}
+
+
+def image_from_samples(raw: RawImage) -> Image.Image:
+    """Wrap *raw* samples in a PIL image without decoding or copying (grayscale)."""
+    mode = _MODES.get(raw.colorspace)
+    if mode is None:
+        raise ValueError(f"Unsupported colorspace: {raw.colorspace}")
+    return Image.frombuffer(mode, (raw.width, raw.height), raw.samples, "raw", mode, raw.stride, 1)
 
 
 def _tesseract_available() -> bool:
@@ -37,6 +80,14 @@ def ocr_image_bytes(image_bytes: bytes) -> str:
     variable is configured.  If Gemini fails or is unavailable, the function
     falls back to a local Tesseract OCR implementation (if installed).
     """
+    return ocr_image_with_rotation(image_bytes)[0]
+
+
+def ocr_image_with_rotation(image_bytes: bytes) -> Tuple[str, int, int]:
+    """Like :func:`ocr_image_bytes` but return ``(text, angle, attempts)``.
+
+    *attempts* is the number of rotations OCR'd before settling on *angle*.
+    """
 
     api_key = os.getenv("GOOGLE_API_KEY")
     if api_key:
@@ -49,3 +100,61 @@ def ocr_image_bytes(image_bytes: bytes) -> str:
         return _tesseract_ocr(image_bytes)  # type: ignore[misc]
 
     raise RuntimeError("No OCR backend available")
+
+
+def ocr_samples_with_rotation(raw: RawImage) -> Tuple[str, int, int]:
+    """:func:`ocr_image_with_rotation` for raw pixmap samples."""
+
+    text, _, angle, attempts = ocr_samples_with_confidence(raw)
+    return text, angle, attempts
+
+
+def ocr_samples_with_confidence(raw: RawImage) -> Tuple[str, Optional[float], int, int]:
+    """Like :func:`ocr_samples_with_rotation` but also return the confidence.
+
+    Returns ``(text, confidence, angle, attempts)``.  *confidence* is
+    Tesseract's mean word confidence (0-100, -1 without words), or ``None``
+    when the text came from Gemini, which reports none.
+    """
+
+    img = image_from_samples(raw)
+    if os.getenv("GOOGLE_API_KEY"):
+        try:
+            text, angle, attempts = _gemini_pil(img)
+            return text, None, angle, attempts
+        except Exception:
+            pass
+
+    if _tesseract_available():
+        result, angle, attempts = _tesseract_pil(img)  # type: ignore[misc]
+        return result.text, result.confidence, angle, attempts
+
+    raise RuntimeError("No OCR backend available")
+
+
+def ocr_images_batch(images: List[bytes]) -> List[str]:
+    """Return one text per image, batching remote calls when possible.
+
+    With Gemini configured all *images* go out in a single request; otherwise
+    (or if the batch call fails) each image is OCR'd individually.
+    """
+
+    if os.getenv("GOOGLE_API_KEY"):
+        try:
+            return _gemini_batch(images)
+        except Exception:
+            pass
+
+    return [ocr_image_bytes(data) for data in images]
+
+
+def ocr_samples_batch(pages: List[RawImage]) -> List[str]:
+    """:func:`ocr_images_batch` for raw pixmap samples."""
+
+    if os.getenv("GOOGLE_API_KEY"):
+        try:
+            return _gemini_pil_batch([image_from_samples(raw) for raw in pages])
+        except Exception:
+            pass
+
+    return [ocr_samples_with_rotation(raw)[0] for raw in pages]
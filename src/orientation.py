@@ -0,0 +1,104 @@
+"""Cheap page orientation estimation.
+
+Both OCR backends used to brute-force the four right-angle rotations, paying a
+full OCR pass (a remote Gemini call or a Tesseract run) for each one until the
+result looked long enough.  This module guesses the rotation up front so most
+pages need a single OCR call.  The estimate comes from, in order of trust:
+
+1. the EXIF orientation tag (photos taken with a phone),
+2. a text-line projection heuristic on a downscaled grayscale copy,
+3. Tesseract's orientation and script detection (OSD), when installed, only
+   when the projection is ambiguous (skewed or sparse pages).
+
+The projection heuristic only distinguishes horizontal from vertical text
+lines, so it yields the pair ``(0, 180)`` or ``(90, 270)``; the OCR backends
+try candidates in the returned order and stop at the first good result.  OSD
+runs in the Tesseract worker pool, so upright pages never pay for an extra
+``tesseract`` launch.
+"""
+
+from __future__ import annotations
+
+import os
+from typing import List, Optional, Tuple
+
+from PIL import Image, ImageStat
+
+try:  # package-relative import
+    from .tesseract_pool import get_pool
+except Exception:  # fallback when imported as a script
+    from tesseract_pool import get_pool  # type: ignore
+
+
+# Angles are counter-clockwise, as passed to ``Image.rotate``.
+ROTATIONS = (0, 90, 180, 270)
+
+# Upper bound on OCR calls per page; the best guess plus its 180° flip.
+MAX_ROTATION_ATTEMPTS = int(os.getenv("OCR_MAX_ROTATION_ATTEMPTS", "2"))
+
+_PROBE_SIZE = 400  # longest side of the downscaled copy used for heuristics
+_OSD_SIZE = 1600  # OSD needs more pixels to find characters
+_BLANK_STDDEV = 2.0  # below this the page is treated as blank
+# The projection decides alone when one profile's variance exceeds the other's by this factor
+_PROJECTION_MARGIN = 1.25
+
+# EXIF orientation tag -> counter-clockwise rotation that makes it upright
+_EXIF_ROTATION = {3: 180, 6: 270, 8: 90}
+
+
+def _exif_rotation(image: Image.Image) -> Optional[int]:
+    try:
+        return _EXIF_ROTATION.get(image.getexif().get(274))
+    except Exception:
+        return None
+
+
+def _osd_rotation(image: Image.Image) -> Optional[int]:
+    probe = image.convert("L")
+    probe.thumbnail((_OSD_SIZE, _OSD_SIZE))
+    try:
+        return get_pool().detect_orientation(probe)
+    except Exception:
+        return None
+
+
+def _profile_variance(profile: Image.Image) -> float:
+    return ImageStat.Stat(profile).var[0]
+
+
+def _projection_order(gray: Image.Image) -> Tuple[List[int], bool]:
+    """Order rotations by comparing row and column darkness profiles.
+
+    Horizontal text lines make the row profile alternate between ink and
+    whitespace, so its variance dominates the column profile's.  Also
+    returns whether one profile clearly dominated.
+    """
+    rows = _profile_variance(gray.resize((1, gray.height), Image.BOX))
+    cols = _profile_variance(gray.resize((gray.width, 1), Image.BOX))
+    decisive = max(rows, cols) >= _PROJECTION_MARGIN * min(rows, cols)
+    if rows >= cols:
+        return [0, 180, 90, 270], decisive
+    return [90, 270, 0, 180], decisive
+
+
+def candidate_rotations(image: Image.Image) -> List[int]:
+    """Return the rotations worth OCR'ing for *image*, most likely first.
+
+    Blank pages get a single ``0`` candidate; otherwise at most
+    ``MAX_ROTATION_ATTEMPTS`` angles are returned.
+    """
+    gray = image.convert("L")
+    gray.thumbnail((_PROBE_SIZE, _PROBE_SIZE))
+    if ImageStat.Stat(gray).stddev[0] < _BLANK_STDDEV:
+        return [0]
+
+    angle = _exif_rotation(image)
+    if angle is None:
+        order, decisive = _projection_order(gray)
+        if decisive:
+            return order[: max(1, MAX_ROTATION_ATTEMPTS)]
+        angle = _osd_rotation(image)
+    if angle is not None:
+        order = [angle, (angle + 180) % 360]
+        order += [a for a in ROTATIONS if a not in order]
+    return order[: max(1, MAX_ROTATION_ATTEMPTS)]
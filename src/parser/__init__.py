@@ -1,3 +1,13 @@
 """Parsing utilities for payslip fields."""
-from .basic import parse_fields
-__all__ = ["parse_fields"]
+from .fields import FIELDS, extract_fields, field_for_question, parse_fields
+from .table import WordBox, label_amounts, layout_fields, table_rows
+__all__ = [
+    "FIELDS",
+    "WordBox",
+    "extract_fields",
+    "field_for_question",
+    "label_amounts",
+    "layout_fields",
+    "parse_fields",
+    "table_rows",
+]
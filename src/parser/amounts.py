@@ -0,0 +1,61 @@
+"""Amount tokens and "label ... amount" runs, shared by the slip parsers.
+
+:mod:`parser.fields` scans for known labels, :mod:`parser.table` reads rows
+rebuilt from word boxes and :mod:`compare` reads every labelled line of a
+slip; all three agree here on what an amount looks like and on how a run of
+tokens splits into ``(label, amount)`` pairs.
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Iterable, List, Optional, Tuple
+
+# 12,345.67 / 12345.67 / -12 / 1,234.00- (trailing minus, common in RTL slips)
+NUM = r"[-−]?(?:\d{1,3}(?:,\d{3})+|\d+)(?:\.\d+)?[-−]?"
+_AMOUNT = re.compile(NUM)
+_PERCENT = re.compile(r"\d+(?:\.\d+)?%")
+_EDGE = ":;,.*|()[]-–₪\"'"
+QUOTES = str.maketrans({"״": '"', "”": '"', "“": '"', "׳": "'"})
+ID_DIGITS = 7  # bare integers this long are IDs/account numbers, not amounts
+
+
+def parse_amount(token: str) -> Optional[float]:
+    """Value of an amount *token* (``1,234.00-`` is negative), or ``None``."""
+    token = token.strip(":;|₪")
+    if not _AMOUNT.fullmatch(token):
+        return None
+    negative = token[0] in "-−" or token[-1] in "-−"
+    digits = token.strip("-−")
+    if "," not in digits and "." not in digits and len(digits) >= ID_DIGITS:
+        return None
+    value = float(digits.replace(",", ""))
+    return -value if negative else value
+
+
+def label_amounts(tokens: Iterable[str]) -> List[Tuple[str, float]]:
+    """Split a run of *tokens* into ``(label, amount)`` pairs.
+
+    Consecutive words form a label and the last amount before the next word
+    is its value (quantity and rate columns come first).  Percent tokens stay
+    part of the label so ``שעות נוספות 125%`` and ``150%`` are kept apart;
+    dates, IDs and other digit tokens are skipped.
+    """
+    pairs: List[Tuple[str, float]] = []
+    words: List[str] = []
+    amount = None
+    for token in tokens:
+        value = parse_amount(token)
+        if value is not None:
+            amount = value
+            continue
+        word = token.strip(_EDGE)
+        if not word or not (_PERCENT.fullmatch(word) or not any(ch.isdigit() for ch in word)):
+            continue
+        if amount is not None and words:
+            pairs.append((" ".join(words), amount))
+            words, amount = [], None
+        words.append(word)
+    if words and amount is not None:
+        pairs.append((" ".join(words), amount))
+    return pairs
@@ -0,0 +1,189 @@
+"""Payslip field extraction in one compiled scanning pass.
+
+Every label variant of every field is compiled into a single regex
+alternation (longest variants first, so ``ברוטו למס`` wins over ``ברוטו``),
+and one ``finditer`` over the slip picks up each label with the amount that
+follows it on the same line.  When a line has several amounts (quantity,
+rate, amount) the last one is taken; when none follows, an amount just before
+the label is used, as RTL text often comes out reversed.
+
+Cumulative (year-to-date) figures are reported under ``<field>_ytd``: either
+the label carries ``מצטבר`` (``מס הכנסה מצטבר``) or it appears after a
+``נתונים מצטברים`` section heading.
+
+Results are cached per slip text, so repeated questions about the same slip
+do not re-scan it.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+from .amounts import NUM as _NUM, parse_amount
+
+PARSE_CACHE_SIZE = int(os.getenv("PARSE_CACHE_SIZE", "1024"))
+
+# Canonical field -> label variants as they appear on slips
+FIELDS: Dict[str, Tuple[str, ...]] = {
+    "gross_salary": ("שכר ברוטו", 'סה"כ ברוטו', 'סה"כ תשלומים', "ברוטו", "gross salary", "gross"),
+    "taxable_gross": ("ברוטו למס הכנסה", "ברוטו למס", "שכר חייב במס"),
+    "ni_gross": ("ברוטו לביטוח לאומי", "ברוטו לב.ל.", "שכר חייב בביטוח לאומי"),
+    "base_salary": ("שכר יסוד", "שכר בסיס", "base salary"),
+    "net_salary": ("נטו לתשלום", "שכר נטו", 'סה"כ נטו', "נטו", "net salary", "net pay", "net"),
+    "total_deductions": ('סה"כ ניכויים', "total deductions"),
+    "income_tax": ("מס הכנסה", "income tax"),
+    "national_insurance": ("ביטוח לאומי", "ב.ל.", "national insurance"),
+    "health_insurance": ("ביטוח בריאות", "דמי בריאות", "מס בריאות", "health insurance", "health tax"),
+    "pension_employee": ("פנסיה עובד", "גמל עובד", "תגמולי עובד", "קופת גמל עובד"),
+    "pension_employer": ("פנסיה מעסיק", "פנסיה מעביד", "גמל מעסיק", "גמל מעביד", "תגמולי מעסיק", "תגמולי מעביד"),
+    "severance_employer": ("פיצויים מעסיק", "פיצויים מעביד", "פיצויים"),
+    "study_fund_employee": ("קרן השתלמות עובד", "קרן השתלמות", 'קה"ש עובד'),
+    "study_fund_employer": ("קרן השתלמות מעסיק", "קרן השתלמות מעביד", 'קה"ש מעסיק'),
+    "credit_points": ("נקודות זיכוי", "נק' זיכוי", "נק זיכוי", "credit points"),
+    "vacation_days": ("יתרת ימי חופשה", "יתרת חופשה", "ימי חופשה", "vacation days"),
+    "sick_days": ("יתרת ימי מחלה", "יתרת מחלה", "ימי מחלה", "sick days"),
+}
+
+# Fields that also have a year-to-date figure
+CUMULATIVE = frozenset({
+    "gross_salary", "taxable_gross", "ni_gross", "net_salary", "income_tax", "national_insurance",
+    "health_insurance", "pension_employee", "pension_employer", "study_fund_employee", "study_fund_employer",
+})
+
+_LABELS: Dict[str, str] = {
+    variant.lower().replace("״", '"').replace("׳", "'"): field
+    for field, variants in FIELDS.items()
+    for variant in variants
+}
+# Headings after which figures are year-to-date; scanned like labels
+_SECTIONS = ("נתונים מצטברים", "מצטבר מתחילת השנה", "year to date")
+
+
+_CHARS = {" ": r"[^\S\n]+", '"': '["״”]', "'": "['׳]"}
+
+
+def _trie_pattern(labels) -> str:
+    """Alternation of *labels* factored by common prefix.
+
+    ``re`` tries the alternatives of a flat ``a|b|c`` one by one at every
+    position; as a trie each position costs about one character comparison
+    per level, and longer labels are still preferred over their prefixes.
+    """
+    trie: dict = {}
+    for label in labels:
+        node = trie
+        for ch in label:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def emit(node: dict) -> str:
+        branches = [_CHARS.get(ch, re.escape(ch)) + emit(child) for ch, child in node.items() if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return f"(?:{body})?" if "" in node else body
+
+    return emit(trie)
+
+
+# Column words that may sit between the amounts of one line, as in
+# "ימי חופשה צבירה 1.5 ניצול 2 יתרה 12.5" (the balance comes last)
+_COLUMN = r"(?:צבירה|ניצול|נוצל|יתרה|כמות|תעריף|סכום|accrued|used|balance)[^\S\n]*:?"
+_SEP = r"[^\S\n]+(?:" + _COLUMN + r"[^\S\n]+)?₪?"
+# Matched against lowercased text, so English labels need no IGNORECASE.  The
+# word-start check is done in Python on hits only; a lookbehind here would run
+# at every position and roughly doubles the scan time.
+_SCAN = re.compile(
+    r"(?P<label>" + _trie_pattern([*_LABELS, *_SECTIONS]) + r")(?!\w)"
+    r"(?P<ytd>[^\S\n]+מצטבר|[^\S\n]+ytd)?"
+    r"(?:[^\d\n]{0,16}?(?P<nums>" + _NUM + r"%?(?:" + _SEP + _NUM + r"%?)*))?"
+)
+# Amount right before a label, for lines that come out reversed
+_PRE = re.compile(r"(" + _NUM + r")[^\S\n]*₪?[^\S\n]+$")
+
+
+def _number(token: str) -> Optional[float]:
+    value = parse_amount(token)
+    if value is not None and value.is_integer():
+        value = int(value)  # whole amounts stay ints in JSON ("10000", not "10000.0")
+    return value
+
+
+@lru_cache(maxsize=256)
+def _canonical(label: str) -> str:
+    """Field for a matched *label*; ``""`` for a year-to-date section heading."""
+    key = " ".join(label.split()).replace("״", '"').replace("”", '"').replace("׳", "'")
+    return _LABELS.get(key, "")
+
+
+# Attached Hebrew prefix letters, as in kb.retrieval.tokenize ("הברוטו", "בנטו")
+_PREFIXES = "והבכלמש"
+
+
+def _word_start(text: str, pos: int, prefixes: int = 0) -> bool:
+    """Whether *pos* starts a word, allowing up to *prefixes* attached prefix letters."""
+    while pos and (text[pos - 1].isalnum() or text[pos - 1] in '_"״'):
+        if not prefixes or text[pos - 1] not in _PREFIXES:
+            return False
+        pos -= 1
+        prefixes -= 1
+    return True
+
+
+def extract_fields(text: str) -> Dict[str, float]:
+    """Return ``{field: amount}`` for every field found in *text* (first occurrence wins)."""
+    fields: Dict[str, float] = {}
+    cumulative = False
+    text = text.lower()
+    for match in _SCAN.finditer(text):
+        label, ytd, nums = match.groups()
+        start = match.start()
+        if not _word_start(text, start):
+            continue
+        field = _canonical(label)
+        if not field:
+            cumulative = True
+            continue
+        amount = None
+        if nums:
+            for token in reversed(nums.replace("₪", " ").split()):
+                amount = _number(token)
+                if amount is not None:
+                    break
+        if amount is None:
+            pre = _PRE.search(text, text.rfind("\n", 0, start) + 1, start)
+            amount = _number(pre.group(1)) if pre else None
+        if amount is None:
+            continue
+        if (cumulative or ytd) and field in CUMULATIVE:
+            field += "_ytd"
+        if field not in fields:
+            fields[field] = amount
+    return fields
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _parse_cached(text: str) -> Tuple[Tuple[str, float], ...]:
+    return tuple(extract_fields(text).items())
+
+
+def parse_fields(text: str) -> Dict[str, float]:
+    """Cached :func:`extract_fields`; parsing the same slip text again is a lookup."""
+    return dict(_parse_cached(text))
+
+
+def field_for_question(question: str) -> Optional[str]:
+    """Return the field whose label appears in *question*, if any.
+
+    Unlike slip text, questions often attach a prefix to the label
+    ("מה הברוטו שלי?"), so up to two prefix letters are accepted.
+    """
+    question = question.lower()
+    for match in _SCAN.finditer(question):
+        field = _canonical(match.group("label"))
+        if field and _word_start(question, match.start(), prefixes=2):
+            return field + "_ytd" if match.group("ytd") and field in CUMULATIVE else field
+    return None
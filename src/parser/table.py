@@ -0,0 +1,144 @@
+"""Layout-aware parsing of payslip tables from word boxes.
+
+``page.get_text("text")`` linearizes a page block by block, so the columns of
+an RTL payslip table often come out interleaved: labels in one run, amounts
+in another.  Here the words are kept with their coordinates, either from
+PyMuPDF's ``page.get_text("words")`` or from Tesseract's TSV boxes, and one
+pass over the coordinate arrays:
+
+1. clusters words into rows by vertical centre (a new row starts where the
+   sorted centres jump by more than half the median word height),
+2. orders each row in reading direction (right to left when it contains
+   Hebrew),
+3. splits the row into cells at horizontal gaps wider than the median word
+   height, i.e. at column boundaries.
+
+Each row then yields ``label -> amount`` pairs via
+:func:`parser.amounts.label_amounts`: consecutive words form a label and the
+last amount before the next label is its value (quantity and rate columns
+come first in reading order).  :func:`layout_text` renders the
+rows as clean lines so :func:`parser.fields.extract_fields` can name them.
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Dict, Iterable, List, NamedTuple, Sequence, Tuple
+
+try:  # pragma: no cover - numpy ships with the streamlit/pandas stack
+    import numpy as np
+except Exception:  # pragma: no cover - pure-Python fallback below
+    np = None  # type: ignore
+
+from . import amounts
+from .fields import extract_fields
+
+_HEBREW = re.compile(r"[֐-׿]")
+
+ROW_TOLERANCE = 0.5  # of the median word height
+CELL_GAP = 1.0  # of the median word height
+
+
+class WordBox(NamedTuple):
+    x0: float
+    y0: float
+    x1: float
+    y1: float
+    text: str
+
+
+def words_from_pymupdf(words: Iterable[Sequence]) -> List[WordBox]:
+    """Convert ``page.get_text("words")`` tuples."""
+    return [WordBox(w[0], w[1], w[2], w[3], w[4]) for w in words if str(w[4]).strip()]
+
+
+def words_from_tesseract(words: Iterable) -> List[WordBox]:
+    """Convert :class:`tesseract_pool.Word` boxes (left, top, width, height)."""
+    boxes = []
+    for word in words:
+        left, top, width, height = word.box
+        boxes.append(WordBox(left, top, left + width, top + height, word.text))
+    return boxes
+
+
+def _cells_numpy(words: Sequence[WordBox]) -> List[List[str]]:
+    coords = np.array([w[:4] for w in words], dtype=float)
+    x0, y0, x1, y1 = coords.T
+    height = float(np.median(y1 - y0)) or 1.0
+    centre = (y0 + y1) / 2
+
+    by_y = np.argsort(centre, kind="stable")
+    row = np.empty(len(words), dtype=int)
+    row[by_y] = np.concatenate(([0], np.cumsum(np.diff(centre[by_y]) > ROW_TOLERANCE * height)))
+
+    hebrew = np.array([bool(_HEBREW.search(w.text)) for w in words])
+    rtl = (np.bincount(row, weights=hebrew) > 0)[row]
+    order = np.lexsort((np.where(rtl, -x1, x0), row))
+
+    r, left, right, flip = row[order], x0[order], x1[order], rtl[order]
+    gap = np.where(flip[1:], left[:-1] - right[1:], left[1:] - right[:-1])
+    new_row = r[1:] != r[:-1]
+    new_cell = new_row | (gap > CELL_GAP * height)
+
+    rows: List[List[str]] = [[words[order[0]].text]]
+    for i, idx in enumerate(order[1:]):
+        text = words[idx].text
+        if new_row[i]:
+            rows.append([text])
+        elif new_cell[i]:
+            rows[-1].append(text)
+        else:
+            rows[-1][-1] += " " + text
+    return rows
+
+
+def _cells_python(words: Sequence[WordBox]) -> List[List[str]]:
+    heights = sorted(w.y1 - w.y0 for w in words)
+    height = heights[len(heights) // 2] or 1.0
+    grouped: List[List[WordBox]] = []
+    last = None
+    for w in sorted(words, key=lambda w: (w.y0 + w.y1) / 2):
+        centre = (w.y0 + w.y1) / 2
+        if last is None or centre - last > ROW_TOLERANCE * height:
+            grouped.append([])
+        grouped[-1].append(w)
+        last = centre
+
+    rows: List[List[str]] = []
+    for group in grouped:
+        rtl = any(_HEBREW.search(w.text) for w in group)
+        group.sort(key=(lambda w: -w.x1) if rtl else (lambda w: w.x0))
+        cells = [group[0].text]
+        for prev, cur in zip(group, group[1:]):
+            gap = prev.x0 - cur.x1 if rtl else cur.x0 - prev.x1
+            if gap > CELL_GAP * height:
+                cells.append(cur.text)
+            else:
+                cells[-1] += " " + cur.text
+        rows.append(cells)
+    return rows
+
+
+def table_rows(words: Sequence[WordBox]) -> List[List[str]]:
+    """Cluster *words* into rows of cell texts, top to bottom, in reading order."""
+    if not words:
+        return []
+    return _cells_numpy(words) if np is not None else _cells_python(words)
+
+
+def label_amounts(words: Sequence[WordBox]) -> List[Tuple[str, float]]:
+    """Return ``(label, amount)`` pairs read off the table rows of *words*."""
+    pairs: List[Tuple[str, float]] = []
+    for cells in table_rows(words):
+        pairs += amounts.label_amounts(" ".join(cells).translate(amounts.QUOTES).split())
+    return pairs
+
+
+def layout_text(words: Sequence[WordBox]) -> str:
+    """Rows rendered one per line in reading order, cells separated by spaces."""
+    return "\n".join(" ".join(cells) for cells in table_rows(words))
+
+
+def layout_fields(words: Sequence[WordBox]) -> Dict[str, float]:
+    """Structured fields from the geometric rows of *words*."""
+    return extract_fields(layout_text(words))
@@ -0,0 +1,60 @@
+"""Page rasterization for OCR.
+
+Scanned payslips are usually a single embedded image per page, often at
+150–200 DPI.  Rendering such a page far above the scan's own resolution adds
+pixels (render time, memory, Gemini upload bytes) without adding detail, so
+the render scale is chosen per page from the embedded images' native
+resolution, clamped to ``[OCR_MIN_SCALE, max_scale]`` and to a pixel budget.
+"""
+
+from __future__ import annotations
+
+import math
+import os
+
+import fitz  # PyMuPDF
+
+try:  # package-relative import
+    from .ocr import RawImage
+except Exception:  # fallback when imported as a script
+    from ocr import RawImage  # type: ignore
+
+
+OCR_MIN_SCALE = float(os.getenv("OCR_MIN_SCALE", "2.0"))  # 144 DPI floor
+OCR_MAX_PIXELS = int(os.getenv("OCR_MAX_PIXELS", str(12_000_000)))
+
+
+def native_scale(page: fitz.Page) -> float | None:
+    """Return the highest pixels-per-point of the images drawn on *page*."""
+    best = None
+    for info in page.get_image_info():
+        x0, y0, x1, y1 = info["bbox"]
+        area = (x1 - x0) * (y1 - y0)
+        if area <= 0 or not info.get("width") or not info.get("height"):
+            continue
+        # Orientation-independent: placement may rotate the image by 90°
+        scale = math.sqrt(info["width"] * info["height"] / area)
+        best = scale if best is None else max(best, scale)
+    return best
+
+
+def page_render_scale(page: fitz.Page, max_scale: float) -> float:
+    """Pick the render scale for OCR'ing *page*, never above *max_scale*."""
+    scale = max_scale
+    native = native_scale(page)
+    if native is not None:
+        scale = min(max_scale, max(OCR_MIN_SCALE, native))
+    area = page.rect.width * page.rect.height
+    if area > 0:
+        scale = min(scale, math.sqrt(OCR_MAX_PIXELS / area))
+    return scale
+
+
+def render_page(page: fitz.Page, scale: float, clip: fitz.Rect | None = None) -> RawImage:
+    """Rasterize *page* (or just *clip*) to grayscale samples for OCR.
+
+    The samples are copied out of the pixmap once and handed to OCR without
+    PNG encoding.
+    """
+    pix = page.get_pixmap(matrix=fitz.Matrix(scale, scale), alpha=False, colorspace=fitz.csGRAY, clip=clip)
+    return RawImage(pix.samples, pix.width, pix.height, pix.stride, pix.colorspace.name)
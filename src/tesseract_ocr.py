@@ -1,44 +1,83 @@
 """Local OCR using Tesseract.
 
-This module provides a drop-in replacement for Gemini OCR using the
-`pytesseract` package.  It performs basic rotation handling similar to the
-Gemini implementation: the image is rotated in 90-degree increments and the
-longest result is returned.
+This module provides a drop-in replacement for Gemini OCR.  Recognition runs
+in the persistent worker pool from :mod:`tesseract_pool`, which returns word
+confidences alongside the text.  Rotation is handled like the Gemini
+implementation: the likely orientations are estimated first (see
+:mod:`orientation`) and the most confident result across the attempted
+rotations is returned.
 """
 
 from __future__ import annotations
 
+import functools
 import io
-from typing import Iterable
+import os
+from typing import Tuple
 
 from PIL import Image
 
+try:  # package-relative import
+    from .orientation import candidate_rotations
+    from .tesseract_pool import OcrResult, get_pool
+except Exception:  # fallback when imported as a script
+    from orientation import candidate_rotations  # type: ignore
+    from tesseract_pool import OcrResult, get_pool  # type: ignore
+
 try:  # pragma: no cover - exercised in tests if available
     import pytesseract
 except Exception:  # pragma: no cover - defensive: pytesseract not installed
     pytesseract = None  # type: ignore
 
 
-_ROTATIONS: Iterable[int] = (0, 90, 180, 270)
+# Mean word confidence at which a rotation is accepted without trying others
+MIN_CONFIDENCE = float(os.getenv("TESSERACT_MIN_CONFIDENCE", "60"))
 
 
-def ocr_image_bytes(image_bytes: bytes) -> str:
-    """Return text extracted from *image_bytes* using Tesseract.
+@functools.lru_cache(maxsize=1)
+def _installed() -> bool:
+    try:
+        return pytesseract is not None and bool(pytesseract.get_tesseract_version())
+    except Exception:
+        return False
+
 
-    The function attempts several rotations and returns the longest string.
-    A :class:`RuntimeError` is raised if ``pytesseract`` or the ``tesseract``
-    binary is not available.
+def ocr_pil_with_confidence(image: Image.Image) -> Tuple[OcrResult, int, int]:
+    """Return ``(result, angle, attempts)`` for a decoded *image*.
+
+    The likely rotations are tried in order; the result with the highest mean
+    word confidence wins.  A :class:`RuntimeError` is raised if
+    ``pytesseract`` or the ``tesseract`` binary is not available.
     """
-    if pytesseract is None or not pytesseract.get_tesseract_version():
+    if not _installed():
         raise RuntimeError("Tesseract is not installed")
 
-    image = Image.open(io.BytesIO(image_bytes))
-    best = ""
-    for angle in _ROTATIONS:
-        rotated = image.rotate(angle, expand=True)
-        text = pytesseract.image_to_string(rotated)
-        if len(text) > len(best):
-            best = text
-        if len(best.strip()) > 20:
+    pool = get_pool()
+    best = OcrResult("", -1.0, [])
+    best_angle = 0
+    attempts = 0
+    for angle in candidate_rotations(image):
+        attempts += 1
+        result = pool.recognize(image, angle)
+        if (result.confidence, len(result.text)) > (best.confidence, len(best.text)):
+            best = result
+            best_angle = angle
+        if best.text and best.confidence >= MIN_CONFIDENCE:
             break
-    return best.strip()
+    return best, best_angle, attempts
+
+
+def ocr_pil_with_rotation(image: Image.Image) -> Tuple[str, int, int]:
+    """Return ``(text, angle, attempts)`` for a decoded *image* using Tesseract."""
+    result, angle, attempts = ocr_pil_with_confidence(image)
+    return result.text, angle, attempts
+
+
+def ocr_image_with_rotation(image_bytes: bytes) -> Tuple[str, int, int]:
+    """Return ``(text, angle, attempts)`` for *image_bytes* using Tesseract."""
+    return ocr_pil_with_rotation(Image.open(io.BytesIO(image_bytes)))
+
+
+def ocr_image_bytes(image_bytes: bytes) -> str:
+    """Return text extracted from *image_bytes* using Tesseract."""
+    return ocr_image_with_rotation(image_bytes)[0]
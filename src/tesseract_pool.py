@@ -0,0 +1,235 @@
+"""Persistent Tesseract workers returning text with word confidences.
+
+``pytesseract`` spawns a fresh ``tesseract`` process per call, which reloads
+the language models every time.  :class:`TesseractPool` keeps one long-lived
+worker process per core instead.  Images reach a worker through shared memory
+(only the segment name and geometry travel over the pipe) and results come
+back as parsed TSV: the text plus a confidence per word.  Orientation
+detection (OSD) runs in the same workers, see
+:meth:`TesseractPool.detect_orientation`.
+
+Inside a worker the engine is ``tesserocr`` when installed, which keeps the
+models loaded for the life of the process.  Without it the engine is
+``pytesseract.image_to_data``, which spawns ``tesseract`` per image anyway, so
+worker processes would only add a hop: ``TESSERACT_WORKERS`` then defaults to
+0 and the pool runs in-process.
+"""
+
+from __future__ import annotations
+
+import atexit
+import multiprocessing
+import os
+import shutil
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import List, NamedTuple, Optional, Tuple
+
+from PIL import Image
+
+try:  # pragma: no cover - optional, keeps models loaded between images
+    import tesserocr  # type: ignore
+except Exception:  # pragma: no cover - fall back to pytesseract
+    tesserocr = None  # type: ignore
+
+try:  # pragma: no cover - exercised in tests if available
+    import pytesseract
+except Exception:  # pragma: no cover - defensive: pytesseract not installed
+    pytesseract = None  # type: ignore
+
+
+TESSERACT_LANG = os.getenv("TESSERACT_LANG", "eng")
+# 0 runs the engine in-process (no worker processes); the default only
+# starts workers when tesserocr can keep the models loaded in them
+TESSERACT_WORKERS = int(os.getenv("TESSERACT_WORKERS", str(os.cpu_count() or 1) if tesserocr is not None else "0"))
+
+
+class Word(NamedTuple):
+    text: str
+    confidence: float
+    box: Tuple[int, int, int, int]  # left, top, width, height
+    line: Tuple[int, int, int]  # block, paragraph, line
+
+
+class OcrResult(NamedTuple):
+    text: str
+    confidence: float  # mean word confidence, 0-100; -1 when no words
+    words: List[Word]
+
+
+def parse_tsv(tsv: str) -> OcrResult:
+    """Parse Tesseract TSV output (with or without header) into words.
+
+    Words are re-joined into lines in reading order; lines of different
+    blocks are separated by a blank line.
+    """
+    words: List[Word] = []
+    for row in tsv.splitlines():
+        cols = row.split("\t")
+        if len(cols) < 12 or cols[0] != "5":
+            continue
+        text = cols[11].strip()
+        try:
+            conf = float(cols[10])
+        except ValueError:
+            continue
+        if not text or conf < 0:
+            continue
+        box = (int(cols[6]), int(cols[7]), int(cols[8]), int(cols[9]))
+        words.append(Word(text, conf, box, (int(cols[2]), int(cols[3]), int(cols[4]))))
+
+    lines: List[str] = []
+    current: List[str] = []
+    prev: Optional[Tuple[int, int, int]] = None
+    for word in words:
+        if prev is not None and word.line != prev:
+            lines.append(" ".join(current))
+            if word.line[0] != prev[0]:
+                lines.append("")
+            current = []
+        current.append(word.text)
+        prev = word.line
+    if current:
+        lines.append(" ".join(current))
+
+    confidence = sum(w.confidence for w in words) / len(words) if words else -1.0
+    return OcrResult("\n".join(lines).strip(), confidence, words)
+
+
+# ---------------------------------------------------------------------------
+# Engine (runs inside a worker process, or in-process when workers == 0)
+# ---------------------------------------------------------------------------
+_api = None
+_osd_api = None
+_lang = TESSERACT_LANG
+_engine_lock = threading.Lock()
+
+
+def _init_worker(lang: str) -> None:
+    global _api, _lang
+    _lang = lang
+    if tesserocr is not None:
+        _api = tesserocr.PyTessBaseAPI(lang=lang)
+
+
+def _recognize(image: Image.Image) -> OcrResult:
+    if _api is not None:
+        with _engine_lock:
+            _api.SetImage(image)
+            return parse_tsv(_api.GetTSVText(0))
+    if pytesseract is None:
+        raise RuntimeError("Tesseract is not installed")
+    # pytesseract hands the image over as a temp file in ``image.format``;
+    # uncompressed PGM/PPM is much cheaper to write and read back than PNG.
+    # Set it on a copy: the caller's image keeps its own format.
+    fmt = "PGM" if image.mode == "L" else "PPM"
+    if image.format != fmt:
+        image = image.copy()
+        image.format = fmt
+    return parse_tsv(pytesseract.image_to_data(image, lang=_lang))
+
+
+def _detect_orientation(image: Image.Image) -> Optional[int]:
+    """Counter-clockwise rotation that makes *image* upright, per Tesseract OSD."""
+    global _osd_api
+    try:
+        if tesserocr is not None:
+            with _engine_lock:
+                if _osd_api is None:
+                    _osd_api = tesserocr.PyTessBaseAPI(lang="osd", psm=tesserocr.PSM.OSD_ONLY)
+                _osd_api.SetImage(image)
+                osd = _osd_api.DetectOrientationScript()
+            return int(osd["orient_deg"]) % 360 if osd else None
+        if pytesseract is None or shutil.which("tesseract") is None:
+            return None
+        osd = pytesseract.image_to_osd(image, output_type=pytesseract.Output.DICT)
+    except Exception:  # missing osd.traineddata or too little text
+        return None
+    # OSD reports the clockwise rotation needed to make the page upright
+    return (360 - int(osd.get("rotate", 0))) % 360
+
+
+def _from_shared(name: str, mode: str, size: Tuple[int, int]) -> Image.Image:
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        return Image.frombytes(mode, size, bytes(shm.buf[: size[0] * size[1] * len(mode)]))
+    finally:
+        shm.close()
+
+
+def _detect_shared(name: str, mode: str, size: Tuple[int, int]) -> Optional[int]:
+    return _detect_orientation(_from_shared(name, mode, size))
+
+
+def _recognize_shared(name: str, mode: str, size: Tuple[int, int], angle: int) -> OcrResult:
+    image = _from_shared(name, mode, size)
+    if angle:
+        image = image.rotate(angle, expand=True)
+    try:
+        return _recognize(image)
+    except Exception as exc:
+        # pytesseract's exceptions don't survive pickling back to the parent
+        raise RuntimeError(f"Tesseract failed: {exc}") from None
+
+
+class TesseractPool:
+    """Pool of long-lived Tesseract worker processes."""
+
+    def __init__(self, workers: int = TESSERACT_WORKERS, lang: str = TESSERACT_LANG) -> None:
+        self.workers = workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        if workers > 0:
+            self._executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(lang,),
+            )
+        elif _api is None:
+            _init_worker(lang)
+
+    def _run_shared(self, fn, image: Image.Image, *args):
+        data = image.tobytes()
+        shm = shared_memory.SharedMemory(create=True, size=max(1, len(data)))
+        try:
+            shm.buf[: len(data)] = data
+            return self._executor.submit(fn, shm.name, image.mode, image.size, *args).result()
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def recognize(self, image: Image.Image, angle: int = 0) -> OcrResult:
+        """OCR *image* rotated counter-clockwise by *angle* degrees."""
+        if image.mode not in ("L", "RGB"):
+            image = image.convert("RGB")
+        if self._executor is None:
+            return _recognize(image.rotate(angle, expand=True) if angle else image)
+        return self._run_shared(_recognize_shared, image, angle)
+
+    def detect_orientation(self, image: Image.Image) -> Optional[int]:
+        """Counter-clockwise rotation making *image* upright; ``None`` when OSD is unavailable or unsure."""
+        if image.mode not in ("L", "RGB"):
+            image = image.convert("L")
+        if self._executor is None:
+            return _detect_orientation(image)
+        return self._run_shared(_detect_shared, image)
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+_pool: Optional[TesseractPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> TesseractPool:
+    """Return the process-wide pool, starting the workers on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = TesseractPool()
+            atexit.register(_pool.close)
+    return _pool
@@ -0,0 +1,11 @@
+import os
+import tempfile
+
+# Keep the SQLite store (payslips and caches) out of the working tree and
+# fresh for every test session.
+os.environ.setdefault("DB_PATH", os.path.join(tempfile.mkdtemp(prefix="payslip-tests-"), "payslips.db"))
+
+# No client-side LLM pacing in tests (the LLM calls are faked); the limiter
+# itself is tested with explicit quotas.
+os.environ.setdefault("LLM_RPM", "0")
+os.environ.setdefault("LLM_TPM", "0")
@@ -17,3 +17,25 @@ def test_upload_and_ask() -> None:
         "/api/ask", json={"slip_id": slip_id, "question": "Gross?"}
     )
     assert resp.json()["answer"] == "10000"
+
+
+def test_ask_sends_only_top_chunks(monkeypatch) -> None:
+    import api.main as main
+
+    prompts = []
+
+    async def aanswer(prompt):
+        prompts.append(prompt)
+        return "14"
+
+    monkeypatch.setattr(main.LLM, "aanswer", aanswer)
+    monkeypatch.setattr(main, "ASK_CONTEXT_TOKENS", 100)
+    page = "תלוש שכר עמוד {i}\nשכר יסוד 12,000.00\nמס הכנסה 1,210.00\nביטוח לאומי 512.00"
+    text = "\n\n".join(page.format(i=i) for i in range(30)) + "\n\nיתרת מחלה 14 ימים"
+    resp = client.post("/api/upload", files={"file": ("long.txt", text.encode("utf-8"))})
+    slip_id = resp.json()["slip_id"]
+
+    resp = client.post("/api/ask", json={"slip_id": slip_id, "question": "כמה מחלה צברתי?"})
+    assert resp.json()["answer"] == "14"
+    assert "יתרת מחלה 14 ימים" in prompts[0]
+    assert len(prompts[0]) < len(text) / 5
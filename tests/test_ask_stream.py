@@ -0,0 +1,126 @@
+import importlib
+import json
+import os
+import sys
+
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def make_chunk(text):
+    delta = type("Delta", (), {"content": text})()
+    return type("Chunk", (), {"choices": [type("Choice", (), {"delta": delta})()]})()
+
+
+def test_ask_stream_forwards_tokens(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    backend = importlib.import_module("backend")
+    captured = {"closed": 0}
+
+    class DummyStream:
+        def __init__(self, parts):
+            self._parts = iter(parts)
+
+        def __aiter__(self):
+            return self
+
+        async def __anext__(self):
+            try:
+                return make_chunk(next(self._parts))
+            except StopIteration:
+                raise StopAsyncIteration
+
+        async def close(self):
+            captured["closed"] += 1
+
+    class DummyAsyncClient:
+        def __init__(self, *a, **k):
+            self.chat = type("Chat", (), {"completions": self})()
+
+        async def create(self, **kwargs):
+            captured["kwargs"] = kwargs
+            return DummyStream(["הברוטו ", "שלך ", "10000"])
+
+        async def close(self):
+            pass
+
+    monkeypatch.setattr(backend, "get_llm_client", DummyAsyncClient)
+    monkeypatch.setattr(backend, "get_payslip", lambda pid: "Gross 10000")
+
+    client = TestClient(backend.app)
+    resp = client.post("/ask/stream", json={"question": "מה הברוטו שלי?", "payslip_id": "p1"})
+
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/event-stream")
+    events = [e for e in resp.text.split("\n\n") if e]
+    deltas = [json.loads(e[len("data: "):])["delta"] for e in events if e.startswith("data: ")]
+    assert "".join(deltas) == "הברוטו שלך 10000"
+    assert events[0].startswith("event: start")
+    assert events[-1].startswith("event: done")
+    assert captured["kwargs"]["stream"] is True
+    assert "Gross 10000" in captured["kwargs"]["messages"][1]["content"]
+    assert captured["closed"] == 1
+
+
+def test_ask_answer_cache(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    backend = importlib.import_module("backend")
+    calls = {"n": 0}
+
+    class DummyClient:
+        class chat:
+            class completions:
+                @staticmethod
+                async def create(model, messages):
+                    calls["n"] += 1
+                    msg = type("Msg", (), {"content": "הברוטו הוא 12345"})()
+                    return type("Res", (), {"choices": [type("Choice", (), {"message": msg})()]})()
+
+    monkeypatch.setattr(backend, "get_llm_client", lambda: DummyClient())
+    monkeypatch.setattr(backend, "get_payslip", lambda pid: "Gross 12345 cache-test")
+    before = dict(backend.cache_stats)
+
+    client = TestClient(backend.app)
+    first = client.post("/ask", json={"question": "מה הברוטו שלי?", "payslip_id": "p1"}).json()
+    second = client.post("/ask", json={"question": "  מה  הבְּרוּטוֹ שלי ", "payslip_id": "p1"}).json()
+
+    assert first["answer"] == second["answer"] == "הברוטו הוא 12345"
+    assert second["cached"] is True
+    assert calls["n"] == 1
+    stats = client.get("/debug/cache").json()["stats"]
+    assert stats["answer_hits"] - before.get("answer_hits", 0) == 1
+    assert stats["answer_misses"] - before.get("answer_misses", 0) == 1
+
+
+def test_answer_cache_lru_and_ttl(monkeypatch, tmp_path):
+    db = importlib.import_module("db")
+    monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "cache.db"))
+    monkeypatch.setattr(db, "ANSWER_CACHE_MAX_ENTRIES", 2)
+    db.init_db()
+
+    db.cache_answer("a", "1")
+    db.cache_answer("b", "2")
+    assert db.get_cached_answer("a") == "1"  # "a" is now most recently used
+    db.cache_answer("c", "3")
+
+    assert db.get_cached_answer("b") is None
+    assert db.get_cached_answer("a") == "1"
+    assert db.get_cached_answer("c") == "3"
+
+    monkeypatch.setattr(db, "ANSWER_CACHE_TTL", -1)
+    assert db.get_cached_answer("a") is None
+
+def test_ask_context_trims_long_slips(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    backend = importlib.import_module("backend")
+    monkeypatch.setattr(backend, "ASK_CONTEXT_TOKENS", 200)
+
+    short = "שכר יסוד 12,000.00\nמס הכנסה 1,210.00"
+    assert backend.ask_context(short, "מה המס?") == short
+
+    page = "עמוד {i}\nשכר יסוד 12,000.00\nביטוח לאומי 512.00"
+    long = "\n\n".join(page.format(i=i) for i in range(50)) + "\n\nדמי הבראה 1,254.00"
+    context = backend.ask_context(long, "כמה קיבלתי דמי הבראה?")
+    assert "דמי הבראה 1,254.00" in context
+    assert backend.estimate_tokens(context) <= 200
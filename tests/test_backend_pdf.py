@@ -25,14 +25,13 @@ def test_analyze_and_ask(monkeypatch):
         class chat:
             class completions:
                 @staticmethod
-                def create(model, messages, stream=False, timeout=60):
+                async def create(model, messages):
                     captured["messages"] = messages
                     class Res:
                         choices = [type("Choice", (), {"message": type("Msg", (), {"content": "answer"})()})]
                     return Res()
 
-    import openai
-    monkeypatch.setattr(openai, "OpenAI", lambda *a, **k: DummyClient())
+    monkeypatch.setattr(backend, "get_llm_client", lambda: DummyClient())
 
     pdf_bytes = create_pdf_bytes("Gross 10000")
     response = client.post(
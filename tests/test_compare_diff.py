@@ -0,0 +1,65 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from src.compare import chronological_order, diff_line_items, parse_line_items, pay_period, render_diff
+
+JUNE = """תלוש שכר לחודש 06/2025
+שם העובד: ישראל ישראלי   תעודת זהות: 123456789
+שכר יסוד 30 400.00 12,000.00
+שעות נוספות 125% 8 720.00
+שעות נוספות 150% 2 240.00
+דמי נסיעות 315.00
+מס הכנסה 1,210.00-
+ביטוח לאומי: 512.00
+נטו לתשלום 11,553.00"""
+
+JULY = (JUNE.replace("06/2025", "07/2025")
+        .replace("12,000.00", "12,600.00")
+        .replace("דמי נסיעות 315.00", "דמי הבראה 1,500.00")
+        .replace("11,553.00", "12,900.00"))
+
+
+def test_parse_line_items():
+    items = parse_line_items(JUNE)
+    assert items == {
+        "שכר יסוד": 12000.0,
+        "שעות נוספות 125%": 720.0,
+        "שעות נוספות 150%": 240.0,
+        "דמי נסיעות": 315.0,
+        "מס הכנסה": -1210.0,
+        "ביטוח לאומי": 512.0,
+        "נטו לתשלום": 11553.0,
+    }
+
+
+def test_diff_and_render():
+    rows = {r.item: r for r in diff_line_items([parse_line_items(JUNE), parse_line_items(JULY)])}
+    assert rows["שכר יסוד"].deltas == [600.0]
+    assert rows["שכר יסוד"].pct == [5.0]
+    assert rows["שכר יסוד"].status == "changed"
+    assert rows["דמי נסיעות"].status == "removed"
+    assert rows["דמי הבראה"].values == [None, 1500.0]
+    assert rows["דמי הבראה"].status == "new"
+    assert rows["מס הכנסה"].status == "unchanged"
+
+    text = render_diff(list(rows.values()), ["יוני", "יולי"])
+    assert "שכר יסוד | 12,000.00 | 12,600.00 | +600.00 | +5.0% | changed" in text
+    assert "ללא שינוי:" in text and "מס הכנסה" in text
+    assert len(text) < len(JUNE) + len(JULY)
+
+
+def test_pay_period_and_chronological_order():
+    assert pay_period(JUNE) == (2025, 6)
+    assert pay_period("תקופה: 12.24\nשכר יסוד 100.00") == (2024, 12)
+    assert pay_period("שכר יסוד 12,000.00") is None
+
+    may = JUNE.replace("06/2025", "05/2025")
+    assert chronological_order([JULY, may, JUNE]) == [1, 2, 0]
+    assert chronological_order([JULY, "שכר יסוד 100.00"]) is None  # upload order
+
+
+def test_line_items_share_the_table_pairing():
+    text = "שכר יסוד 30 400.00 12,000.00 נסיעות 315.00\nתעודת זהות 123456789"
+    assert parse_line_items(text) == {"שכר יסוד": 12000.0, "נסיעות": 315.0}
@@ -1,6 +1,7 @@
 import os
 import sys
 import importlib
+import time
 import fitz
 from fastapi.testclient import TestClient
 
@@ -24,13 +25,13 @@ def test_compare(monkeypatch):
         class chat:
             class completions:
                 @staticmethod
-                def create(model, messages, temperature=0.3, max_tokens=4000):
+                async def create(model, messages, temperature=0.3, max_tokens=4000):
                     captured["messages"] = messages
                     class Res:
                         choices = [type("Choice", (), {"message": type("Msg", (), {"content": "analysis"})()})]
                     return Res()
 
-    monkeypatch.setattr(backend, "client", DummyClient())
+    monkeypatch.setattr(backend, "get_llm_client", lambda: DummyClient())
 
     pdf1 = create_pdf_bytes("Gross 100")
     pdf2 = create_pdf_bytes("Gross 200")
@@ -46,3 +47,102 @@ def test_compare(monkeypatch):
     assert data["payslips"][0]["filename"] == "a.pdf"
     assert captured["messages"]
 
+
+
+class _AnalysisClient:
+    class chat:
+        class completions:
+            @staticmethod
+            async def create(model, messages, **kwargs):
+                msg = type("Msg", (), {"content": "analysis"})()
+                return type("Res", (), {"choices": [type("Choice", (), {"message": msg})()]})()
+
+
+def test_compare_extracts_concurrently_and_reports_failures(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    sys.path.append(os.path.dirname(__file__) + "/..")
+    backend = importlib.import_module("backend")
+    db = importlib.import_module("db")
+    monkeypatch.setattr(backend, "get_llm_client", lambda: _AnalysisClient())
+
+    def fake_extract(data, kind):
+        time.sleep(0.3)
+        if data.startswith(b"bad"):
+            raise RuntimeError("corrupt file")
+        if data.startswith(b"slow"):
+            time.sleep(1.0)
+        return data.decode(), 0, 0.3
+
+    monkeypatch.setattr(backend, "extract_upload", fake_extract)
+    monkeypatch.setattr(backend, "COMPARE_TOTAL_SECONDS", 0.8)
+
+    files = [
+        ("files", ("a.pdf", b"Gross 300 concurrent", "application/pdf")),
+        ("files", ("b.pdf", b"Gross 400 concurrent", "application/pdf")),
+        ("files", ("c.pdf", b"bad", "application/pdf")),
+        ("files", ("d.pdf", b"slow", "application/pdf")),
+        ("files", ("e.txt", b"Gross 500", "text/plain")),
+    ]
+    start = time.perf_counter()
+    resp = TestClient(backend.app).post("/compare-payslips", files=files)
+    assert time.perf_counter() - start < 1.2
+
+    assert resp.status_code == 200
+    data = resp.json()
+    assert [p["filename"] for p in data["payslips"]] == ["a.pdf", "b.pdf"]
+    assert {f["filename"] for f in data["failed"]} == {"c.pdf", "d.pdf", "e.txt"}
+
+    stored = db.get_comparison(data["comparison_id"])
+    assert stored["analysis"] == "analysis"
+    assert stored["payslip_ids"] == [p["payslip_id"] for p in data["payslips"]]
+    assert db.get_payslip(stored["payslip_ids"][0]) == "Gross 300 concurrent"
+
+
+def test_compare_sends_only_the_diff(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    sys.path.append(os.path.dirname(__file__) + "/..")
+    backend = importlib.import_module("backend")
+    captured = {}
+
+    class Client(_AnalysisClient):
+        class chat:
+            class completions:
+                @staticmethod
+                async def create(model, messages, **kwargs):
+                    captured["prompt"] = messages[1]["content"]
+                    return await _AnalysisClient.chat.completions.create(model, messages)
+
+    monkeypatch.setattr(backend, "get_llm_client", lambda: Client())
+    filler = "\n".join(f"הערה כללית מספר {'א' * (i % 5 + 1)}" for i in range(200))
+    files = [
+        ("files", ("june.pdf", create_pdf_bytes(f"Gross 10000\nNet 8000\nTax 1500\n{filler}"), "application/pdf")),
+        ("files", ("july.pdf", create_pdf_bytes(f"Gross 11000\nNet 8800\nTax 1500\n{filler}"), "application/pdf")),
+    ]
+    resp = TestClient(backend.app).post("/compare-payslips", files=files)
+    assert resp.status_code == 200
+
+    table = resp.json()["comparison_table"]
+    assert table["slips"] == ["june.pdf", "july.pdf"]
+    assert table["chronological"] is False  # no pay period in these slips
+    rows = {r["item"]: r for r in table["rows"]}
+    assert rows["Gross"]["values"] == [10000.0, 11000.0]
+    assert rows["Gross"]["pct"] == [10.0]
+    assert rows["Tax"]["status"] == "unchanged"
+    assert "Gross | 10,000.00 | 11,000.00" in captured["prompt"]
+    assert "הערה כללית" not in captured["prompt"]
+    assert "לפי סדר ההעלאה" in captured["prompt"]
+
+
+def test_compare_sorts_slips_by_pay_period(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    sys.path.append(os.path.dirname(__file__) + "/..")
+    backend = importlib.import_module("backend")
+    uploaded = [
+        {"filename": "b.pdf", "extracted_text": "תלוש שכר לחודש 07/2025\nשכר יסוד 12,600.00"},
+        {"filename": "a.pdf", "extracted_text": "תלוש שכר לחודש 06/2025\nשכר יסוד 12,000.00"},
+    ]
+    slips, in_period_order = backend.chronological(uploaded)
+    assert in_period_order
+    assert [s["filename"] for s in slips] == ["a.pdf", "b.pdf"]
+    (row,) = backend.comparison_table(slips)
+    assert row.deltas == [600.0]
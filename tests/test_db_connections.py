@@ -0,0 +1,40 @@
+import asyncio
+import importlib
+import os
+import sys
+import threading
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def test_connection_reused_per_thread(monkeypatch, tmp_path):
+    db = importlib.import_module("db")
+    monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "conn.db"))
+    db.init_db()
+
+    con = db._conn()
+    assert db._conn() is con
+    assert con.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert con.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+
+    other = []
+    t = threading.Thread(target=lambda: other.append(db._conn()))
+    t.start(); t.join()
+    assert other[0] is not con
+
+    monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "other.db"))
+    assert db._conn() is not con
+
+
+def test_run_db_roundtrip(monkeypatch, tmp_path):
+    db = importlib.import_module("db")
+    monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "async.db"))
+    db.init_db()
+
+    async def roundtrip():
+        pid = await db.run_db(db.save_payslip, "Gross 5000", {"filename": "a.pdf"})
+        return pid, await db.run_db(db.get_payslip, pid), await db.run_db(db.latest_payslip_id)
+
+    pid, text, latest = asyncio.run(roundtrip())
+    assert text == "Gross 5000"
+    assert latest == pid
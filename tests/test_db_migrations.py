@@ -0,0 +1,61 @@
+import importlib
+import os
+import sqlite3
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def test_migrates_legacy_db_and_keeps_ids(monkeypatch, tmp_path):
+    db = importlib.import_module("db")
+    path = str(tmp_path / "legacy.db")
+    con = sqlite3.connect(path)
+    con.execute("CREATE TABLE payslips (id TEXT PRIMARY KEY, text TEXT NOT NULL, meta TEXT, created_at REAL)")
+    con.executemany("INSERT INTO payslips VALUES (?, ?, '{}', ?)",
+                    [("a", "Gross 100", 1.0), ("b", "Gross 100", 2.0), ("c", "Gross 200", 3.0)])
+    con.commit(); con.close()
+
+    monkeypatch.setattr(db, "DB_PATH", path)
+    db.init_db()
+    db.init_db()  # idempotent
+
+    con = db._conn()
+    assert con.execute("PRAGMA user_version").fetchone()[0] == db.SCHEMA_VERSION
+    assert {r[0] for r in con.execute("SELECT id FROM payslips")} == {"a", "b", "c"}
+    assert db.get_payslip("b") == "Gross 100"
+    # Re-saving existing text is a no-op that returns the oldest copy
+    assert db.save_payslip("Gross 100", {}) == "a"
+    assert db.save_payslip("Gross 200", {}) == "c"
+    assert con.execute("SELECT COUNT(*) FROM payslips").fetchone()[0] == 3
+
+
+def test_save_dedupes_and_queries_use_indexes(monkeypatch, tmp_path):
+    db = importlib.import_module("db")
+    monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "fresh.db"))
+    db.init_db()
+
+    first = db.save_payslip("Net 9000", {"filename": "a.pdf"})
+    assert db.save_payslip("Net 9000", {"filename": "copy.pdf"}) == first
+    assert db.save_payslip("Net 9001", {}) != first
+    assert len(db.list_payslips()) == 2
+
+    plan = " ".join(r[-1] for r in db._conn().execute(
+        "EXPLAIN QUERY PLAN SELECT id FROM payslips ORDER BY last_seen DESC LIMIT 1"))
+    assert "idx_payslips_last_seen" in plan
+
+
+def test_resaving_duplicate_makes_it_latest(monkeypatch, tmp_path):
+    db = importlib.import_module("db")
+    monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "resave.db"))
+    db.init_db()
+    clock = iter([100.0, 200.0, 300.0])
+    monkeypatch.setattr(db.time, "time", lambda: next(clock))
+
+    a = db.save_payslip("Net 9000", {})
+    b = db.save_payslip("Net 9001", {})
+    assert db.save_payslip("Net 9000", {}) == a
+
+    assert db.latest_payslip_id() == a
+    assert [p["id"] for p in db.list_payslips()] == [a, b]
+    # created_at still records the first upload, for archiving
+    assert db.list_payslips()[0]["created_at"] == 100.0
@@ -0,0 +1,129 @@
+import importlib
+import os
+import sqlite3
+import sys
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def _fresh_db(monkeypatch, tmp_path, name):
+    db = importlib.import_module("db")
+    monkeypatch.setattr(db, "DB_PATH", str(tmp_path / name))
+    db.init_db()
+    return db
+
+
+def test_hebrew_numbers_and_snippets(monkeypatch, tmp_path):
+    db = _fresh_db(monkeypatch, tmp_path, "search.db")
+    july = db.save_payslip("תלוש יולי\nשכר יסוד 12,000.00\nדמי הבראה 1,254.00\nסה\"כ תשלומים 13,254.00", {})
+    db.save_payslip("תלוש אוגוסט\nשכר יסוד 12,000.00\nנסיעות 315.00", {})
+
+    assert [r["id"] for r in db.search_payslips("הבראה")["results"]] == [july]
+    assert [r["id"] for r in db.search_payslips("בהבראה")["results"]] == [july]  # attached prefix
+    assert [r["id"] for r in db.search_payslips("סה״כ 13254")["results"]] == [july]
+    assert len(db.search_payslips("12,000")["results"]) == 2
+    assert len(db.search_payslips("תשלו*")["results"]) == 1
+
+    hit = db.search_payslips("הבראה")["results"][0]
+    assert "דמי [הבראה] 1,254.00" in hit["snippet"]
+    assert hit["score"] > 0
+
+    with pytest.raises(ValueError):
+        db.search_payslips("   ")
+    with pytest.raises(ValueError):
+        db.search_payslips("שכר", cursor="garbage")
+
+
+@pytest.mark.parametrize("order", ["rank", "recent"])
+def test_keyset_pagination_covers_every_match_once(monkeypatch, tmp_path, order):
+    db = _fresh_db(monkeypatch, tmp_path, f"pages-{order}.db")
+    ids = {db.save_payslip(f"שכר יסוד {1000 + i}\n" + "בונוס " * (i % 4), {}) for i in range(23)}
+
+    seen, cursor = [], None
+    while True:
+        page = db.search_payslips("שכר", limit=5, cursor=cursor, order=order)
+        seen += [r["id"] for r in page["results"]]
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    assert len(seen) == 23 and set(seen) == ids
+    if order == "recent":
+        created = [db.get_payslip(i) for i in seen]
+        assert created[0] == "שכר יסוד 1022\n" + "בונוס " * 2
+
+
+def test_rank_scores_only_newest_candidates(monkeypatch, tmp_path):
+    db = _fresh_db(monkeypatch, tmp_path, "capped.db")
+    monkeypatch.setattr(db, "SEARCH_RANK_CANDIDATES", 3)
+    ids = [db.save_payslip(f"שכר יסוד {1000 + i}", {}) for i in range(5)]
+
+    assert {r["id"] for r in db.search_payslips("שכר")["results"]} == set(ids[-3:])
+    assert [r["id"] for r in db.search_payslips("שכר", order="recent")["results"]] == ids[::-1]
+
+
+def test_snippet_stops_decompressing_after_hit(monkeypatch):
+    db = importlib.import_module("db")
+    text = "תלוש יולי\nדמי הבראה 1,254.00\n" + "שורה נוספת 100.00\n" * 500 + "הבראה בסוף"
+    pieces = db._unpack_pieces(db._pack(text), chunk=256)
+    snippet = db._lazy_snippet(pieces, ["הבראה"], [], 60)
+
+    assert snippet == db._snippet(text, ["הבראה"], [], 60)
+    assert next(pieces, None) is not None  # the tail was never decompressed
+    for width in (20, 60, 400):
+        lazy = db._lazy_snippet(db._unpack_pieces(db._pack(text), chunk=64), ["נוספת", "בסוף"], ["יול"], width)
+        assert lazy == db._snippet(text, ["נוספת", "בסוף"], ["יול"], width)
+
+
+def test_archived_and_migrated_rows_are_searchable(monkeypatch, tmp_path):
+    db = importlib.import_module("db")
+    path = str(tmp_path / "legacy.db")
+    con = sqlite3.connect(path)
+    con.execute("CREATE TABLE payslips (id TEXT PRIMARY KEY, text TEXT NOT NULL, meta TEXT, created_at REAL)")
+    con.execute("INSERT INTO payslips VALUES ('old', 'דמי הבראה 900.00', '{}', 1.0)")
+    con.commit(); con.close()
+    monkeypatch.setattr(db, "DB_PATH", path)
+    db.init_db()
+
+    assert [r["id"] for r in db.search_payslips("הבראה")["results"]] == ["old"]
+    new = db.save_payslip("דמי הבראה 1,000.00 " + "x" * 200, {})
+    with db._conn() as c:
+        c.execute("UPDATE payslips SET created_at = ? WHERE id = ?", (time.time() - 400 * 86400, new))
+    assert db.archive_payslips(older_than_days=90) == 2
+    hits = db.search_payslips("הבראה", order="recent")["results"]
+    assert [r["id"] for r in hits] == [new, "old"]
+    assert "[הבראה] 1,000.00" in hits[0]["snippet"]
+
+
+def test_search_endpoint(monkeypatch, tmp_path):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    backend = importlib.import_module("backend")
+    db = _fresh_db(monkeypatch, tmp_path, "api.db")
+    pid = db.save_payslip("דמי הבראה 1,254.00", {})
+    client = TestClient(backend.app)
+
+    body = client.get("/search", params={"q": "הבראה"}).json()
+    assert body["ok"] and [r["id"] for r in body["results"]] == [pid]
+    assert body["next_cursor"] is None
+    assert client.get("/search", params={"q": "!!"}).status_code == 400
+
+
+def test_backfill_runs_in_batches_after_migration(monkeypatch, tmp_path):
+    db = importlib.import_module("db")
+    path = str(tmp_path / "legacy.db")
+    con = sqlite3.connect(path)
+    con.execute("CREATE TABLE payslips (id TEXT PRIMARY KEY, text TEXT NOT NULL, meta TEXT, created_at REAL)")
+    con.executemany("INSERT INTO payslips VALUES (?, ?, '{}', ?)",
+                    [(f"p{i}", f"דמי הבראה {i}00.00", float(i)) for i in range(5)])
+    con.commit(); con.close()
+    monkeypatch.setattr(db, "DB_PATH", path)
+
+    db.migrate(db._conn())  # the schema step only creates the index
+    assert db._conn().execute("SELECT count(*) FROM payslips_fts_ids").fetchone()[0] == 0
+
+    assert db.backfill_search(batch=2) == 5
+    assert db.backfill_search(batch=2) == 0
+    assert len(db.search_payslips("הבראה")["results"]) == 5
@@ -0,0 +1,64 @@
+import importlib
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+SLIP = "\n".join([
+    "תלוש שכר לחודש יולי 2025",
+    "שם העובד: ישראל ישראלי",
+    "שכר יסוד 12,500.00",
+    "שעות נוספות 125% 8 720.00",
+    "דמי נסיעות 315.00",
+    "סה\"כ תשלומים 13,535.00",
+    "מס הכנסה 1,210.00",
+    "ביטוח לאומי 512.00",
+    "ביטוח בריאות 420.00",
+    "פנסיה עובד 6% 750.00",
+    "שכר נטו 10,643.00",
+])
+
+
+def _fresh_db(monkeypatch, tmp_path, name):
+    db = importlib.import_module("db")
+    monkeypatch.setattr(db, "DB_PATH", str(tmp_path / name))
+    db.init_db()
+    return db
+
+
+def test_text_and_meta_stored_compressed(monkeypatch, tmp_path):
+    db = _fresh_db(monkeypatch, tmp_path, "packed.db")
+    pid = db.save_payslip(SLIP, {"filename": "july.pdf", "comparison_analysis": "ניתוח " * 200})
+
+    text, meta = db._conn().execute("SELECT text, meta FROM payslips WHERE id = ?", (pid,)).fetchone()
+    assert isinstance(text, bytes) and len(text) < len(SLIP.encode()) / 2
+    assert isinstance(meta, bytes)
+    assert db.get_payslip(pid) == SLIP
+
+    # Rows written before compression are plain text and still readable
+    with db._conn() as con:
+        con.execute("INSERT INTO payslips (id, text, meta, created_at) VALUES ('legacy', 'Gross 100', '{}', 1)")
+    assert db.get_payslip("legacy") == "Gross 100"
+
+
+def test_archive_moves_old_rows_and_keeps_them_readable(monkeypatch, tmp_path):
+    db = _fresh_db(monkeypatch, tmp_path, "archive.db")
+    old = [db.save_payslip(f"{SLIP}\nתלוש {i}", {}) for i in range(5)]
+    with db._conn() as con:
+        con.executemany("UPDATE payslips SET created_at = ? WHERE id = ?",
+                        [(time.time() - 100 * 86400, pid) for pid in old])
+    recent = db.save_payslip(f"{SLIP}\nחדש", {})
+
+    assert db.archive_payslips(older_than_days=30, batch=2) == 5
+    assert db.archive_payslips(older_than_days=30) == 0
+    con = db._conn()
+    assert con.execute("SELECT COUNT(*) FROM archive_segments").fetchone()[0] == 3
+    assert con.execute("SELECT segment FROM payslips WHERE id = ?", (recent,)).fetchone()[0] is None
+
+    db._load_segment.cache_clear()
+    assert db.get_payslip(old[3]) == f"{SLIP}\nתלוש 3"
+    assert db.get_payslip(recent) == f"{SLIP}\nחדש"
+    assert len(db.list_payslips(10)) == 6
+    # Dedupe still sees archived rows
+    assert db.save_payslip(f"{SLIP}\nתלוש 0", {}) == old[0]
@@ -0,0 +1,99 @@
+import io
+import importlib
+import os
+import sys
+import time
+
+import fitz
+from PIL import Image, ImageDraw
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def create_scanned_pdf(text: str) -> bytes:
+    img = Image.new("RGB", (600, 200), "white")
+    draw = ImageDraw.Draw(img)
+    draw.text((10, 80), text, fill="black")
+    buf = io.BytesIO()
+    img.save(buf, format="PDF")
+    return buf.getvalue()
+
+
+def test_same_upload_skips_ocr(monkeypatch, tmp_path):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    backend = importlib.import_module("backend")
+    db = importlib.import_module("db")
+    monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "cache.db"))
+    db.init_db()
+
+    calls = {"n": 0}
+
+    def fake_ocr(_):
+        calls["n"] += 1
+        return "Gross 5000", None
+
+    monkeypatch.setattr(backend, "_ocr_page", fake_ocr)
+    pdf_bytes = create_scanned_pdf("Gross 5000")
+
+    first = backend.extract_upload(pdf_bytes, "pdf")
+    second = backend.extract_upload(pdf_bytes, "pdf")
+
+    assert first[0] == second[0] == "Gross 5000"
+    assert second[1] == first[1] == 1
+    assert calls["n"] == 1
+
+
+def test_timed_out_extraction_is_not_cached(monkeypatch, tmp_path):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    backend = importlib.import_module("backend")
+    db = importlib.import_module("db")
+    monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "cache.db"))
+    db.init_db()
+
+    calls = {"n": 0}
+
+    def slow_ocr(_):
+        calls["n"] += 1
+        time.sleep(0.3)
+        return "Gross 5000", None
+
+    monkeypatch.setattr(backend, "_ocr_page", slow_ocr)
+    monkeypatch.setattr(backend, "MAX_TOTAL_SECONDS", 0.1)
+    # A text page followed by a scan: the timeout leaves partial, non-empty text
+    doc = fitz.open()
+    doc.new_page().insert_text((72, 72), "Employee Israel Israeli, employee number 12345, department payroll")
+    doc.insert_pdf(fitz.open(stream=create_scanned_pdf("Gross 5000"), filetype="pdf"))
+    pdf_bytes = doc.tobytes()
+    partial = backend.extract_upload(pdf_bytes, "pdf")[0]
+    assert "Israeli" in partial and "Gross" not in partial
+    time.sleep(0.3)  # let the abandoned OCR call finish
+
+    monkeypatch.setattr(backend, "MAX_TOTAL_SECONDS", 60)
+    assert "Gross 5000" in backend.extract_upload(pdf_bytes, "pdf")[0]
+    assert calls["n"] == 2
+
+
+def test_cache_key_tracks_ocr_config(monkeypatch):
+    backend = importlib.import_module("backend")
+    key = backend.calculate_content_key(b"x", "pdf")
+    assert backend.calculate_content_key(b"x", "pdf") == key
+
+    monkeypatch.setattr(backend, "_ocr_provider", lambda: "gemini")
+    gemini = backend.calculate_content_key(b"x", "pdf")
+    monkeypatch.setattr(backend, "GEMINI_MODEL", "other-model")
+    assert len({key, gemini, backend.calculate_content_key(b"x", "pdf")}) == 3
+
+
+def test_cache_evicts_by_size_and_age(monkeypatch, tmp_path):
+    db = importlib.import_module("db")
+    monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "cache.db"))
+    monkeypatch.setattr(db, "EXTRACT_CACHE_MAX_BYTES", 10)
+    db.init_db()
+
+    db.cache_extraction("a", "123456", 1, 0.1)
+    db.cache_extraction("b", "abcdef", 1, 0.1)
+    assert db.get_cached_extraction("a") is None
+    assert db.get_cached_extraction("b")["text"] == "abcdef"
+
+    monkeypatch.setattr(db, "EXTRACT_CACHE_MAX_AGE", -1)
+    assert db.get_cached_extraction("b") is None
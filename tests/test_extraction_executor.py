@@ -0,0 +1,68 @@
+import asyncio
+import importlib
+import os
+import sys
+import threading
+import time
+
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def test_extraction_runs_off_event_loop(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    backend = importlib.import_module("backend")
+    seen = {}
+
+    def fake_extract(data, kind):
+        seen["thread"] = threading.current_thread().name
+        return "Gross 100", 0, 0.0
+
+    monkeypatch.setattr(backend, "extract_upload", fake_extract)
+    monkeypatch.setattr(backend, "save_payslip", lambda text, meta: "pid")
+    client = TestClient(backend.app)
+
+    resp = client.post("/analyze-payslip", files={"file": ("a.pdf", b"%PDF", "application/pdf")})
+
+    assert resp.status_code == 200
+    assert seen["thread"].startswith("extract")
+
+
+def test_saturated_pool_returns_503(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    backend = importlib.import_module("backend")
+    monkeypatch.setattr(backend, "_extract_slots", asyncio.Semaphore(0))
+    monkeypatch.setattr(backend, "EXTRACT_QUEUE_SECONDS", 0.01)
+    client = TestClient(backend.app)
+
+    resp = client.post("/analyze-payslip", files={"file": ("a.pdf", b"%PDF", "application/pdf")})
+
+    assert resp.status_code == 503
+
+
+def test_cancelled_compare_keeps_slots_until_workers_finish(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    backend = importlib.import_module("backend")
+    release = threading.Event()
+
+    def slow_extract(data, kind):
+        release.wait(5)
+        return "Gross 100", 0, 0.0
+
+    monkeypatch.setattr(backend, "extract_upload", slow_extract)
+    monkeypatch.setattr(backend, "_extract_slots", asyncio.Semaphore(2))
+    monkeypatch.setattr(backend, "COMPARE_TOTAL_SECONDS", 0.1)
+    files = [("files", (f"{i}.pdf", b"%PDF", "application/pdf")) for i in range(2)]
+
+    with TestClient(backend.app) as client:
+        resp = client.post("/compare-payslips", files=files)
+        assert resp.status_code == 400  # both extractions hit the deadline
+        time.sleep(0.2)  # let the cancellations land
+        assert backend._extract_slots._value == 0  # the threads are still busy
+
+        release.set()
+        deadline = time.monotonic() + 5
+        while backend._extract_slots._value < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert backend._extract_slots._value == 2
@@ -0,0 +1,111 @@
+import io
+import importlib
+import os
+import sys
+
+from PIL import Image, ImageDraw
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def page_png(label: str) -> bytes:
+    img = Image.new("L", (400, 200), 255)
+    draw = ImageDraw.Draw(img)
+    for row in range(5):
+        draw.text((10, 20 + row * 30), f"{label} line {row} " * 3, fill=0)
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def make_model(responses, calls):
+    class DummyModel:
+        def generate_content(self, parts):
+            calls.append(len([p for p in parts if isinstance(p, dict)]))
+            part = type("P", (), {"text": responses.pop(0)})()
+            content = type("Cont", (), {"parts": [part]})()
+            return type("R", (), {"candidates": [type("C", (), {"content": content})()]})()
+
+    return DummyModel()
+
+
+def load_gemini(monkeypatch, responses, calls):
+    monkeypatch.setenv("GOOGLE_API_KEY", "test")
+    gemini = importlib.reload(importlib.import_module("src.gemini_ocr"))
+    model = make_model(responses, calls)
+    monkeypatch.setattr(gemini.genai, "configure", lambda **_: None, raising=False)
+    monkeypatch.setattr(gemini.genai, "GenerativeModel", lambda name: model, raising=False)
+    return gemini
+
+
+def test_batch_splits_pages_in_one_request(monkeypatch):
+    calls = []
+    first, second = "A" * 30, "B" * 30
+    gemini = load_gemini(monkeypatch, [f"=== PAGE 1 ===\n{first}\n=== PAGE 2 ===\n{second}\n"], calls)
+
+    texts = gemini.ocr_images_batch([page_png("a"), page_png("b")])
+
+    assert texts == [first, second]
+    assert calls == [2]
+
+
+def test_batch_falls_back_to_per_page_calls(monkeypatch):
+    calls = []
+    gemini = load_gemini(monkeypatch, ["no markers here", "X" * 25, "Y" * 25], calls)
+
+    texts = gemini.ocr_images_batch([page_png("a"), page_png("b")])
+
+    assert texts == ["X" * 25, "Y" * 25]
+    assert calls == [2, 1, 1]
+
+
+def test_backend_batches_pages_for_gemini(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    backend = importlib.reload(importlib.import_module("backend"))
+    monkeypatch.setattr(backend, "_ocr_provider", lambda: "gemini")
+    batches = []
+
+    def fake_batch(images):
+        batches.append(len(images))
+        return [f"page {i}" for i in range(len(images))]
+
+    monkeypatch.setattr(backend, "ocr_samples_batch", fake_batch)
+
+    imgs = [Image.new("RGB", (300, 100), "white") for _ in range(3)]
+    buf = io.BytesIO()
+    imgs[0].save(buf, format="PDF", save_all=True, append_images=imgs[1:])
+
+    text, pages_used, _ = backend.extract_text_from_pdf(buf.getvalue())
+
+    assert batches == [3]
+    assert pages_used == 3
+    assert text.split("\n\n") == ["page 0", "page 1", "page 2"]
+
+
+def test_upload_bytes_passed_through_only_for_gemini_formats(monkeypatch):
+    gemini = load_gemini(monkeypatch, [], [])
+    png = page_png("a")
+    img = Image.open(io.BytesIO(png))
+    assert gemini._blob(img, 0, png) == ("image/png", png)
+
+    buf = io.BytesIO()
+    img.save(buf, format="TIFF")
+    tiff = Image.open(io.BytesIO(buf.getvalue()))
+    mime, data = gemini._blob(tiff, 0, buf.getvalue())
+    assert mime in ("image/png", "image/jpeg")
+    assert data != buf.getvalue()
+
+
+def test_rotations_encoded_only_when_tried(monkeypatch):
+    calls = []
+    gemini = load_gemini(monkeypatch, ["X" * 25, "short", "Y" * 25], calls)
+    encoded = []
+    encode = gemini._encode
+    monkeypatch.setattr(gemini, "candidate_rotations", lambda img: [90, 270, 180])
+    monkeypatch.setattr(gemini, "_encode", lambda img: encoded.append(img) or encode(img))
+
+    assert gemini.ocr_image_with_rotation(page_png("a")) == ("X" * 25, 90, 1)
+    assert len(encoded) == 1
+
+    assert gemini.ocr_image_with_rotation(page_png("a")) == ("Y" * 25, 270, 2)
+    assert len(encoded) == 3
@@ -12,7 +12,8 @@ def test_retry_on_timeout(monkeypatch):
     monkeypatch.setenv("GOOGLE_API_KEY", "test")
     gemini = importlib.reload(importlib.import_module("src.gemini_ocr"))
 
-    calls = {"n": 0}
+    calls = {"n": 0, "configure": 0}
+    sleeps = []
     expected = "X" * 25
 
     class DummyModel:
@@ -38,9 +39,12 @@ def test_retry_on_timeout(monkeypatch):
 
             return Resp(expected)
 
-    monkeypatch.setattr(gemini.genai, "configure", lambda **_: None, raising=False)
+    def configure(**_):
+        calls["configure"] += 1
+
+    monkeypatch.setattr(gemini.genai, "configure", configure, raising=False)
     monkeypatch.setattr(gemini.genai, "GenerativeModel", lambda model: DummyModel(), raising=False)
-    monkeypatch.setattr(gemini.time, "sleep", lambda _: None)
+    monkeypatch.setattr(gemini.time, "sleep", sleeps.append)
 
     img = Image.new("RGB", (50, 50), "white")
     buf = io.BytesIO()
@@ -50,3 +54,8 @@ def test_retry_on_timeout(monkeypatch):
 
     assert text == expected
     assert calls["n"] == 2
+    assert len(sleeps) == 1 and 0 <= sleeps[0] <= 2  # jittered backoff
+
+    # The configured model is reused by later calls
+    assert gemini.ocr_image_bytes(buf.getvalue()) == expected
+    assert calls["configure"] == 1
@@ -0,0 +1,167 @@
+import asyncio
+import os
+import sys
+import time
+
+import openai
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from llm import GroqClient, LLMBusy, LLMError, RateLimiter, TokenBucket
+from llm import client as llm_client
+from llm.stub_server import StubServer
+
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(llm_client, "LLM_RETRY_BASE_SECONDS", 0.01)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_token_bucket_queues_callers_in_order():
+    clock = FakeClock()
+    bucket = TokenBucket(60, clock=clock)  # one per second, burst of 60
+    assert [bucket.reserve(20) for _ in range(3)] == [0, 0, 0]
+    assert bucket.reserve(1) == pytest.approx(1.0)
+    assert bucket.reserve(1) == pytest.approx(2.0)
+    clock.now = 2.0
+    assert bucket.reserve(1) == pytest.approx(1.0)
+
+
+def test_rate_limiter_tpm_settles_on_actual_usage_and_pauses():
+    clock = FakeClock()
+    limiter = RateLimiter(rpm=0, tpm=600, clock=clock)  # 10 tokens/s
+    assert limiter.reserve(600) == 0
+    limiter.settle(600, 100)  # the answer was short: 500 tokens come back
+    assert limiter.reserve(500) == 0
+    assert limiter.reserve(100) == pytest.approx(10.0)
+
+    limiter = RateLimiter(rpm=60, tpm=0, clock=clock)
+    limiter.pause(5)
+    assert limiter.reserve(1) == pytest.approx(5.0)
+
+
+def test_retry_after_header_forms():
+    def error(headers):
+        return type("Err", (), {"response": type("Resp", (), {"headers": headers})()})()
+
+    assert llm_client.retry_after(error({"retry-after": "2.5"})) == 2.5
+    assert llm_client.retry_after(error({"retry-after-ms": "150"})) == 0.15
+    date = time.strftime("%a, %d %b %Y %H:%M:%S GMT", time.gmtime(time.time() + 30))
+    assert 25 < llm_client.retry_after(error({"retry-after": date})) <= 30
+    assert llm_client.retry_after(error({})) is None
+
+
+def _client(stub, **kwargs):
+    return GroqClient(api_key="stub", base_url=stub.base_url, rpm=0, tpm=0, **kwargs)
+
+
+def test_retries_429_and_5xx_honoring_retry_after():
+    with StubServer(fail_first=[429, 503], retry_after=0.2, reply="נטו 9,000") as stub:
+        client = _client(stub, max_retries=3)
+        start = time.perf_counter()
+        assert client.answer("מה הנטו?") == "נטו 9,000"
+        assert time.perf_counter() - start >= 0.2
+        assert client.stats["retries"] == 2
+        assert client.stats["rate_limited"] == 1
+        assert stub.stats["requests"] == 3
+        client.close()
+
+
+def test_gives_up_on_long_retry_after_and_non_retryable():
+    with StubServer(fail_first=[429, 400], retry_after=3600) as stub:
+        client = _client(stub, max_retries=5)
+        with pytest.raises(openai.RateLimitError):
+            client.answer("x")
+        with pytest.raises(openai.BadRequestError):
+            client.answer("x")
+        assert client.stats["retries"] == 0
+        client.close()
+
+
+def test_backs_off_against_server_quota():
+    # Server allows 3 requests per 0.3 s; the client only learns it from 429s
+    with StubServer(rpm=3, window=0.3) as stub:
+        client = _client(stub, max_retries=10)
+        answers = [client.answer(f"q{i}") for i in range(7)]
+        assert answers[-1] == "stub answer to: q6"
+        assert stub.stats["ok"] == 7
+        assert client.stats["rate_limited"] == stub.stats["rate_limited"] > 0
+        client.close()
+
+
+def test_async_complete_and_stream():
+    async def run(stub):
+        client = _client(stub)
+        answers = await asyncio.gather(*(client.aanswer(f"שאלה {i}") for i in range(5)))
+        deltas = [d async for d in client.astream([{"role": "user", "content": "שלום"}])]
+        await client.aclose()
+        return answers, deltas
+
+    with StubServer(fail_first=[503]) as stub:
+        answers, deltas = asyncio.run(run(stub))
+    assert sorted(answers) == [f"stub answer to: שאלה {i}" for i in range(5)]
+    assert "".join(deltas) == "stub answer to: שלום"
+
+
+def test_client_paces_to_rpm(monkeypatch):
+    clock = FakeClock()
+    with StubServer() as stub:
+        client = GroqClient(api_key="stub", base_url=stub.base_url, max_wait=60,
+                            limiter=RateLimiter(rpm=2, tpm=0, clock=clock))
+        client.answer("a")
+        client.answer("b")
+        sleeps = []
+        monkeypatch.setattr(llm_client.time, "sleep", sleeps.append)
+        client.answer("c")
+        monkeypatch.undo()
+        assert sleeps == [pytest.approx(30.0)]
+        assert client.stats["throttled_seconds"] == pytest.approx(30.0)
+        client.close()
+
+
+def test_refuses_waits_beyond_max_wait():
+    clock = FakeClock()
+    limiter = RateLimiter(rpm=0, tpm=600, clock=clock)
+    with StubServer() as stub:
+        client = GroqClient(api_key="stub", base_url=stub.base_url, max_wait=5, limiter=limiter)
+        assert limiter.reserve(550) == 0
+        with pytest.raises(LLMBusy) as busy:
+            client.complete([{"role": "user", "content": "x"}], max_tokens=200)
+        assert busy.value.retry_after > 5
+        assert client.stats["refused"] == 1
+        assert stub.stats["requests"] == 0
+        assert limiter.reserve(50) == 0  # the refused reservation was given back
+        client.close()
+
+
+def test_stream_settles_from_usage_chunk():
+    async def run(stub, limiter):
+        client = GroqClient(api_key="stub", base_url=stub.base_url, limiter=limiter)
+        deltas = [d async for d in client.astream([{"role": "user", "content": "שלום"}], max_tokens=500)]
+        await client.aclose()
+        return deltas
+
+    clock = FakeClock()
+    limiter = RateLimiter(rpm=0, tpm=600, clock=clock)
+    with StubServer() as stub:
+        deltas = asyncio.run(run(stub, limiter))
+        used = stub.stats["tokens"]
+    assert "".join(deltas) == "stub answer to: שלום"
+    assert limiter.reserve(600 - used) == 0  # only the tokens actually used stay charged
+    assert limiter.reserve(1) > 0
+
+
+def test_missing_api_key(monkeypatch):
+    monkeypatch.delenv("GROQ_API_KEY", raising=False)
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    with pytest.raises(LLMError):
+        GroqClient(rpm=0, tpm=0).answer("x")
@@ -0,0 +1,91 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from src.kb.retrieval import ChunkIndex, SectionIndex, chunk_spans, estimate_tokens, split_sections, tokenize
+
+KB = """
+# Title
+
+Intro line.
+
+## 1. ניכויי חובה
+- מס הכנסה
+- ביטוח לאומי
+
+### חשוב:
+המעסיק מחויב לנכות.
+
+---
+
+## 2. חופשה ומחלה
+- ימי חופשה שנצברו
+- ימי מחלה שנצברו
+
+## 3. פנסיה
+- מעסיק: 6.5%
+- עובד: 6%
+"""
+
+
+def test_tokenize_strips_hebrew_prefixes():
+    tokens = tokenize("ובביטוח 6.5%")
+    assert "ביטוח" in tokens
+    assert "6" in tokens and "5" in tokens
+
+
+def test_split_sections_keeps_parent_heading():
+    sections = split_sections(KB)
+    assert sections[0].text.startswith("# Title")
+    important = next(s for s in sections if s.title == "חשוב:")
+    assert important.text.startswith("## 1. ניכויי חובה\n### חשוב:")
+    assert all("---" not in s.text for s in sections)
+
+
+def test_select_returns_relevant_sections_under_budget():
+    index = SectionIndex(KB)
+
+    picked = index.select("כמה ימי מחלה יש לי?", k=2, token_budget=1000)
+    assert [s.title for s in picked][0] == "2. חופשה ומחלה"
+
+    picked = index.select("בפנסיה של המעסיק", k=4, token_budget=1000)
+    assert "3. פנסיה" in [s.title for s in picked]
+
+    tight = index.select("מס הכנסה ימי מחלה פנסיה", k=4, token_budget=30)
+    assert sum(estimate_tokens(s.text) for s in tight) <= 30
+
+
+def _pages(n):
+    page = "\n".join([
+        "תלוש שכר עמוד {i}",
+        "שכר יסוד 12,000.00",
+        "שעות נוספות 125% 720.00",
+        "מס הכנסה 1,210.00",
+        "ביטוח לאומי 512.00",
+    ])
+    return "\n\n".join(page.format(i=i) for i in range(n)) + "\n\nימי מחלה יתרה 14\nימי חופשה יתרה 9"
+
+
+def test_chunk_spans_break_at_pages_and_size():
+    text = _pages(3)
+    chunks = [text[a:b] for a, b in chunk_spans(text)]
+    assert chunks[0].startswith("תלוש שכר עמוד 0") and chunks[0].endswith("512.00")
+    assert len(chunks) == 4
+    small = chunk_spans("מילה " * 100, max_tokens=20)
+    assert all(b - a <= 60 for a, b in small)
+
+
+def test_chunk_index_prompt_size_constant_in_pages():
+    sizes = []
+    for n in (2, 10, 40):
+        index = ChunkIndex(_pages(n))
+        context = index.render("כמה ימי מחלה נשארו לי?", k=3, token_budget=120)
+        assert "ימי מחלה יתרה 14" in context
+        sizes.append(estimate_tokens(context))
+    assert max(sizes) <= 120 and len(set(sizes)) == 1
+
+
+def test_chunk_index_falls_back_to_leading_chunks():
+    index = ChunkIndex(_pages(5))
+    assert index.select("xyz", k=2, token_budget=1000) == [0, 1]
@@ -0,0 +1,87 @@
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from kb import KnowledgeBase
+
+
+def test_lru_spill_and_transparent_reload(tmp_path):
+    kb = KnowledgeBase(max_bytes=300, spill_path=str(tmp_path / "spill.db"))
+    for i in range(3):
+        kb.add(str(i), f"slip {i} " + "x" * 100, {"net_salary": i})
+    kb.get("1")  # 1 is now more recent than 2
+
+    kb.add("3", "y" * 100)
+    stats = kb.stats()
+    assert stats["resident_bytes"] <= 300
+    assert stats["spills"] == 2
+    assert stats["spilled_slips"] == 2
+    assert set(kb.store) == {"1", "3"}  # least recently used went first
+    assert len(kb) == 4
+
+    assert kb.get("0").startswith("slip 0 ")
+    assert kb.fields("0") == {"net_salary": 0}
+    assert "2" in kb and "missing" not in kb
+    assert kb.get("missing") == ""
+    stats = kb.stats()
+    assert stats["reloads"] == 1
+    assert stats["misses"] == 1
+    assert stats["resident_bytes"] <= 300
+    kb.close()
+
+
+def test_replacing_a_spilled_slip_drops_the_old_copy(tmp_path):
+    kb = KnowledgeBase(max_bytes=120, spill_path=str(tmp_path / "spill.db"))
+    kb.add("a", "old " + "x" * 100)
+    kb.add("b", "z" * 100)  # spills "a"
+    kb.add("a", "new", {"gross_salary": 1})
+    assert kb.get("a") == "new"
+    assert kb.fields("a") == {"gross_salary": 1}
+    assert len(kb) == 2
+    kb.close()
+
+
+def test_temp_spill_file_removed_on_close():
+    kb = KnowledgeBase(max_bytes=10)
+    kb.add("a", "x" * 20)
+    kb.add("b", "y" * 20)
+    path = kb._spill_path
+    assert os.path.exists(path)
+    kb.close()
+    assert not os.path.exists(path)
+
+
+def test_ids_unique_under_concurrency():
+    kb = KnowledgeBase()
+
+    def upload(i):
+        slip_id = kb.new_id()
+        kb.add(slip_id, f"slip {i}")
+        return slip_id
+
+    with ThreadPoolExecutor(8) as pool:
+        ids = list(pool.map(upload, range(200)))
+    assert len(set(ids)) == 200
+    assert len(kb) == 200
+    kb.close()
+
+
+def test_shared_spill_path_is_per_process(tmp_path, monkeypatch):
+    path = str(tmp_path / "spill.db")
+    first = KnowledgeBase(max_bytes=50, spill_path=path)
+    first.add("a", "x" * 40)
+    first.add("b", "y" * 40)  # spills "a"
+    assert first._spill_path == str(tmp_path / f"spill-{os.getpid()}.db")
+
+    monkeypatch.setattr(os, "getpid", lambda: 1)  # another uvicorn worker
+    second = KnowledgeBase(max_bytes=50, spill_path=path)
+    second.add("c", "z" * 40)
+    second.add("d", "w" * 40)
+    monkeypatch.undo()
+
+    assert first.get("a") == "x" * 40  # not wiped by the second worker
+    second.close()
+    first.close()
+    assert not os.listdir(tmp_path)
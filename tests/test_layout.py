@@ -0,0 +1,85 @@
+import io
+import importlib
+import os
+import sys
+
+import fitz
+from PIL import Image, ImageDraw
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from src.layout import analyze_page
+
+
+def hybrid_pdf() -> bytes:
+    """Text header on top, numbers table as an embedded image below it."""
+    img = Image.new("L", (800, 300), 255)
+    draw = ImageDraw.Draw(img)
+    for row in range(6):
+        draw.text((20, 20 + row * 40), f"item {row}   1,234.00", fill=0)
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    with fitz.open() as doc:
+        page = doc.new_page()
+        page.insert_text((72, 72), "Payslip header")
+        page.insert_image(fitz.Rect(72, 300, 472, 450), stream=buf.getvalue())
+        page.insert_text((72, 700), "Footer note")
+        return doc.tobytes()
+
+
+def test_analyze_finds_uncovered_image_region():
+    with fitz.open(stream=hybrid_pdf(), filetype="pdf") as doc:
+        layout = analyze_page(doc[0])
+
+    assert "Payslip header" in layout.text
+    assert len(layout.regions) == 1
+    assert abs(layout.regions[0].y0 - 300) < 1
+
+
+def test_hybrid_page_ocrs_only_the_region(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    backend = importlib.reload(importlib.import_module("backend"))
+    sizes = []
+
+    def fake_ocr(raw):
+        sizes.append((raw.width, raw.height))
+        return "item 0 1,234.00", None
+
+    monkeypatch.setattr(backend, "_ocr_page", fake_ocr)
+
+    text, regions_used, _ = backend.extract_text_from_pdf(hybrid_pdf())
+
+    assert regions_used == 1
+    assert text.split("\n") == ["Payslip header", "item 0 1,234.00", "Footer note"]
+    (width, height), = sizes
+    assert abs(width / height - 400 / 150) < 0.05  # the clipped image, not the page
+
+
+def background_pdf() -> bytes:
+    """A text payslip drawn over a full-page letterhead image."""
+    img = Image.new("L", (600, 840), 250)
+    ImageDraw.Draw(img).rectangle((20, 20, 580, 60), fill=200)
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    with fitz.open() as doc:
+        page = doc.new_page()
+        page.insert_image(page.rect, stream=buf.getvalue())
+        for i, line in enumerate(["Payslip 01/2024", "Gross 10,000.00", "Net 8,000.00", "Income tax 1,200.00"]):
+            page.insert_text((72, 300 + i * 20), line)
+        return doc.tobytes()
+
+
+def test_background_image_keeps_text_layer(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    backend = importlib.reload(importlib.import_module("backend"))
+    monkeypatch.setattr(backend, "_ocr_page", lambda raw: ("letterhead", None))
+
+    with fitz.open(stream=background_pdf(), filetype="pdf") as doc:
+        layout = analyze_page(doc[0])
+    assert layout.regions
+    assert not any(region.intersects(block) for region in layout.regions for block, _ in layout.blocks)
+
+    text, _, _ = backend.extract_text_from_pdf(background_pdf())
+    lines = text.split("\n")
+    assert lines[1:5] == ["Payslip 01/2024", "Gross 10,000.00", "Net 8,000.00", "Income tax 1,200.00"]
+    assert lines[0] == lines[-1] == "letterhead"  # only the bands above and below the text
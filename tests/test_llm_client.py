@@ -0,0 +1,82 @@
+import asyncio
+import importlib
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def test_llm_client_is_shared(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    backend = importlib.import_module("backend")
+    from src.llm import client as llm_client
+
+    first = backend.get_llm_client()
+    assert backend.get_llm_client() is first is backend.LLM.async_client
+    assert first.timeout.read == llm_client.LLM_TIMEOUT
+    assert first.timeout.connect == llm_client.LLM_CONNECT_TIMEOUT
+    assert first.max_retries == 0  # GroqClient retries, honoring Retry-After
+
+    asyncio.run(backend.close_llm_client())
+    assert backend.LLM._async_client is None
+
+
+def test_llm_concurrency_is_capped(monkeypatch):
+    backend = importlib.import_module("backend")
+    state = {"active": 0, "peak": 0}
+
+    class DummyClient:
+        def __init__(self):
+            self.chat = type("Chat", (), {"completions": self})()
+
+        async def create(self, **kwargs):
+            state["active"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+            await asyncio.sleep(0.01)
+            state["active"] -= 1
+            msg = type("Msg", (), {"content": "ok"})()
+            return type("Res", (), {"choices": [type("Choice", (), {"message": msg})()]})()
+
+    dummy = DummyClient()
+    monkeypatch.setattr(backend, "get_llm_client", lambda: dummy)
+
+    async def burst():
+        monkeypatch.setattr(backend, "_llm_slots", asyncio.Semaphore(2))
+        return await asyncio.gather(*(backend.chat_completion([]) for _ in range(6)))
+
+    assert asyncio.run(burst()) == ["ok"] * 6
+    assert state["peak"] == 2
+
+
+def test_llm_queue_timeout(monkeypatch):
+    backend = importlib.import_module("backend")
+    monkeypatch.setattr(backend, "LLM_QUEUE_SECONDS", 0.01)
+
+    async def saturated():
+        monkeypatch.setattr(backend, "_llm_slots", asyncio.Semaphore(0))
+        async with backend.llm_slot():
+            pass
+
+    try:
+        asyncio.run(saturated())
+    except backend.HTTPException as exc:
+        assert exc.status_code == 503
+    else:
+        raise AssertionError("expected 503")
+
+
+def test_llm_quota_wait_beyond_cap_is_503(monkeypatch):
+    backend = importlib.import_module("backend")
+
+    async def busy(messages, **kwargs):
+        raise backend.LLMBusy(42.0)
+
+    monkeypatch.setattr(backend.LLM, "acomplete", busy)
+    monkeypatch.setattr(backend, "get_llm_client", lambda: None)
+    try:
+        asyncio.run(backend.chat_completion([]))
+    except backend.HTTPException as exc:
+        assert exc.status_code == 503
+        assert exc.headers["Retry-After"] == "43"
+    else:
+        raise AssertionError("expected 503")
@@ -24,7 +24,7 @@ def test_ocr_budget_retry(monkeypatch):
     pdf_bytes = create_scanned_pdf("Budget Test")
 
     # Pretend OCR always succeeds
-    monkeypatch.setattr(backend, "_ocr_bytes", lambda _: "Budget Test")
+    monkeypatch.setattr(backend, "_ocr_page", lambda _: ("Budget Test", None))
 
     text, pages_used, _ = backend.extract_text_from_pdf(pdf_bytes)
 
@@ -0,0 +1,69 @@
+import io
+import importlib
+import os
+import sys
+import time
+
+from PIL import Image, ImageDraw
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def create_scanned_pdf(texts) -> bytes:
+    """Create a multi-page scanned-style PDF, one image page per text."""
+    pages = []
+    for text in texts:
+        img = Image.new("RGB", (600, 200), "white")
+        ImageDraw.Draw(img).text((10, 80), text, fill="black")
+        pages.append(img)
+    buf = io.BytesIO()
+    pages[0].save(buf, format="PDF", save_all=True, append_images=pages[1:])
+    return buf.getvalue()
+
+
+def test_pages_ocr_concurrently_in_order(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    backend = importlib.reload(importlib.import_module("backend"))
+    monkeypatch.setattr(backend, "MAX_OCR_PAGES", 3)
+    monkeypatch.setattr(backend, "OCR_PAGE_WORKERS", 3)
+
+    delays = iter([0.3, 0.1, 0.2])
+
+    def slow_ocr(_):
+        delay = next(delays)
+        time.sleep(delay)
+        return f"page-{delay}", None
+
+    monkeypatch.setattr(backend, "_ocr_page", slow_ocr)
+    pdf_bytes = create_scanned_pdf(["a", "b", "c"])
+
+    start = time.perf_counter()
+    text, pages_used, _ = backend.extract_text_from_pdf(pdf_bytes)
+
+    assert time.perf_counter() - start < 0.55
+    assert text.split("\n\n") == ["page-0.3", "page-0.1", "page-0.2"]
+    assert pages_used == 3
+
+
+def test_deadline_cancels_pending_pages(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    backend = importlib.reload(importlib.import_module("backend"))
+    monkeypatch.setattr(backend, "MAX_TOTAL_SECONDS", 0.2)
+    monkeypatch.setattr(backend, "OCR_PAGE_WORKERS", 1)
+
+    calls = {"n": 0}
+
+    def slow_ocr(_):
+        calls["n"] += 1
+        time.sleep(0.5)
+        return "late", None
+
+    monkeypatch.setattr(backend, "_ocr_page", slow_ocr)
+    pdf_bytes = create_scanned_pdf(["a", "b", "c"])
+
+    text, pages_used, elapsed = backend.extract_text_from_pdf(pdf_bytes)
+
+    assert text == ""
+    assert pages_used == 0
+    assert elapsed < 0.45
+    assert calls["n"] == 1
@@ -25,7 +25,7 @@ def test_rotated_pdf_ocr(monkeypatch):
     pdf_bytes = create_scanned_pdf("Gross 12345", rotate=90)
 
     # Pretend OCR always succeeds regardless of rotation
-    monkeypatch.setattr(backend, "_ocr_bytes", lambda _: "Gross 12345")
+    monkeypatch.setattr(backend, "_ocr_page", lambda _: ("Gross 12345", None))
 
     text, pages_used, _ = backend.extract_text_from_pdf(pdf_bytes)
 
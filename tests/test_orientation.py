@@ -0,0 +1,69 @@
+import io
+import importlib
+import os
+import sys
+
+from PIL import Image, ImageDraw
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from src import orientation
+
+
+def text_page(rotate: int = 0) -> Image.Image:
+    img = Image.new("L", (600, 400), 255)
+    draw = ImageDraw.Draw(img)
+    for row in range(12):
+        draw.text((20, 20 + row * 30), "Gross 12345  Net 9876  Tax 1234 " * 2, fill=0)
+    return img.rotate(rotate, expand=True) if rotate else img
+
+
+def test_projection_prefers_upright_pair():
+    assert orientation.candidate_rotations(text_page())[0] in (0, 180)
+    assert orientation.candidate_rotations(text_page(rotate=90))[0] in (90, 270)
+
+
+def test_blank_page_needs_single_attempt():
+    assert orientation.candidate_rotations(Image.new("L", (600, 400), 255)) == [0]
+
+
+def test_gemini_uses_one_call_for_rotated_page(monkeypatch):
+    monkeypatch.setenv("GOOGLE_API_KEY", "test")
+    gemini = importlib.reload(importlib.import_module("src.gemini_ocr"))
+    calls = {"n": 0}
+
+    class DummyModel:
+        def generate_content(self, parts):
+            calls["n"] += 1
+            part = type("P", (), {"text": "X" * 25})()
+            content = type("Cont", (), {"parts": [part]})()
+            return type("R", (), {"candidates": [type("C", (), {"content": content})()]})()
+
+    monkeypatch.setattr(gemini.genai, "configure", lambda **_: None, raising=False)
+    monkeypatch.setattr(gemini.genai, "GenerativeModel", lambda model: DummyModel(), raising=False)
+
+    buf = io.BytesIO()
+    text_page(rotate=90).save(buf, format="PNG")
+    text, angle, attempts = gemini.ocr_image_with_rotation(buf.getvalue())
+
+    assert text == "X" * 25
+    assert angle in (90, 270)
+    assert attempts == calls["n"] == 1
+
+
+def test_osd_only_for_ambiguous_pages(monkeypatch):
+    calls = []
+
+    class FakePool:
+        def detect_orientation(self, image):
+            calls.append(image.size)
+            return 270
+
+    monkeypatch.setattr(orientation, "get_pool", lambda: FakePool())
+
+    assert orientation.candidate_rotations(text_page())[0] == 0
+    assert orientation.candidate_rotations(text_page(rotate=90))[0] == 90
+    assert calls == []  # the projection settled both
+
+    assert orientation.candidate_rotations(text_page(rotate=45)) == [270, 90]
+    assert len(calls) == 1
@@ -10,3 +10,65 @@ def test_parse_fields_gross_net():
     fields = parse_fields(text)
     assert fields["gross_salary"] == 10000
     assert fields["net_salary"] == 8000
+
+
+SLIP = """תלוש שכר לחודש 07/2025
+שכר יסוד 30 400.00 12,000.00
+סה"כ תשלומים 13,275.00
+ברוטו למס 13,275.00
+מס הכנסה 1,210.00
+ביטוח לאומי: 512.00   ביטוח בריאות 420.00
+פנסיה עובד 6% 750.00
+פנסיה מעסיק 6.5% 812.50
+קרן השתלמות עובד 2.5% 300.00
+נקודות זיכוי 2.25
+ימי חופשה צבירה 1.5 ניצול 2 יתרה 12.5
+יתרת מחלה 30
+סה״כ ניכויים 3,192.00
+10,083.00 נטו לתשלום
+נתונים מצטברים
+ברוטו 90,000.00
+מס הכנסה 8,000.00
+"""
+
+
+def test_extract_hebrew_fields():
+    fields = parse_fields(SLIP)
+    assert fields["base_salary"] == 12000
+    assert fields["gross_salary"] == 13275
+    assert fields["taxable_gross"] == 13275
+    assert fields["income_tax"] == 1210
+    assert fields["national_insurance"] == 512
+    assert fields["health_insurance"] == 420
+    assert fields["pension_employee"] == 750
+    assert fields["pension_employer"] == 812.5
+    assert fields["study_fund_employee"] == 300
+    assert fields["credit_points"] == 2.25
+    assert fields["vacation_days"] == 12.5
+    assert fields["sick_days"] == 30
+    assert fields["total_deductions"] == 3192
+    assert fields["net_salary"] == 10083
+    assert fields["gross_salary_ytd"] == 90000
+    assert fields["income_tax_ytd"] == 8000
+
+
+def test_parse_fields_is_cached():
+    from parser.fields import _parse_cached
+
+    _parse_cached.cache_clear()
+    first = parse_fields(SLIP)
+    first["net_salary"] = 0  # callers get a copy
+    assert parse_fields(SLIP)["net_salary"] == 10083
+    assert _parse_cached.cache_info().hits == 1
+
+
+def test_field_for_question():
+    from parser import field_for_question
+
+    assert field_for_question("כמה מס הכנסה שילמתי?") == "income_tax"
+    assert field_for_question("What is my net pay?") == "net_salary"
+    assert field_for_question("כמה מס הכנסה מצטבר שולם השנה?") == "income_tax_ytd"
+    assert field_for_question("how are you") is None
+    assert field_for_question("מה הברוטו שלי?") == "gross_salary"
+    assert field_for_question("למה ירד לי הנטו?") == "net_salary"
+    assert field_for_question("וכמה במס הכנסה?") == "income_tax"
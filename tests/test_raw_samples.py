@@ -0,0 +1,25 @@
+import io
+import os
+import sys
+
+import fitz
+from PIL import Image
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from src.ocr import RawImage, image_from_samples
+
+
+def test_samples_match_png_roundtrip():
+    with fitz.open() as doc:
+        page = doc.new_page(width=200, height=100)
+        page.insert_text((20, 50), "Gross 10000")
+        pix = page.get_pixmap(matrix=fitz.Matrix(1.5, 1.5), alpha=False, colorspace=fitz.csGRAY)
+        raw = RawImage(pix.samples, pix.width, pix.height, pix.stride, pix.colorspace.name)
+
+        img = image_from_samples(raw)
+        expected = Image.open(io.BytesIO(pix.tobytes("png")))
+
+        assert img.mode == "L"
+        assert img.size == expected.size
+        assert img.tobytes() == expected.tobytes()
@@ -0,0 +1,67 @@
+import io
+import importlib
+import os
+import sys
+
+import fitz
+from PIL import Image, ImageDraw
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from src import render
+
+
+def scanned_pdf(dpi: int) -> bytes:
+    img = Image.new("L", (int(8.27 * dpi), int(11.69 * dpi)), 255)
+    ImageDraw.Draw(img).text((40, 40), "Gross 10000", fill=0)
+    buf = io.BytesIO()
+    img.save(buf, format="PDF", resolution=dpi)
+    return buf.getvalue()
+
+
+def test_scale_follows_embedded_dpi():
+    with fitz.open(stream=scanned_pdf(150), filetype="pdf") as doc:
+        assert abs(render.page_render_scale(doc[0], 3.0) - 150 / 72) < 0.05
+    with fitz.open(stream=scanned_pdf(72), filetype="pdf") as doc:
+        assert render.page_render_scale(doc[0], 3.0) == render.OCR_MIN_SCALE
+    with fitz.open(stream=scanned_pdf(400), filetype="pdf") as doc:
+        assert render.page_render_scale(doc[0], 3.0) == 3.0
+
+
+def test_progressive_rerenders_short_pages(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    backend = importlib.reload(importlib.import_module("backend"))
+    monkeypatch.setattr(backend, "PROGRESSIVE", True)
+    widths = []
+
+    def fake_ocr(raw):
+        widths.append(raw.width)
+        return ("short" if len(widths) == 1 else "Gross 10000 " * 5), None
+
+    monkeypatch.setattr(backend, "_ocr_page", fake_ocr)
+
+    text, pages_used, _ = backend.extract_text_from_pdf(scanned_pdf(150))
+
+    assert pages_used == 1
+    assert text.startswith("Gross 10000")
+    assert len(widths) == 2 and widths[0] < widths[1]
+
+
+def test_progressive_escalates_on_confidence(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    backend = importlib.reload(importlib.import_module("backend"))
+    monkeypatch.setattr(backend, "PROGRESSIVE", True)
+    widths = []
+
+    def long_but_unsure(raw):
+        widths.append(raw.width)
+        return "G1oss l0000 " * 5, 30.0 if len(widths) == 1 else 90.0
+
+    monkeypatch.setattr(backend, "_ocr_page", long_but_unsure)
+    backend.extract_text_from_pdf(scanned_pdf(150))
+    assert len(widths) == 2 and widths[0] < widths[1]
+
+    widths.clear()
+    monkeypatch.setattr(backend, "_ocr_page", lambda raw: widths.append(raw.width) or ("Net 9", 95.0))
+    text, _, _ = backend.extract_text_from_pdf(scanned_pdf(150))
+    assert text == "Net 9" and len(widths) == 1  # short but confident: kept
@@ -0,0 +1,96 @@
+import os
+import sys
+
+import fitz
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from ingest import extract_document
+from parser import table
+from parser.table import (
+    WordBox,
+    label_amounts,
+    layout_fields,
+    table_rows,
+    words_from_pymupdf,
+    words_from_tesseract,
+)
+from tesseract_pool import Word
+
+
+def _rtl_row(y, cells):
+    """Words of one RTL row; *cells* are (right edge, words) from right to left."""
+    boxes = []
+    for right, words in cells:
+        for word in words:
+            width = 6 * len(word)
+            boxes.append(WordBox(right - width, y, right, y + 10, word))
+            right -= width + 3  # single space within a cell
+    return boxes
+
+
+WORDS = (
+    _rtl_row(100, [(500, ["שכר", "יסוד"]), (380, ["30"]), (320, ["400.00"]), (240, ["12,000.00"]),
+                   (140, ["נטו"]), (110, ["9,000.00"])])
+    + _rtl_row(120.5, [(500, ["מס", "הכנסה"]), (240, ["1,210.00"])])
+)
+
+
+@pytest.fixture(params=["numpy", "python"])
+def clustering(request, monkeypatch):
+    if request.param == "python":
+        monkeypatch.setattr(table, "np", None)
+    elif table.np is None:
+        pytest.skip("numpy not installed")
+    return request.param
+
+
+def test_rows_and_cells_rtl(clustering):
+    # Shuffled input: order must come from the coordinates only
+    rows = table_rows(list(reversed(WORDS)))
+    assert rows == [
+        ["שכר יסוד", "30", "400.00", "12,000.00", "נטו", "9,000.00"],
+        ["מס הכנסה", "1,210.00"],
+    ]
+
+
+def test_label_amounts_last_amount_per_label(clustering):
+    assert label_amounts(WORDS) == [("שכר יסוד", 12000), ("נטו", 9000), ("מס הכנסה", 1210)]
+
+
+def test_layout_fields(clustering):
+    assert layout_fields(WORDS) == {"base_salary": 12000, "net_salary": 9000, "income_tax": 1210}
+
+
+def test_words_from_tesseract_boxes():
+    words = [Word("ברוטו", 91.0, (10, 20, 40, 12), (1, 1, 1))]
+    assert words_from_tesseract(words) == [WordBox(10, 20, 50, 32, "ברוטו")]
+
+
+def _columns_pdf() -> bytes:
+    """Labels and amounts written as two separate text columns."""
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_text((50, 100), "Gross\nIncome tax\nNet", fontsize=11)
+    page.insert_text((300, 100), "10,500.00\n1,210.00\n8,000.00", fontsize=11)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def test_pdf_columns_paired_by_geometry():
+    data = _columns_pdf()
+    text, pages = extract_document(data)
+    # The linear text layer keeps the columns apart...
+    assert text.splitlines()[:3] == ["Gross", "Income tax", "Net"]
+    # ...while the word boxes put each amount next to its label.
+    assert len(pages) == 1
+    assert label_amounts(pages[0]) == [("Gross", 10500), ("Income tax", 1210), ("Net", 8000)]
+    assert layout_fields(pages[0]) == {"gross_salary": 10500, "income_tax": 1210, "net_salary": 8000}
+
+
+def test_words_from_pymupdf_skips_blank():
+    assert words_from_pymupdf([(0, 0, 5, 5, " ", 0, 0, 0), (6, 0, 9, 5, "x", 0, 0, 1)]) == [
+        WordBox(6, 0, 9, 5, "x")
+    ]
@@ -0,0 +1,125 @@
+import io
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import shared_memory
+
+from PIL import Image
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from src import tesseract_ocr, tesseract_pool
+from src.tesseract_pool import OcrResult
+
+TSV = "\n".join(
+    [
+        "level\tpage_num\tblock_num\tpar_num\tline_num\tword_num\tleft\ttop\twidth\theight\tconf\ttext",
+        "1\t1\t0\t0\t0\t0\t0\t0\t600\t200\t-1\t",
+        "5\t1\t1\t1\t1\t1\t10\t10\t50\t12\t96.5\tGross",
+        "5\t1\t1\t1\t1\t2\t70\t10\t40\t12\t91.0\t10000",
+        "5\t1\t1\t1\t2\t1\t10\t30\t30\t12\t88.0\tNet",
+        "5\t1\t1\t1\t2\t2\t50\t30\t10\t12\t-1\t ",
+        "5\t1\t2\t1\t1\t1\t10\t80\t30\t12\t80.5\tTax",
+    ]
+)
+
+
+def test_parse_tsv_lines_and_confidence():
+    result = tesseract_pool.parse_tsv(TSV)
+
+    assert result.text == "Gross 10000\nNet\n\nTax"
+    assert [w.text for w in result.words] == ["Gross", "10000", "Net", "Tax"]
+    assert result.words[1].box == (70, 10, 40, 12)
+    assert abs(result.confidence - (96.5 + 91.0 + 88.0 + 80.5) / 4) < 1e-6
+
+
+def test_shared_memory_handoff(monkeypatch):
+    image = Image.new("L", (30, 20), 200)
+    image.putpixel((3, 4), 7)
+    data = image.tobytes()
+    shm = shared_memory.SharedMemory(create=True, size=len(data))
+    shm.buf[: len(data)] = data
+    seen = {}
+
+    def fake_recognize(img):
+        seen["img"] = img
+        return OcrResult("ok", 90.0, [])
+
+    monkeypatch.setattr(tesseract_pool, "_recognize", fake_recognize)
+    try:
+        result = tesseract_pool._recognize_shared(shm.name, "L", (30, 20), 90)
+    finally:
+        shm.close()
+        shm.unlink()
+
+    assert result.text == "ok"
+    assert seen["img"].size == (20, 30)
+
+
+def test_pool_hands_images_to_worker_processes():
+    image = Image.new("RGB", (31, 17), (10, 20, 30))
+    image.putpixel((5, 6), (200, 100, 50))
+    pool = tesseract_pool.TesseractPool(workers=1)
+    try:
+        copy = pool._run_shared(tesseract_pool._from_shared, image)
+    finally:
+        pool.close()
+
+    assert copy.size == image.size and copy.tobytes() == image.tobytes()
+
+
+def test_pooled_recognize_rotates_in_worker(monkeypatch):
+    seen = {}
+
+    def fake_recognize(img):
+        seen["size"] = img.size
+        return OcrResult("ok", 90.0, [])
+
+    monkeypatch.setattr(tesseract_pool, "_recognize", fake_recognize)
+    pool = tesseract_pool.TesseractPool(workers=0)
+    pool._executor = ThreadPoolExecutor(max_workers=1)  # runs the worker side in-process
+    try:
+        result = pool.recognize(Image.new("P", (30, 20)), angle=90)
+    finally:
+        pool.close()
+
+    assert result.text == "ok"
+    assert seen["size"] == (20, 30)
+
+
+def test_in_process_recognize_keeps_caller_format(monkeypatch):
+    buf = io.BytesIO()
+    Image.new("L", (10, 10), 255).save(buf, format="PNG")
+    image = Image.open(buf)
+    seen = {}
+
+    def image_to_data(img, lang):
+        seen["format"] = img.format
+        return TSV
+
+    monkeypatch.setattr(tesseract_pool, "_api", None)
+    monkeypatch.setattr(tesseract_pool.pytesseract, "image_to_data", image_to_data)
+    assert tesseract_pool._recognize(image).text == "Gross 10000\nNet\n\nTax"
+    assert seen["format"] == "PGM"
+    assert image.format == "PNG"
+
+
+def test_rotation_choice_uses_confidence(monkeypatch):
+    results = {
+        0: OcrResult("lots of garbage characters here", 20.0, []),
+        180: OcrResult("Gross 10000", 85.0, []),
+    }
+
+    class FakePool:
+        def recognize(self, image, angle=0):
+            return results[angle]
+
+    monkeypatch.setattr(tesseract_ocr, "_installed", lambda: True)
+    monkeypatch.setattr(tesseract_ocr, "get_pool", lambda: FakePool())
+    monkeypatch.setattr(tesseract_ocr, "candidate_rotations", lambda image: [0, 180])
+
+    result, angle, attempts = tesseract_ocr.ocr_pil_with_confidence(Image.new("L", (10, 10)))
+
+    assert result.text == "Gross 10000"
+    assert angle == 180
+    assert attempts == 2